@@ -0,0 +1,157 @@
+"""
+Admission control: per-route-class concurrency limits, bounded queues and load shedding
+
+Every HTTP request is classified by method and path into a lane before it is
+routed. Each lane admits at most ``concurrency`` requests at once and queues up
+to ``queue`` more, first come first served, for at most ``timeout`` seconds.
+Lanes are isolated, so pest detection, market analysis and advisory chat
+saturating their own lanes never delay health checks, auth or reference reads,
+which have lanes of their own (``critical`` is unlimited).
+
+A request is shed with a fast 503 and ``Retry-After`` when its lane's queue is
+full, when the expected wait (queued requests ahead of it times the lane's
+recent service time, over its concurrency) already exceeds the lane timeout,
+or when it actually waits that long. Rejecting up front keeps queues short
+enough that admitted requests still finish in time, instead of every request
+timing out late.
+
+Limits apply per worker process. Queue length, waits, in-flight requests and
+shed requests are exported as ``admission_*`` metrics.
+"""
+
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_QUEUE_SECONDS, ADMISSION_SHED
+
+# First match wins; requests matching nothing use the "default" lane and
+# lane None bypasses admission (long-lived streams would pin a slot)
+ROUTE_CLASSES: Tuple[Tuple[Optional[str], str, "re.Pattern"], ...] = tuple(
+    (lane, method, re.compile(pattern)) for lane, method, pattern in (
+        ("critical", "*", r"/(api/health|metrics)?"),
+        (None, "GET", r"/api/realtime/events"),
+        ("auth", "*", r"/api/auth/.*"),
+        ("reference", "GET", r"/api/(crops/crops|pests/pests)(/\d+)?|/api/forum/categories"),
+        ("ml", "POST", r"/api/pests/detect|/api/crops/recommend(/for-location)?"),
+        ("heavy", "GET", r"/api/market/analysis/[^/]+"),
+        ("heavy", "POST", r"/api/advisory/chat(/stream)?")
+    )
+)
+
+class Lane:
+    """Concurrency limit with a bounded FIFO queue, handing freed slots straight to waiters"""
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float):
+        self.name = name
+        self.concurrency = concurrency  # 0 is unlimited
+        self.queue_size = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Exponentially weighted service time, seeded at a tenth of the timeout
+        self.service_time = timeout / 10
+
+    def expected_wait(self, position: int) -> float:
+        return position * self.service_time / self.concurrency
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.expected_wait(len(self.waiters) + 1)))
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot, or return the reason the request is shed"""
+        if not self.concurrency or (self.active < self.concurrency and not self.waiters):
+            self.active += 1
+            return None
+        if len(self.waiters) >= self.queue_size:
+            return "queue_full"
+        if self.expected_wait(len(self.waiters) + 1) > self.timeout:
+            return "deadline"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        ADMISSION_QUEUED.labels(self.name).inc()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait((waiter,), timeout=self.timeout)
+        except BaseException:
+            # Cancelled, e.g. client disconnect: pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise
+        finally:
+            ADMISSION_QUEUED.labels(self.name).dec()
+            ADMISSION_QUEUE_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+            if not waiter.done():
+                waiter.cancel()
+                self.waiters.remove(waiter)
+        return None if not waiter.cancelled() else "timeout"
+
+    def release(self, elapsed: Optional[float]):
+        if elapsed is not None:
+            self.service_time += 0.2 * (elapsed - self.service_time)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # The slot moves to the waiter; active is unchanged
+                return
+        self.active -= 1
+
+def build_lanes(config: Dict[str, Dict]) -> Dict[str, Lane]:
+    lanes = {
+        name: Lane(name, int(spec.get("concurrency", 0)), int(spec.get("queue", 0)), float(spec.get("timeout", 0)))
+        for name, spec in config.items()
+    }
+    # Health checks are never queued or shed
+    lanes["critical"] = Lane("critical", 0, 0, 0)
+    lanes.setdefault("default", Lane("default", 0, 0, 0))
+    return lanes
+
+def classify(method: str, path: str) -> Optional[str]:
+    for lane, lane_method, pattern in ROUTE_CLASSES:
+        if (lane_method == "*" or lane_method == method) and pattern.fullmatch(path):
+            return lane
+    return "default"
+
+class AdmissionMiddleware:
+    """Admit, queue or shed each HTTP request according to its lane"""
+
+    def __init__(self, app, lanes: Optional[Dict[str, Dict]] = None):
+        self.app = app
+        self.lanes = build_lanes(settings.ADMISSION_LANES if lanes is None else lanes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        lane = self.lanes.get(name) or self.lanes["default"]
+
+        reason = await lane.acquire()
+        if reason is not None:
+            ADMISSION_SHED.labels(lane.name, reason).inc()
+            response = JSONResponse(
+                {"detail": "Server is busy, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(lane.retry_after())}
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_IN_FLIGHT.labels(lane.name).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ADMISSION_IN_FLIGHT.labels(lane.name).dec()
+            lane.release(time.perf_counter() - started)
@@ -0,0 +1,111 @@
+"""
+In-process caching helpers
+
+``TTLCache`` is per process. ``SharedVersions`` keeps per-user version
+counters in Redis so that a write in one worker invalidates the entries every
+other worker cached for that user: callers put the version in their cache key
+and bump it after a change.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import redis
+
+from app.core.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+REDIS_RETRY_SECONDS = 30.0
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL
+
+    Expired entries are kept until evicted so callers can fall back to the
+    last known value when a refresh fails. Lookups of a named cache are
+    counted as hits and misses in ``cache_requests_total``.
+    """
+
+    def __init__(self, max_entries: int = 10000, name: Optional[str] = None):
+        self.max_entries = max_entries
+        self.name = name
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, allow_stale: bool = False) -> Tuple[bool, Optional[Any]]:
+        """Return (found, value); stale values are only returned with ``allow_stale``"""
+        with self.lock:
+            entry = self.entries.get(key)
+            found = entry is not None and (allow_stale or entry[0] >= time.monotonic())
+            if found:
+                self.entries.move_to_end(key)
+        if self.name is not None and not allow_stale:
+            record_cache(self.name, found)
+        return (True, entry[1]) if found else (False, None)
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+class SharedVersions:
+    """Per-user cache versions shared by every worker through Redis
+
+    If Redis is unreachable versions read as None (only the changing worker
+    drops its entries) and Redis is retried after a back-off.
+    """
+
+    def __init__(self, redis_url: Optional[str], ttl: int, prefix: str):
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = None
+        self.redis_retry_at = 0.0
+
+    def _client(self):
+        if self.redis_url and self.redis is None and time.monotonic() >= self.redis_retry_at:
+            self.redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        return self.redis
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"Shared {self.prefix} versions unavailable, invalidating per process: {e}")
+        self.redis = None
+        self.redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def get(self, user_id: int) -> Optional[int]:
+        """Current version, or None when it cannot be read"""
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return int(client.get(f"{self.prefix}:{user_id}") or 0)
+        except (redis.RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None
+
+    def bump(self, user_id: int):
+        client = self._client()
+        if client is None:
+            return
+        key = f"{self.prefix}:{user_id}"
+        try:
+            # Outlives every entry cached before the bump, so an expired key never matches one
+            client.pipeline().incr(key).expire(key, self.ttl).execute()
+        except (redis.RedisError, OSError) as e:
+            self._redis_failed(e)
@@ -0,0 +1,127 @@
+"""
+Response compression negotiated from Accept-Encoding
+
+Brotli is preferred when the client accepts it and the ``brotli`` package is
+installed, gzip otherwise. Only complete (non-streaming) responses of a
+compressible type and at least ``minimum_size`` bytes are compressed, so
+server-sent event streams and small bodies pass through untouched.
+
+A strong ETag on a compressed body gets the encoding appended (``"abc-gzip"``),
+since each content-coding is a different representation; ``decoded_etag``
+strips it again so ``If-None-Match`` checks compare against the identity tag.
+"""
+
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+ENCODINGS = ("br", "gzip")
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Tag for the ``encoding`` representation of a strong ETag; weak tags are left as they are"""
+    if etag.startswith('"') and etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+def decoded_etag(etag: str) -> str:
+    """Identity tag of a tag ``encoded_etag`` may have produced"""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.startswith('"') and etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        if_none_match = request_headers.get("if-none-match", "")
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] == 304 and "etag" in headers:
+                    # Echo the tag of the representation the client revalidated
+                    etag = encoded_etag(headers["etag"], encoding)
+                    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+                        MutableHeaders(raw=message["headers"])["ETag"] = etag
+                    passthrough = True
+                    return await send(message)
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    return await send(message)
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            if message.get("more_body", False):
+                # Streaming responses are sent as they are produced
+                passthrough = True
+                await send(start_message)
+                return await send(message)
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
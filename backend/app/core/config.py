@@ -22,14 +22,164 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ADMIN_API_TOKEN: str = ""  # Empty disables admin endpoints
     
     # External APIs
     OPENWEATHER_API_KEY: str = "your-openweather-api-key"
     MARKET_DATA_API_KEY: str = "your-market-data-api-key"
+    OPENWEATHER_BASE_URL: str = "http://api.openweathermap.org/data/2.5"
+    MARKET_DATA_BASE_URL: str = "https://api.marketdata.com"
+    WEATHER_API_TIMEOUT_SECONDS: float = 5.0
+    WEATHER_FORECAST_CACHE_TTL_SECONDS: int = 600
+    GDD_BASE_TEMPERATURE: float = 10.0  # Growing degree day base, in °C
     
     # ML Models
     PEST_DETECTION_MODEL_PATH: str = "app/ml_models/pest_detection_model.h5"
     CROP_RECOMMENDATION_MODEL_PATH: str = "app/ml_models/crop_recommendation_model.pkl"
+    CROP_COMPILED_FOREST_ENABLED: bool = True
+    
+    # Crop recommendation lookup table (quantized grid over continuous inputs)
+    CROP_LOOKUP_ENABLED: bool = False
+    CROP_LOOKUP_PRECOMPUTE: bool = False
+    CROP_LOOKUP_TABLE_PATH: str = "app/ml_models/crop_recommendation_lookup.npz"
+    CROP_LOOKUP_TEMPERATURE_STEP: float = 0.5
+    CROP_LOOKUP_HUMIDITY_STEP: float = 1.0
+    CROP_LOOKUP_PH_STEP: float = 0.1
+    CROP_LOOKUP_RAINFALL_STEP: float = 25.0
+    
+    # Location-based recommendations
+    CROP_WEATHER_MAX_AGE_MINUTES: int = 180
+    CROP_CLIMATE_WINDOW_DAYS: int = 365
+    CROP_CLIMATE_MIN_DAYS: int = 30
+    
+    # Pest detection
+    PEST_DETECTION_MODEL_VERSION: str = "1.0.0"
+    PEST_GATE_MODEL_PATH: str = "app/ml_models/pest_gate_model.h5"
+    PEST_CALIBRATION_PATH: str = "app/ml_models/pest_calibration.json"
+    PEST_EMBEDDING_INDEX_DIR: str = "app/ml_models/pest_index"
+    PEST_EMBEDDING_INDEX_N_PROBE: int = 8
+    PEST_EMBEDDING_INDEX_MAX_BUFFER: int = 50000  # Detections searchable before the next rebuild
+    PEST_EMBEDDING_INDEX_CHECK_SECONDS: float = 30.0  # How often workers look for a rebuilt index
+    PEST_DEDUP_ENABLED: bool = True
+    
+    # Pest model inference (compiled per batch size, warmed up at startup)
+    PEST_INFERENCE_BATCH_SIZES: list = [1, 4, 16, 64]
+    PEST_INFERENCE_XLA: bool = False
+    PEST_WARMUP_ENABLED: bool = True
+    TF_INTRA_OP_THREADS: int = 0  # 0 keeps TensorFlow's default (all cores)
+    TF_INTER_OP_THREADS: int = 0
+    
+    # Tiled pest detection
+    PEST_TILE_OVERLAP: float = 0.25
+    PEST_TILE_MAX_TILES: int = 64
+    PEST_TILE_LATENCY_BUDGET_MS: float = 1500.0
+    
+    # Batch re-scoring
+    RESCORE_BATCH_SIZE: int = 64
+    RESCORE_WORKERS: int = 4
+    RESCORE_CHECKPOINT_PATH: str = "uploads/rescore_checkpoint.json"
+    
+    # Response serialization and compression
+    FAST_JSON_ENABLED: bool = False  # Render JSON with orjson
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Response cache for reference endpoints (L1 in-process, L2 Redis)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_L1_TTL_SECONDS: float = 5.0
+    RESPONSE_CACHE_L1_MAX_ENTRIES: int = 5000
+    RESPONSE_CACHE_MAX_AGE_SECONDS: int = 60
+    
+    # Weather alert engine
+    ALERT_ENGINE_INTERVAL_MINUTES: float = 0  # 0 disables the in-process scheduler
+    ALERT_HORIZON_HOURS: int = 48
+    ALERT_CHUNK_SIZE: int = 10000
+    ALERT_FETCH_CONCURRENCY: int = 10
+    ALERT_NOTIFICATION_SENDER: str = "log"  # log, push, none
+    
+    # Dashboard sections (cache TTLs in seconds)
+    DASHBOARD_SECTION_TIMEOUT_SECONDS: float = 2.0  # Per section, from when it starts loading
+    DASHBOARD_MAX_CONCURRENT_SECTIONS: int = 2  # Sessions one dashboard request may hold
+    DASHBOARD_REQUEST_TIMEOUT_SECONDS: float = 5.0  # Whole dashboard, including waits for a slot
+    DASHBOARD_SECTION_TTL_SECONDS: dict = {
+        "user_profile": 300,
+        "farm_statistics": 120,
+        "user_crops": 120,
+        "recent_detections": 30,
+        "weather_alerts": 60,
+        "market_updates": 600,
+        "forum_activity": 120
+    }
+    
+    # Real-time push (WebSocket / SSE)
+    PUSH_BACKEND: str = "memory"  # memory (single process), redis (across workers)
+    PUSH_QUEUE_SIZE: int = 100  # Per connection; oldest events are dropped beyond this
+    PUSH_HEARTBEAT_SECONDS: float = 15.0
+    PUSH_MAX_TOPICS_PER_CONNECTION: int = 20
+    
+    # Advisory retrieval
+    ADVISORY_INDEX_DIR: str = "app/ml_models/advisory_index"
+    ADVISORY_RETRIEVAL_TOP_K: int = 5
+    ADVISORY_INDEX_CHECK_SECONDS: float = 30.0  # How often workers look for a rebuilt index
+    ADVISORY_CONTEXT_TTL_SECONDS: int = 1800  # Roughly one conversation
+    
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = True
+    METRICS_MULTIPROC_DIR: str = ""  # Shared sample directory; required with more than one worker
+    
+    # Tracing (OpenTelemetry)
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "farmer-backend"
+    TRACING_SAMPLE_RATIO: float = 0.1  # Share of new traces recorded; incoming traceparent decisions are kept
+    TRACING_EXPORTER: str = "otlp"  # otlp, console or memory (tests)
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_EXPORT_QUEUE_SIZE: int = 2048  # Spans beyond this are dropped instead of blocking requests
+    TRACING_EXPORT_DELAY_MS: int = 2000
+    
+    # On-demand profiling (admin token required)
+    PROFILING_ENABLED: bool = True  # Honour X-Profile on requests
+    PROFILING_INTERVAL_MS: float = 5
+    PROFILING_MAX_SECONDS: int = 60
+    PROFILING_DIR: str = "/tmp/farmer_profiles"  # Request profiles, shared by all workers
+    PROFILING_MAX_STORED: int = 50
+    
+    # Admission control, per worker: lanes of at most concurrency requests plus a
+    # bounded queue; requests that would wait longer than timeout get a 503.
+    # Unlisted lanes and concurrency 0 are unlimited; "critical" (health) always is
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LANES: dict = {
+        "auth": {"concurrency": 16, "queue": 64, "timeout": 5},
+        "reference": {"concurrency": 32, "queue": 128, "timeout": 2},
+        "ml": {"concurrency": 4, "queue": 16, "timeout": 10},
+        "heavy": {"concurrency": 8, "queue": 32, "timeout": 10},
+        "default": {"concurrency": 64, "queue": 256, "timeout": 5}
+    }
+    
+    # Rate limiting: token buckets of BURST tokens refilled at RATE tokens/s, per
+    # authenticated user or else per client IP; routes cost 1-10 tokens
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "redis"  # redis (shared), memory (per worker)
+    RATE_LIMIT_USER_RATE: float = 2.0
+    RATE_LIMIT_USER_BURST: int = 120
+    RATE_LIMIT_IP_RATE: float = 5.0  # Farmers behind carrier NAT share an IP
+    RATE_LIMIT_IP_BURST: int = 300
+    RATE_LIMIT_TRUST_PROXY: bool = False  # Key by nginx's X-Real-IP; only behind the proxy
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100000  # In-process buckets kept when Redis is down
+    
+    # Deployment role: all, api (no ML routers) or ml (pest and crop models only)
+    APP_ROLE: str = "all"
+    APP_ROUTERS: list = []  # Explicit router list, overrides APP_ROLE
+    
+    # Production launcher (gunicorn.conf.py)
+    WEB_BIND: str = "0.0.0.0:8000"
+    WEB_WORKERS: int = 4
+    WEB_PRELOAD_APP: bool = True  # Load fork-safe models (not TensorFlow) once in the master and share them
+    WEB_WORKER_TIMEOUT_SECONDS: int = 60
+    WEB_MAX_REQUESTS: int = 0  # Recycle workers after this many requests; 0 disables
+    CROP_COMPILED_FOREST_DIR: str = "app/ml_models/crop_forest"
     
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
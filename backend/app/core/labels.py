@@ -0,0 +1,34 @@
+"""
+Low-cardinality labels for requests and SQL statements
+
+Shared by the metrics and tracing instrumentation so both name a request by
+its route template and a statement by its operation.
+"""
+
+from typing import Callable, Dict
+
+def statement_operation(statement: str) -> str:
+    """Leading SQL keyword of a statement (SELECT, INSERT, ...)"""
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+
+ROUTE_TEMPLATES: Dict[Callable, str] = {}
+
+def route_template(scope) -> str:
+    """Path template of the route the router matched, e.g. ``/api/forum/posts/{post_id}``
+
+    Only meaningful once the request has been routed; unmatched requests share
+    one label so 404 scans cannot blow up label cardinality.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = ROUTE_TEMPLATES.get(endpoint)
+    if template is None:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        else:
+            template = "unmatched"
+        ROUTE_TEMPLATES[endpoint] = template
+    return template
@@ -0,0 +1,61 @@
+"""
+Deferred imports and construction for heavy dependencies
+
+TensorFlow, OpenCV, pandas and scikit-learn together cost seconds of import
+time and hundreds of MB; nodes that never serve ML traffic should not pay for
+them. ``lazy_import`` returns a stand-in module that imports the real one on
+first attribute access, and ``LazyObject`` builds an object (such as a model)
+on first use.
+"""
+
+import importlib
+import threading
+import types
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self._module: Optional[types.ModuleType] = None
+
+    def _load(self) -> types.ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Module ``name``, imported on first attribute access"""
+    return LazyModule(name)
+
+class LazyObject(Generic[T]):
+    """Proxy that calls ``factory`` once, on first attribute access or ``get()``"""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instance: Optional[T] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
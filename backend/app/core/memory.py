@@ -0,0 +1,38 @@
+"""
+Process memory reporting
+"""
+
+import os
+import resource
+from typing import Dict
+
+def process_memory() -> Dict[str, float]:
+    """Resident memory of this process in MB, split into shared and private pages
+
+    ``pss`` charges each shared page to the processes sharing it, so summing it
+    over all workers gives the real footprint on the node. Outside Linux only
+    the peak RSS is available.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return {"pid": os.getpid(), "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+    return {
+        "pid": os.getpid(),
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+    }
+
+def format_memory(memory: Dict[str, float]) -> str:
+    return ", ".join(
+        f"{name} {value:.0f}MB" if name != "pid" else f"pid {value}"
+        for name, value in memory.items()
+    )
@@ -0,0 +1,208 @@
+"""
+Prometheus metrics for request, ML, database, upstream and cache hot paths
+
+Metrics are served at ``/metrics``. With several worker processes, set
+``METRICS_MULTIPROC_DIR`` so every worker writes its samples to shared files
+and any worker can serve the aggregate; the directory is wiped by the
+gunicorn master on start. Without ``prometheus_client`` installed, or with
+``METRICS_ENABLED`` off, every metric is a no-op.
+"""
+
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Tuple
+
+from app.core.config import settings
+from app.core.labels import route_template, statement_operation
+from app.core.tracing import span
+
+if settings.METRICS_ENABLED and settings.METRICS_MULTIPROC_DIR:
+    # Must be set before prometheus_client is imported
+    os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_MULTIPROC_DIR)
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+ENABLED = settings.METRICS_ENABLED and prometheus_client is not None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class NullMetric:
+    """Stands in for a metric when metrics are disabled"""
+
+    def labels(self, *args, **kwargs) -> "NullMetric":
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def time(self):
+        return nullcontext()
+
+def metric(kind: str, name: str, documentation: str, labels: Tuple[str, ...], **kwargs) -> Any:
+    if not ENABLED:
+        return NullMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labels, **kwargs)
+
+HTTP_REQUEST_SECONDS = metric(
+    "Histogram", "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"), buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = metric(
+    "Gauge", "http_requests_in_progress", "HTTP requests being handled",
+    ("method",), multiprocess_mode="livesum"
+)
+ML_STAGE_SECONDS = metric(
+    "Histogram", "ml_stage_duration_seconds", "Time per model stage (preprocess, inference, postprocess)",
+    ("model", "stage"), buckets=FAST_BUCKETS
+)
+DB_QUERY_SECONDS = metric(
+    "Histogram", "db_query_duration_seconds", "Database statement execution time",
+    ("operation",), buckets=FAST_BUCKETS
+)
+UPSTREAM_REQUEST_SECONDS = metric(
+    "Histogram", "upstream_request_duration_seconds", "Outbound HTTP request latency",
+    ("service", "status"), buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = metric(
+    "Counter", "cache_requests", "Cache lookups by result (hit, miss)",
+    ("cache", "result")
+)
+THREADPOOL_BUSY = metric(
+    "Gauge", "threadpool_busy_threads", "Worker threads in use by run_in_threadpool",
+    (), multiprocess_mode="livesum"
+)
+THREADPOOL_WAITING = metric(
+    "Gauge", "threadpool_waiting_tasks", "Tasks queued for a run_in_threadpool thread",
+    (), multiprocess_mode="livesum"
+)
+ADMISSION_IN_FLIGHT = metric(
+    "Gauge", "admission_in_flight", "Admitted requests being handled, by admission lane",
+    ("lane",), multiprocess_mode="livesum"
+)
+ADMISSION_QUEUED = metric(
+    "Gauge", "admission_queued", "Requests waiting for an admission slot",
+    ("lane",), multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_SECONDS = metric(
+    "Histogram", "admission_queue_wait_seconds", "Time queued requests waited for a slot",
+    ("lane",), buckets=LATENCY_BUCKETS
+)
+ADMISSION_SHED = metric(
+    "Counter", "admission_shed", "Requests rejected with 503 by reason (queue_full, deadline, timeout)",
+    ("lane", "reason")
+)
+RATE_LIMITED = metric(
+    "Counter", "rate_limited_requests", "Requests rejected with 429 by limit scope (user, ip)",
+    ("scope",)
+)
+RATE_LIMIT_FALLBACKS = metric(
+    "Counter", "rate_limit_redis_fallbacks", "Times the rate limiter fell back to per-process buckets",
+    ()
+)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+@contextmanager
+def stage_timer(model: str, stage: str):
+    """Context manager timing one model stage, also traced as a span"""
+    with span(f"{model}.{stage}", **{"ml.model": model, "ml.stage": stage}):
+        with ML_STAGE_SECONDS.labels(model, stage).time():
+            yield
+
+def instrument_engine(engine):
+    """Time every statement executed through a SQLAlchemy engine"""
+    if not ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(statement_operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # Failed statements skip after_cursor_execute; drop their start time
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+def sample_threadpool():
+    """Record the occupancy of the default thread pool behind run_in_threadpool"""
+    import anyio.to_thread
+
+    statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+    THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+    THREADPOOL_WAITING.set(statistics.tasks_waiting)
+
+def render_latest() -> Tuple[bytes, str]:
+    """Exposition body and content type, aggregated across workers in multi-process mode"""
+    if not ENABLED:
+        return b"", "text/plain; version=0.0.4; charset=utf-8"
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's live gauges from the multi-process aggregate"""
+    if ENABLED and "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+class MetricsMiddleware:
+    """Request latency per route template and status code
+
+    The route is resolved after the request from the endpoint the router
+    matched, so paths like ``/api/forum/posts/17`` are recorded as
+    ``/api/forum/posts/{post_id}``; unmatched requests share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        sample_threadpool()
+        HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+            HTTP_REQUEST_SECONDS.labels(method, route_template(scope), str(status["code"])).observe(
+                time.perf_counter() - started
+            )
@@ -0,0 +1,305 @@
+"""
+On-demand CPU and memory profiling for live workers
+
+``SamplingProfiler`` runs a daemon thread that reads the Python stack of every
+thread with ``sys._current_frames()`` at a fixed interval and counts identical
+stacks, giving the collapsed-stack format flamegraph tools consume. Nothing is
+sampled until a profile is requested, so profiling is safe to leave enabled:
+an admin profiles a worker for N seconds, or opts single requests in with the
+``X-Profile`` header. At most one profile runs per process.
+
+``tracemalloc`` snapshots and diffs locate Python allocations that grow over
+time, such as retained upload buffers. Native allocations (TensorFlow tensors,
+OpenCV images) are invisible to it and only show up in the process memory
+reported alongside.
+"""
+
+import functools
+import html
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.memory import process_memory
+from app.core.security import is_admin_token
+
+# Leaf functions of threads that are waiting rather than working
+IDLE_FUNCTIONS = {"select", "wait", "_worker"}
+
+profile_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def source_roots() -> List[str]:
+    return sorted({os.path.abspath(path) for path in sys.path if path}, key=len, reverse=True)
+
+@functools.lru_cache(maxsize=8192)
+def frame_label(code) -> str:
+    path = os.path.abspath(code.co_filename)
+    for root in source_roots():
+        if path.startswith(root + os.sep):
+            path = path[len(root) + 1:]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            self.sample(own_ident)
+
+    def sample(self, exclude: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == exclude:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            # Root each stack at its thread, numbered pool threads grouped together
+            stack.append(re.sub(r"\d+", "N", names.get(ident, "unknown")))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self, include_idle: bool = False) -> Dict[str, int]:
+        """Sample count per ``root;caller;...;leaf`` stack"""
+        if include_idle:
+            return dict(self.stacks)
+        return {
+            stack: count for stack, count in self.stacks.items()
+            if stack.rsplit(";", 1)[-1].split(" ", 1)[0] not in IDLE_FUNCTIONS
+        }
+
+def start_profile(interval_ms: Optional[float] = None) -> Optional[SamplingProfiler]:
+    """Start sampling, or return None when a profile is already running"""
+    if not profile_lock.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler((interval_ms or settings.PROFILING_INTERVAL_MS) / 1000)
+    profiler.start()
+    return profiler
+
+def stop_profile(profiler: SamplingProfiler):
+    try:
+        profiler.stop()
+    finally:
+        profile_lock.release()
+
+def format_collapsed(stacks: Dict[str, int]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+def flamegraph_svg(stacks: Dict[str, int], title: str = "CPU profile", width: int = 1200, row_height: int = 16) -> str:
+    """Render collapsed stacks as a static flamegraph (root at the bottom)"""
+    tree: Dict[str, Any] = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = tree
+        node["count"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += count
+
+    def depth(node) -> int:
+        return 1 + max((depth(child) for child in node["children"].values()), default=0)
+
+    total = tree["count"] or 1
+    rows = depth(tree) - 1
+    header = 24
+    height = header + max(rows, 1) * row_height
+    boxes: List[str] = []
+
+    def layout(node, x: float, level: int):
+        for name, child in sorted(node["children"].items()):
+            box_width = child["count"] / total * width
+            if box_width < 0.5:
+                x += box_width
+                continue
+            y = height - (level + 1) * row_height
+            hue = 10 + sum(map(ord, name.split(" ", 1)[0])) % 45
+            label = html.escape(name)
+            tip = f"{label} ({child['count']} samples, {child['count'] / total:.1%})"
+            text = html.escape(name[:int(box_width / 7)]) if box_width > 21 else ""
+            boxes.append(
+                f'<g><title>{tip}</title>'
+                f'<rect x="{x:.1f}" y="{y}" width="{box_width:.1f}" height="{row_height - 1}" '
+                f'fill="hsl({hue},90%,60%)" rx="2"/>'
+                f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{text}</text></g>'
+            )
+            layout(child, x, level + 1)
+            x += box_width
+
+    layout(tree, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<text x="{width / 2}" y="16" text-anchor="middle" font-size="14">'
+        f'{html.escape(title)} ({sum(stacks.values())} samples)</text>'
+        + "".join(boxes) + "</svg>"
+    )
+
+def profile_path(profile_id: str) -> str:
+    return os.path.join(settings.PROFILING_DIR, f"{profile_id}.folded")
+
+def save_profile(profile_id: str, stacks: Dict[str, int]):
+    """Store a request profile where every worker can serve it, keeping the newest few"""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    tmp_path = profile_path(profile_id) + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(format_collapsed(stacks))
+    os.replace(tmp_path, profile_path(profile_id))
+
+    try:
+        profiles = sorted(
+            (entry for entry in os.scandir(settings.PROFILING_DIR) if entry.name.endswith(".folded")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        for entry in profiles[settings.PROFILING_MAX_STORED:]:
+            os.remove(entry.path)
+    except FileNotFoundError:
+        pass  # Pruned concurrently by another worker
+
+def load_profile(profile_id: str) -> Optional[Dict[str, int]]:
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+    try:
+        with open(profile_path(profile_id)) as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+    return {stack: int(count) for stack, count in (line.rsplit(" ", 1) for line in lines if line)}
+
+# tracemalloc snapshots of this process: the first is the baseline for diffs
+memory_snapshots: List[tracemalloc.Snapshot] = []
+
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>")
+]
+
+def start_memory_tracing(frames: int):
+    if not tracemalloc.is_tracing():
+        memory_snapshots.clear()
+        tracemalloc.start(frames)
+
+def stop_memory_tracing():
+    tracemalloc.stop()
+    memory_snapshots.clear()
+
+def take_memory_snapshot() -> tracemalloc.Snapshot:
+    """Snapshot allocations; the first becomes the baseline, later ones replace the latest"""
+    snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+    if len(memory_snapshots) < 2:
+        memory_snapshots.append(snapshot)
+    else:
+        memory_snapshots[1] = snapshot
+    return snapshot
+
+def statistic_location(traceback: tracemalloc.Traceback) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+def memory_top(snapshot: tracemalloc.Snapshot, group_by: str, limit: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "location": statistic_location(stat.traceback),
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count
+        }
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+def memory_diff(group_by: str, limit: int) -> List[Dict[str, Any]]:
+    """Largest allocation growth from the baseline snapshot to the latest"""
+    baseline, latest = memory_snapshots[0], memory_snapshots[-1]
+    return [
+        {
+            "location": statistic_location(stat.traceback),
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff
+        }
+        for stat in latest.compare_to(baseline, group_by)[:limit]
+    ]
+
+def memory_summary() -> Dict[str, Any]:
+    """Process memory plus traced Python memory, and TensorFlow's if it is loaded"""
+    summary: Dict[str, Any] = {"process_mb": process_memory(), "tracing": tracemalloc.is_tracing()}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        summary["traced_mb"] = {"current": round(current / 2 ** 20, 1), "peak": round(peak / 2 ** 20, 1)}
+    if "tensorflow" in sys.modules:
+        try:
+            info = sys.modules["tensorflow"].config.experimental.get_memory_info("CPU:0")
+            summary["tensorflow_mb"] = {name: round(value / 2 ** 20, 1) for name, value in info.items()}
+        except (ValueError, RuntimeError):
+            pass  # Not tracked by every device/allocator
+    return summary
+
+class ProfilingMiddleware:
+    """Profile single requests that send ``X-Profile: 1`` with a valid admin token
+
+    The whole process is sampled while the request runs, so concurrent requests
+    appear in the profile too. The folded stacks are saved under
+    ``PROFILING_DIR`` and the response names them in ``X-Profile-Id``; when
+    another profile is already running the request is served unprofiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") not in (b"1", b"true") or not is_admin_token(
+            headers.get(b"x-admin-token", b"").decode("latin-1")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = start_profile()
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_profile(profiler)
+            await run_in_threadpool(save_profile, profile_id, profiler.collapsed())
@@ -0,0 +1,238 @@
+"""
+Topic-based publish/subscribe for real-time push to clients
+
+Each connection owns a bounded ``Subscription`` queue registered under the
+topics it follows (``user:42``, ``location:pune``, ``crop:7``,
+``forum_post:311``, ``forum_category:pest control``). With the ``memory``
+backend a publish is delivered straight to this process's subscribers; with
+the ``redis`` backend it is published to Redis and every worker's listener
+delivers it to its own subscribers, so clients connected to any worker see
+events raised on any other (or by a cron job).
+
+A slow consumer never blocks publishers: when its queue is full the oldest
+event is dropped and counted.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TOPIC_KINDS = ("user", "location", "crop", "forum_post", "forum_category")
+# Keys may hold commas, as in "location:pune, maharashtra"
+TOPIC_PATTERN = re.compile(r"^(%s):[\w\- .,]{1,100}$" % "|".join(TOPIC_KINDS))
+CHANNEL_PREFIX = "push:"
+
+def normalize_topic(topic: str) -> Optional[str]:
+    """Canonical (lower-case, trimmed) topic name, or ``None`` if invalid"""
+    kind, _, key = topic.strip().partition(":")
+    topic = f"{kind.lower()}:{key.strip().lower()}"
+    return topic if TOPIC_PATTERN.match(topic) else None
+
+class Subscription:
+    def __init__(self, broker: "PubSubBroker", max_queue: int):
+        self.broker = broker
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.topics: Set[str] = set()
+        self.dropped = 0
+
+    def deliver(self, event: Dict[str, Any]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.broker.stats["dropped"] += 1
+        self.queue.put_nowait(event)
+
+    def subscribe(self, topics: Iterable[str]) -> Set[str]:
+        return self.broker.subscribe(self, topics)
+
+    def unsubscribe(self, topics: Iterable[str]):
+        self.broker.unsubscribe(self, topics)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or ``None`` if nothing arrives within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.disconnect(self)
+
+class PubSubBroker:
+    def __init__(self, backend: str = "memory", redis_url: Optional[str] = None, max_queue: int = 100):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown push backend: {backend}")
+        self.backend = backend
+        self.redis_url = redis_url
+        self.max_queue = max_queue
+        self.topics: Dict[str, Set[Subscription]] = {}
+        self.connections: Set[Subscription] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.redis = None
+        self.sync_redis = None
+        self.listener: Optional[asyncio.Task] = None
+        self.latencies = deque(maxlen=1000)
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+        self.lock = threading.Lock()
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.backend == "redis":
+            self.redis = aioredis.from_url(self.redis_url)
+            self.listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
+        self.loop = None
+
+    def connect(self) -> Subscription:
+        subscription = Subscription(self, self.max_queue)
+        self.connections.add(subscription)
+        return subscription
+
+    def disconnect(self, subscription: Subscription):
+        self.unsubscribe(subscription, list(subscription.topics))
+        self.connections.discard(subscription)
+
+    def subscribe(self, subscription: Subscription, topics: Iterable[str]) -> Set[str]:
+        """Subscribe to valid topics up to the per-connection limit; returns those added"""
+        added = set()
+        for topic in topics:
+            topic = normalize_topic(topic)
+            if topic is None or topic in subscription.topics:
+                continue
+            if len(subscription.topics) >= settings.PUSH_MAX_TOPICS_PER_CONNECTION:
+                break
+            subscription.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(subscription)
+            added.add(topic)
+        return added
+
+    def unsubscribe(self, subscription: Subscription, topics: Iterable[str]):
+        for topic in topics:
+            topic = normalize_topic(topic)
+            if topic is None:
+                continue
+            subscription.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def _fan_out(self, event: Dict[str, Any]):
+        subscribers = self.topics.get(event["topic"])
+        if subscribers:
+            for subscription in list(subscribers):
+                subscription.deliver(event)
+            self.stats["delivered"] += len(subscribers)
+        self.latencies.append(time.time() - event["published_at"])
+
+    async def publish(self, topic: str, event_type: str, data: Any) -> bool:
+        """Publish an event to a topic; returns False for an invalid topic"""
+        name, topic = topic, normalize_topic(topic)
+        if topic is None:
+            logger.warning(f"Dropped {event_type} event for invalid topic {name!r}")
+            return False
+
+        event = {"topic": topic, "type": event_type, "data": data, "published_at": time.time()}
+        self.stats["published"] += 1
+        if self.backend == "redis":
+            try:
+                await self.redis.publish(CHANNEL_PREFIX + topic, json.dumps(event, default=str))
+                return True
+            except (aioredis.RedisError, OSError) as e:
+                logger.warning(f"Redis publish failed, delivering locally only: {e}")
+        self._fan_out(event)
+        return True
+
+    async def publish_many(self, events: Iterable[Tuple[str, str, Any]]) -> int:
+        """Publish ``(topic, event_type, data)`` events in order; returns how many were published"""
+        published = 0
+        for topic, event_type, data in events:
+            published += await self.publish(topic, event_type, data)
+        return published
+
+    def publish_many_threadsafe(self, events: List[Tuple[str, str, Any]]) -> int:
+        """Publish from a worker thread, or from a process without a running broker
+
+        Waits until the batch is published, so callers sending many events
+        in batches never queue more than one batch on the event loop. Returns
+        how many events were published: none with the ``memory`` backend
+        outside a running server, where nobody could receive them.
+        """
+        if self.loop is not None:
+            return asyncio.run_coroutine_threadsafe(self.publish_many(events), self.loop).result()
+        if self.backend != "redis":
+            return 0
+
+        with self.lock:
+            if self.sync_redis is None:
+                self.sync_redis = redis.Redis.from_url(self.redis_url)
+        pipeline = self.sync_redis.pipeline(transaction=False)
+        published = 0
+        for topic, event_type, data in events:
+            topic = normalize_topic(topic)
+            if topic is None:
+                continue
+            event = {"topic": topic, "type": event_type, "data": data, "published_at": time.time()}
+            pipeline.publish(CHANNEL_PREFIX + topic, json.dumps(event, default=str))
+            published += 1
+        try:
+            pipeline.execute()
+        except (redis.RedisError, OSError) as e:
+            logger.warning(f"Redis publish failed: {e}")
+            return 0
+        return published
+
+    async def _listen(self):
+        """Deliver events published by any process to local subscribers"""
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._fan_out(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Push listener lost Redis, reconnecting: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "backend": self.backend,
+            "connections": len(self.connections),
+            "topics": len(self.topics),
+            "subscriptions": sum(len(subscribers) for subscribers in self.topics.values()),
+            **self.stats,
+            "fan_out_latency_ms": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max())
+            }
+        }
+
+broker = PubSubBroker(settings.PUSH_BACKEND, settings.REDIS_URL, settings.PUSH_QUEUE_SIZE)
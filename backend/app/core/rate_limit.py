@@ -0,0 +1,218 @@
+"""
+Per-user and per-IP rate limiting with token buckets
+
+Each client owns a bucket of ``burst`` tokens refilled at ``rate`` tokens per
+second, and every request takes tokens according to its route: an ML call or
+an OpenWeather-backed read costs more than a forum page. Authenticated
+requests are keyed by the user in their verified JWT; anonymous ones by client
+IP, with a more generous bucket because farmers on carrier NAT share addresses.
+Health checks, metrics, admin endpoints and real-time streams are never limited.
+
+Buckets live in Redis and are updated by one Lua script (EVALSHA), so every
+worker and instance shares them, refill uses the Redis clock, and a request
+costs one round trip. If Redis is unreachable, buckets fall back to process
+memory (limits then apply per worker) and Redis is retried after a back-off.
+
+Responses carry ``RateLimit-Limit``, ``RateLimit-Remaining``,
+``RateLimit-Reset`` and ``RateLimit-Policy``; rejected requests get a 429
+with ``Retry-After``.
+"""
+
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_FALLBACKS, RATE_LIMITED
+from app.core.security import bearer_user
+
+logger = logging.getLogger(__name__)
+
+REDIS_RETRY_SECONDS = 30.0
+
+# Tokens taken per request, first match wins; 0 exempts the route
+ROUTE_COSTS: Tuple[Tuple[int, str, "re.Pattern"], ...] = tuple(
+    (cost, method, re.compile(pattern)) for cost, method, pattern in (
+        (0, "*", r"/(api/health|metrics)?"),
+        (0, "*", r"/api/admin/.*"),
+        (0, "GET", r"/api/realtime/.*"),
+        (10, "POST", r"/api/pests/detect"),
+        (5, "POST", r"/api/crops/recommend(/for-location)?"),
+        (5, "POST", r"/api/advisory/chat(/stream)?"),
+        (3, "GET", r"/api/market/analysis/[^/]+"),
+        (3, "POST", r"/api/auth/(login|register)"),
+        (2, "GET", r"/api/weather/(current|forecast)/[^/]+"),
+        (2, "GET", r"/api/market/prices")
+    )
+)
+
+# KEYS[1] bucket; ARGV cost, rate (tokens/s), burst.
+# Returns allowed, whole tokens remaining, ms until full, ms until the cost is available.
+# Reading TIME before writing relies on effect replication, the default since Redis 5
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2]) / 1000
+local burst = tonumber(ARGV[3])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = math.ceil((cost - tokens) / rate)
+end
+
+local full_in = math.ceil((burst - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], full_in + 1000)
+return {allowed, math.floor(tokens), full_in, wait}
+"""
+
+def route_cost(method: str, path: str) -> int:
+    for cost, cost_method, pattern in ROUTE_COSTS:
+        if (cost_method == "*" or cost_method == method) and pattern.fullmatch(path):
+            return cost
+    return 1
+
+class LocalBuckets:
+    """In-process token buckets, least recently used evicted beyond ``max_keys``"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str, cost: int, rate: float, burst: int) -> Tuple[int, int, int, int]:
+        """Same result as the Lua script: allowed, remaining, ms until full, ms until allowed"""
+        now = time.monotonic() * 1000
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(burst), now]
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate / 1000)
+
+        allowed, wait = 0, 0
+        if tokens >= cost:
+            tokens -= cost
+            allowed = 1
+        else:
+            wait = math.ceil((cost - tokens) * 1000 / rate)
+        bucket[0], bucket[1] = tokens, now
+        return allowed, int(tokens), math.ceil((burst - tokens) * 1000 / rate), wait
+
+class RateLimiter:
+    def __init__(self, redis_url: Optional[str], max_local_keys: int):
+        self.redis_url = redis_url
+        self.local = LocalBuckets(max_local_keys)
+        self.redis = None
+        self.script = None
+        self.redis_retry_at = 0.0
+
+    def _client(self):
+        if self.redis_url and self.redis is None and time.monotonic() >= self.redis_retry_at:
+            self.redis = aioredis.from_url(self.redis_url, socket_timeout=0.1, socket_connect_timeout=0.1)
+            self.script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+        return self.redis
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"Rate limiter falling back to per-process buckets: {e}")
+        RATE_LIMIT_FALLBACKS.inc()
+        self.redis = None
+        self.redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    async def take(self, key: str, cost: int, rate: float, burst: int) -> Tuple[int, int, int, int]:
+        if self._client() is not None:
+            try:
+                allowed, remaining, full_in, wait = await self.script(keys=[key], args=[cost, rate, burst])
+                return int(allowed), int(remaining), int(full_in), int(wait)
+            except (aioredis.RedisError, OSError) as e:
+                self._redis_failed(e)
+        return self.local.take(key, cost, rate, burst)
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+
+rate_limiter = RateLimiter(
+    settings.REDIS_URL if settings.RATE_LIMIT_BACKEND == "redis" else None,
+    settings.RATE_LIMIT_LOCAL_MAX_KEYS
+)
+
+def client_ip(scope, headers: dict) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY and b"x-real-ip" in headers:
+        return headers[b"x-real-ip"].decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RateLimitMiddleware:
+    """Take each request's route cost from its client's bucket, or answer 429"""
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+        self.policies = {
+            "user": (settings.RATE_LIMIT_USER_RATE, settings.RATE_LIMIT_USER_BURST),
+            "ip": (settings.RATE_LIMIT_IP_RATE, settings.RATE_LIMIT_IP_BURST)
+        }
+        self.policy_headers = {
+            scope: (
+                (b"ratelimit-limit", str(burst).encode()),
+                (b"ratelimit-policy", f"{burst};w={math.ceil(burst / rate)}".encode())
+            )
+            for scope, (rate, burst) in self.policies.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cost = route_cost(scope["method"], scope["path"])
+        if not cost:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        authorization = headers.get(b"authorization", b"")
+        user_id = bearer_user(authorization.decode("latin-1"))
+        if user_id is not None:
+            limit_scope, key = "user", f"ratelimit:user:{user_id}"
+        else:
+            limit_scope, key = "ip", f"ratelimit:ip:{client_ip(scope, headers)}"
+        rate, burst = self.policies[limit_scope]
+
+        allowed, remaining, full_in, wait = await self.limiter.take(key, cost, rate, burst)
+        rate_headers = [
+            *self.policy_headers[limit_scope],
+            (b"ratelimit-remaining", str(remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(full_in / 1000)).encode())
+        ]
+
+        if not allowed:
+            RATE_LIMITED.labels(limit_scope).inc()
+            response = JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
+            response.raw_headers.extend([*rate_headers, (b"retry-after", str(math.ceil(wait / 1000)).encode())])
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *rate_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
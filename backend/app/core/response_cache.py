@@ -0,0 +1,197 @@
+"""
+Two-level response cache for read-mostly reference endpoints
+
+Rendered JSON bodies are cached in-process (L1) and in Redis (L2) under keys
+built from the route namespace, the namespace's current version, the request
+path and its sorted query parameters. Writes invalidate a whole namespace by
+bumping its version, which is shared through Redis; each process re-reads
+versions at most every ``RESPONSE_CACHE_L1_TTL_SECONDS``, which bounds how
+long another process can serve an L1 entry from before the bump.
+
+Every cached body carries a strong ETag, so clients revalidating with
+``If-None-Match`` get a body-less 304.
+
+If Redis is unreachable the cache keeps working with L1 and process-local
+versions and retries Redis after a back-off.
+"""
+
+import functools
+import hashlib
+import inspect
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import redis.asyncio as aioredis
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.cache import TTLCache
+from app.core.compression import decoded_etag
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.core.responses import AppJSONResponse
+
+logger = logging.getLogger(__name__)
+
+REDIS_RETRY_SECONDS = 30.0
+
+class ResponseCache:
+    def __init__(self, redis_url: str, l1_ttl: float, l1_max_entries: int):
+        self.redis_url = redis_url
+        self.l1_ttl = l1_ttl
+        self.l1 = TTLCache(max_entries=l1_max_entries)
+        self.versions = TTLCache()
+        self.local_versions: Dict[str, int] = {}
+        self.redis = None
+        self.redis_retry_at = 0.0
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "not_modified": 0}
+
+    def _client(self):
+        if self.redis is None and time.monotonic() >= self.redis_retry_at:
+            self.redis = aioredis.from_url(self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        return self.redis
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"Response cache falling back to in-process only: {e}")
+        self.redis = None
+        self.redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    async def get_version(self, namespace: str) -> int:
+        found, version = self.versions.get(namespace)
+        if found:
+            return version
+
+        version = self.local_versions.get(namespace, 0)
+        client = self._client()
+        if client is not None:
+            try:
+                stored = await client.get(f"respcache:version:{namespace}")
+                version = max(version, int(stored or 0))
+            except (aioredis.RedisError, OSError) as e:
+                self._redis_failed(e)
+
+        self.versions.set(namespace, version, self.l1_ttl)
+        return version
+
+    async def invalidate(self, namespace: str) -> int:
+        """Bump a namespace's version so every cached response in it is bypassed"""
+        version = self.local_versions.get(namespace, 0) + 1
+        client = self._client()
+        if client is not None:
+            try:
+                version = max(version, int(await client.incr(f"respcache:version:{namespace}")))
+            except (aioredis.RedisError, OSError) as e:
+                self._redis_failed(e)
+
+        self.local_versions[namespace] = version
+        self.versions.set(namespace, version, self.l1_ttl)
+        return version
+
+    async def get(self, key: str) -> Tuple[Optional[Tuple[str, bytes]], str]:
+        """Return ((etag, body) or None, cache level that answered)"""
+        found, entry = self.l1.get(key)
+        if found:
+            self.stats["l1_hits"] += 1
+            record_cache("response", True)
+            return entry, "L1"
+
+        client = self._client()
+        if client is not None:
+            try:
+                stored = await client.get(key)
+            except (aioredis.RedisError, OSError) as e:
+                self._redis_failed(e)
+                stored = None
+            if stored is not None:
+                etag, body = stored.split(b"\n", 1)
+                entry = (etag.decode(), body)
+                self.l1.set(key, entry, self.l1_ttl)
+                self.stats["l2_hits"] += 1
+                record_cache("response", True)
+                return entry, "L2"
+
+        self.stats["misses"] += 1
+        record_cache("response", False)
+        return None, "MISS"
+
+    async def set(self, key: str, body: bytes, ttl: int) -> str:
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.l1.set(key, (etag, body), min(ttl, self.l1_ttl))
+
+        client = self._client()
+        if client is not None:
+            try:
+                await client.set(key, etag.encode() + b"\n" + body, ex=ttl)
+            except (aioredis.RedisError, OSError) as e:
+                self._redis_failed(e)
+        return etag
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
+
+response_cache = ResponseCache(
+    settings.REDIS_URL,
+    l1_ttl=settings.RESPONSE_CACHE_L1_TTL_SECONDS,
+    l1_max_entries=settings.RESPONSE_CACHE_L1_MAX_ENTRIES
+)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Tags of compressed representations match the identity tag they were derived from
+    tags = [decoded_etag(tag.strip()) for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def cached_response(namespace: str, ttl: Optional[int] = None) -> Callable:
+    """Cache a GET endpoint's JSON response under ``namespace``
+
+    The endpoint runs only on a miss; its result is rendered the way FastAPI
+    would render it and stored with a strong ETag. Exceptions, including
+    ``HTTPException``, pass through uncached.
+    """
+    ttl = ttl or settings.RESPONSE_CACHE_TTL_SECONDS
+
+    def decorator(endpoint: Callable) -> Callable:
+        signature = inspect.signature(endpoint)
+        takes_request = "request" in signature.parameters
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, request: Request, **kwargs):
+            if takes_request:
+                kwargs["request"] = request
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return await endpoint(*args, **kwargs)
+
+            version = await response_cache.get_version(namespace)
+            query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+            key = f"respcache:{namespace}:{version}:{request.url.path}?{query}"
+
+            entry, level = await response_cache.get(key)
+            if entry is None:
+                content = await endpoint(*args, **kwargs)
+                body = AppJSONResponse(content=jsonable_encoder(content)).body
+                etag = await response_cache.set(key, body, ttl)
+            else:
+                etag, body = entry
+
+            headers = {
+                "ETag": etag,
+                "Cache-Control": f"public, max-age={settings.RESPONSE_CACHE_MAX_AGE_SECONDS}",
+                "X-Cache": level
+            }
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                response_cache.stats["not_modified"] += 1
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        if not takes_request:
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            ])
+        return wrapper
+
+    return decorator
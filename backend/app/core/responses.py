@@ -0,0 +1,106 @@
+"""
+Default JSON response class with fast serialization and field selection
+
+``AppJSONResponse`` renders with orjson when ``FAST_JSON_ENABLED`` is set and
+orjson is installed, and with the standard library otherwise (byte-for-byte
+what Starlette's ``JSONResponse`` produces). Both paths honour the
+``?fields=`` query parameter captured by ``FieldSelectionMiddleware``.
+"""
+
+import json
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.datastructures import QueryParams
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FieldTree = Dict[str, "FieldTree"]
+
+requested_fields: ContextVar[Optional[FieldTree]] = ContextVar("requested_fields", default=None)
+
+def parse_fields(spec: Optional[str]) -> Optional[FieldTree]:
+    """Parse ``a,b.c,b.d`` into ``{"a": {}, "b": {"c": {}, "d": {}}}``"""
+    if not spec:
+        return None
+    tree: FieldTree = {}
+    for path in spec.split(","):
+        node = tree
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return tree or None
+
+def select_fields(data: Any, tree: Optional[FieldTree]) -> Any:
+    """Keep only the selected keys; lists are filtered element by element
+
+    An empty subtree keeps the whole value, and keys that are not present
+    are skipped rather than reported.
+    """
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: select_fields(data[key], subtree) for key, subtree in tree.items() if key in data}
+    return data
+
+class AppJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        content = select_fields(content, requested_fields.get())
+        if settings.FAST_JSON_ENABLED and orjson is not None:
+            # Types orjson does not know (ORM rows, pydantic models) go through FastAPI's encoder
+            return orjson.dumps(
+                content,
+                default=jsonable_encoder,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":")
+        ).encode("utf-8")
+
+def fast_json_response(content: Any) -> Any:
+    """Return large payloads without FastAPI's ``jsonable_encoder`` pass
+
+    ``jsonable_encoder`` walks every value in Python before rendering and
+    costs several times the serialization itself. With orjson enabled the
+    raw content is rendered directly; otherwise it is returned unchanged for
+    FastAPI to encode as usual. Only for endpoints without a ``response_model``.
+    """
+    if settings.FAST_JSON_ENABLED and orjson is not None:
+        return AppJSONResponse(content=content)
+    return content
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+class FieldSelectionMiddleware:
+    """Expose ``?fields=`` to ``AppJSONResponse`` for the current request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        fields = parse_fields(QueryParams(scope.get("query_string", b"")).get("fields"))
+        token = requested_fields.set(fields)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            requested_fields.reset(token)
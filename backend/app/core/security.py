@@ -0,0 +1,52 @@
+"""
+Security dependencies shared across routers
+"""
+
+import hmac
+import time
+from typing import Optional
+from fastapi import Header, HTTPException, status
+from jose import JWTError, jwt
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Verified user per bearer token; None for invalid tokens
+token_users = TTLCache(max_entries=50000)
+
+def token_user(token: str) -> Optional[str]:
+    """User id (the JWT subject) of a valid access token, cached until it expires"""
+    found, user_id = token_users.get(token)
+    if found:
+        return user_id
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        user_id = payload.get("sub")
+        ttl = min(300.0, max(0.0, payload.get("exp", 0) - time.time())) if user_id else 300.0
+    except JWTError:
+        user_id, ttl = None, 300.0
+    token_users.set(token, user_id, ttl)
+    return user_id
+
+def bearer_user(authorization: Optional[str]) -> Optional[str]:
+    """User id from an ``Authorization: Bearer`` header value, or ``None``"""
+    if not authorization or authorization[:7].lower() != "bearer ":
+        return None
+    return token_user(authorization[7:])
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Whether ``token`` matches the configured admin token (never when none is set)"""
+    return bool(settings.ADMIN_API_TOKEN and token and hmac.compare_digest(token, settings.ADMIN_API_TOKEN))
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only when it carries the configured admin token"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled"
+        )
+    
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
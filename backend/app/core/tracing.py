@@ -0,0 +1,187 @@
+"""
+OpenTelemetry tracing for requests, database statements, upstream calls and model stages
+
+Every request gets a server span named after its route template, with child
+spans for each SQL statement, OpenWeather and market API call and model stage,
+so a slow ``/api/market/analysis/{location}`` or ``/api/advisory/chat`` shows
+which call took the time. The trace ID is returned in ``X-Trace-Id`` on every
+response and an incoming W3C ``traceparent`` header continues the caller's trace.
+
+Root spans are sampled at ``TRACING_SAMPLE_RATIO``; child spans and requests
+arriving with a ``traceparent`` follow the parent's decision. Finished spans
+are queued and exported from a background thread, so the request path only
+pays for recording them; when the queue is full spans are dropped rather than
+blocking. ``TRACING_EXPORTER`` selects ``otlp`` (OTLP/HTTP), ``console`` or
+``memory``, which keeps spans in ``memory_exporter`` for tests. Without the
+OpenTelemetry SDK installed, or with ``TRACING_ENABLED`` off, spans are no-ops.
+"""
+
+import logging
+from contextlib import nullcontext
+from typing import Any, MutableMapping
+
+from app.core.config import settings
+from app.core.labels import route_template, statement_operation
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = settings.TRACING_ENABLED and trace is not None
+
+tracer = None
+provider = None
+memory_exporter = None
+
+def create_exporter(name: str):
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "memory":
+        return InMemorySpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER {name!r}, expected otlp, console or memory")
+
+def setup_tracing():
+    """Install the tracer provider; safe to call more than once
+
+    Called at import of ``main``. Under gunicorn with ``preload_app`` this runs
+    in the master, and the SDK restarts the export thread in each forked worker.
+    """
+    global tracer, provider, memory_exporter
+    if not ENABLED or tracer is not None:
+        return
+
+    exporter = create_exporter(settings.TRACING_EXPORTER)
+    if isinstance(exporter, InMemorySpanExporter):
+        # Synchronous, so tests see spans as soon as they end
+        memory_exporter = exporter
+        processor = SimpleSpanProcessor(exporter)
+    else:
+        processor = BatchSpanProcessor(
+            exporter,
+            max_queue_size=settings.TRACING_EXPORT_QUEUE_SIZE,
+            schedule_delay_millis=settings.TRACING_EXPORT_DELAY_MS
+        )
+
+    provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": settings.TRACING_SERVICE_NAME,
+            "deployment.role": settings.APP_ROLE
+        }),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO))
+    )
+    provider.add_span_processor(processor)
+    trace.set_tracer_provider(provider)
+    tracer = provider.get_tracer("farmer")
+    logger.info(
+        f"Tracing enabled: exporter={settings.TRACING_EXPORTER}, sample_ratio={settings.TRACING_SAMPLE_RATIO}"
+    )
+
+def shutdown_tracing():
+    """Flush queued spans and stop the export thread"""
+    if provider is not None:
+        provider.shutdown()
+
+def span(name: str, **attributes: Any):
+    """Context manager recording a child span of the current span"""
+    if tracer is None:
+        return nullcontext()
+    return tracer.start_as_current_span(name, attributes=attributes or None)
+
+def client_span(name: str, **attributes: Any):
+    """Like ``span`` but marked as an outbound call"""
+    if tracer is None:
+        return nullcontext()
+    return tracer.start_as_current_span(name, kind=SpanKind.CLIENT, attributes=attributes or None)
+
+def inject_context(headers: MutableMapping[str, str]):
+    """Add ``traceparent`` for the current span to outgoing request headers"""
+    if tracer is not None:
+        propagate.inject(headers)
+
+def trace_engine(engine):
+    """Record a span per statement executed through a SQLAlchemy engine"""
+    if not ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if tracer is None:
+            return
+        operation = statement_operation(statement)
+        db_span = tracer.start_span(
+            f"db {operation}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": engine.dialect.name,
+                "db.operation": operation,
+                "db.statement": statement  # bound parameters are never included
+            }
+        )
+        conn.info.setdefault("trace_spans", []).append(db_span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("trace_spans"):
+            conn.info["trace_spans"].pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("trace_spans"):
+            db_span = context.connection.info["trace_spans"].pop()
+            db_span.record_exception(context.original_exception)
+            db_span.set_status(Status(StatusCode.ERROR))
+            db_span.end()
+
+class TracingMiddleware:
+    """Server span per request, with the trace ID returned in ``X-Trace-Id``
+
+    The span is named ``METHOD /route/{template}`` once routing has resolved
+    the endpoint, so spans group like the latency metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        with tracer.start_as_current_span(
+            method,
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.method": method, "http.target": scope["path"]}
+        ) as server_span:
+            trace_id = format(server_span.get_span_context().trace_id, "032x").encode("latin-1")
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    server_span.set_attribute("http.status_code", status_code)
+                    if status_code >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
+                    message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                server_span.update_name(f"{method} {route}")
+                server_span.set_attribute("http.route", route)
@@ -0,0 +1,46 @@
+"""
+HTTP clients for upstream APIs (OpenWeather, market data)
+
+``upstream_client`` returns an ``httpx.AsyncClient`` whose transport times
+every request per upstream service, so slow third parties show up in
+``upstream_request_duration_seconds`` rather than only in route latency.
+Each request is also traced as a client span and carries ``traceparent``.
+Clients are short-lived, but they all share one SSL context: building one
+loads the CA bundle and costs ~16ms of event-loop time per client.
+"""
+
+import time
+
+import httpx
+
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS
+from app.core.tracing import client_span, inject_context
+
+ssl_context = httpx.create_ssl_context()
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, service: str, **kwargs):
+        kwargs.setdefault("verify", ssl_context)
+        super().__init__(**kwargs)
+        self.service = service
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        with client_span(
+            f"{self.service} {request.method}",
+            **{"peer.service": self.service, "http.method": request.method, "http.url": str(request.url.copy_with(query=None))}
+        ) as upstream_span:
+            inject_context(request.headers)
+            try:
+                response = await super().handle_async_request(request)
+                status = str(response.status_code)
+                if upstream_span is not None:
+                    upstream_span.set_attribute("http.status_code", response.status_code)
+                return response
+            finally:
+                UPSTREAM_REQUEST_SECONDS.labels(self.service, status).observe(time.perf_counter() - started)
+
+def upstream_client(service: str, **kwargs) -> httpx.AsyncClient:
+    """``httpx.AsyncClient`` instrumented as ``service``; kwargs go to the client"""
+    return httpx.AsyncClient(transport=InstrumentedTransport(service), **kwargs)
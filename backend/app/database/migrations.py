@@ -0,0 +1,88 @@
+"""
+Idempotent schema upgrades for existing databases
+
+``Base.metadata.create_all`` creates missing tables but never alters existing
+ones, so a column added to a model later is missing from every database
+created before it. ``upgrade_schema`` creates missing tables, then adds
+missing nullable columns (existing rows get NULL) and their indexes; missing
+NOT NULL columns are only reported. It changes nothing on an up-to-date
+database, so it runs on every start, and tolerates several workers upgrading
+at once.
+
+Usage:
+    python -m app.database.migrations
+"""
+
+import importlib
+import logging
+from typing import Iterator, Tuple
+
+from sqlalchemy import Column, Table, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.database.connection import Base
+
+logger = logging.getLogger(__name__)
+
+MODEL_MODULES = ("crop", "forum", "market", "pest", "user", "weather")
+
+def missing_columns(engine: Engine) -> Iterator[Tuple[Table, Column]]:
+    """Model columns absent from tables that already exist"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                yield table, column
+
+def column_exists(engine: Engine, table: Table, column: Column) -> bool:
+    return any(existing["name"] == column.name for existing in inspect(engine).get_columns(table.name))
+
+def add_column(engine: Engine, table: Table, column: Column):
+    with engine.begin() as connection:
+        quote = connection.dialect.identifier_preparer.quote
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+
+def upgrade_schema(engine: Engine) -> int:
+    """Bring the database up to the models; returns the number of columns added"""
+    Base.metadata.create_all(bind=engine)
+
+    added = 0
+    for table, column in list(missing_columns(engine)):
+        if not column.nullable:
+            logger.error(f"Column {table.name}.{column.name} is NOT NULL and must be added by hand")
+            continue
+        try:
+            add_column(engine, table, column)
+            added += 1
+            logger.info(f"Added column {table.name}.{column.name}")
+        except (OperationalError, ProgrammingError):
+            # Another worker added it first
+            if not column_exists(engine, table, column):
+                raise
+
+        for index in table.indexes:
+            if column.name in index.columns:
+                try:
+                    index.create(bind=engine, checkfirst=True)
+                except (OperationalError, ProgrammingError):
+                    if index.name not in {existing["name"] for existing in inspect(engine).get_indexes(table.name)}:
+                        raise
+    return added
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    from app.database.connection import engine
+
+    for name in MODEL_MODULES:
+        importlib.import_module(f"app.models.{name}")
+    added = upgrade_schema(engine)
+    logger.info(f"Schema up to date ({added} columns added)")
+
+if __name__ == "__main__":
+    main()
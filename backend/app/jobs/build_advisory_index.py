@@ -0,0 +1,103 @@
+"""
+Rebuild the advisory retrieval index from forum threads and knowledge-base articles
+
+Each active forum post is indexed together with its comments (the answers);
+knowledge-base articles are read from a JSON file holding a list of
+``{"id", "title", "content", "category"}`` objects. Run periodically, then
+reload the index with ``POST /api/advisory/admin/retrieval-index/reload``.
+
+Usage:
+    python -m app.jobs.build_advisory_index [--knowledge-base articles.json] [--page-size 5000]
+"""
+
+import argparse
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.connection import SessionLocal
+from app.ml_models.text_index import BM25Index
+from app.models.forum import ForumComment, ForumPost
+
+SNIPPET_LENGTH = 300
+
+def iter_forum_threads(db: Session, page_size: int) -> Iterator[Tuple[Dict, str]]:
+    """Yield (document, text) per active post, with its comments, in keyset order"""
+    last_id = 0
+    while True:
+        posts = (
+            db.query(ForumPost)
+            .filter(ForumPost.id > last_id, ForumPost.is_active == True)
+            .order_by(ForumPost.id)
+            .limit(page_size)
+            .all()
+        )
+        if not posts:
+            return
+
+        answers = defaultdict(list)
+        for post_id, content in (
+            db.query(ForumComment.post_id, ForumComment.content)
+            .filter(ForumComment.post_id.in_([post.id for post in posts]), ForumComment.is_active == True)
+        ):
+            answers[post_id].append(content)
+
+        for post in posts:
+            document = {
+                "source": "forum",
+                "id": post.id,
+                "title": post.title,
+                "category": post.category,
+                "snippet": post.content[:SNIPPET_LENGTH]
+            }
+            yield document, " ".join([post.title, post.content, " ".join(post.tags or []), *answers[post.id]])
+        last_id = posts[-1].id
+
+def iter_knowledge_base(path: Optional[str]) -> Iterator[Tuple[Dict, str]]:
+    if not path:
+        return
+    with open(path) as f:
+        articles = json.load(f)
+    for article in articles:
+        document = {
+            "source": "knowledge_base",
+            "id": article["id"],
+            "title": article["title"],
+            "category": article.get("category"),
+            "snippet": article["content"][:SNIPPET_LENGTH]
+        }
+        yield document, f"{article['title']} {article['content']}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the advisory retrieval index")
+    parser.add_argument("--index-dir", default=settings.ADVISORY_INDEX_DIR)
+    parser.add_argument("--knowledge-base", default=None, help="JSON file of knowledge-base articles")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        index = BM25Index(args.index_dir)
+        try:
+            index.build(
+                item
+                for source in (iter_knowledge_base(args.knowledge_base), iter_forum_threads(db, args.page_size))
+                for item in source
+            )
+        except ValueError:
+            raise SystemExit("No forum threads or articles to index")
+    finally:
+        db.close()
+
+    print(f"Indexed {len(index)} documents ({len(index.vocabulary)} terms) in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Rebuild the pest detection similarity index from stored embeddings
+
+Run after re-scoring with a new model, and periodically so that detections
+added since the last build move out of each worker's in-memory buffer.
+
+Usage:
+    python -m app.jobs.build_pest_index [--lists N] [--page-size 10000]
+"""
+
+import argparse
+import logging
+import time
+from typing import Iterator, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.connection import SessionLocal
+from app.ml_models.vector_index import IVFIndex, unpack_vector
+from app.models.pest import PestDetection
+
+def iter_embeddings(db: Session, page_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield (ids, vectors) pages of stored embeddings in keyset order"""
+    last_id = 0
+    while True:
+        rows = (
+            db.query(PestDetection.id, PestDetection.embedding)
+            .filter(PestDetection.id > last_id, PestDetection.embedding.isnot(None))
+            .order_by(PestDetection.id)
+            .limit(page_size)
+            .all()
+        )
+        if not rows:
+            return
+
+        yield (
+            np.array([row.id for row in rows], dtype=np.int64),
+            np.stack([unpack_vector(row.embedding) for row in rows])
+        )
+        last_id = rows[-1].id
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the pest similarity index")
+    parser.add_argument("--index-dir", default=settings.PEST_EMBEDDING_INDEX_DIR)
+    parser.add_argument("--lists", type=int, default=None, help="Number of IVF clusters (default 4*sqrt(N))")
+    parser.add_argument("--page-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    db = SessionLocal()
+    try:
+        total = db.query(PestDetection.id).filter(PestDetection.embedding.isnot(None)).count()
+        if not total:
+            raise SystemExit("No stored embeddings to index")
+
+        started = time.perf_counter()
+        index = IVFIndex(args.index_dir)
+        index.build(iter_embeddings(db, args.page_size), total, n_lists=args.lists)
+    finally:
+        db.close()
+
+    print(f"Indexed {len(index)} embeddings in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Fit the pest detection cascade offline and report its accuracy and latency
+
+Expects a labelled image directory with one sub-directory per class name
+(``Healthy``, ``Aphids``, ...). The images are split into a calibration part,
+used to fit temperatures and thresholds, and a held-out part used for the
+report. Training the gate takes a third part of its own out of the
+calibration images, so its early-exit threshold is never fitted on the images
+it was trained on.
+
+Usage:
+    python -m app.jobs.calibrate_pest_model DATA_DIR [--train-gate-epochs 5] [--target-precision 0.9]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.ml_models.calibration import Calibration, fit_class_thresholds, save_calibration_file
+from app.ml_models.pest_detection import GATE_CLASS_NAMES, GATE_IMAGE_SIZE, PestDetectionModel
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+def load_dataset(model: PestDetectionModel, data_dir: str, workers: int) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Decode every labelled image as RGB uint8 with its class index"""
+    paths, labels = [], []
+    for class_index, class_name in enumerate(model.class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, filename))
+                labels.append(class_index)
+
+    if not paths:
+        raise ValueError(f"No labelled images found under {data_dir}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        images = list(executor.map(model.load_image, paths))
+    return images, np.array(labels)
+
+def classifier_probabilities(model: PestDetectionModel, images: List[np.ndarray], batch_size: int) -> np.ndarray:
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        batch = np.stack([model.preprocess_array(image) for image in images[start:start + batch_size]])
+        outputs.append(model.predict_batch(batch))
+    return np.concatenate(outputs)
+
+def gate_probabilities(model: PestDetectionModel, images: List[np.ndarray], batch_size: int) -> np.ndarray:
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        batch = np.stack([cv2.resize(image, GATE_IMAGE_SIZE) for image in images[start:start + batch_size]])
+        outputs.append(np.asarray(model.gate_model(batch.astype(np.float32) / 255.0, training=False)))
+    return np.concatenate(outputs)
+
+def train_gate(model: PestDetectionModel, images: List[np.ndarray], labels: np.ndarray, epochs: int):
+    gate = model.create_gate_model()
+    x = np.stack([cv2.resize(image, GATE_IMAGE_SIZE) for image in images]).astype(np.float32) / 255.0
+    y = np.eye(len(GATE_CLASS_NAMES))[(labels != 0).astype(int)]
+    gate.fit(x, y, epochs=epochs, batch_size=64, verbose=2)
+    gate.save(model.gate_model_path)
+
+def time_single_image(predict, samples: List[np.ndarray], repeats: int = 20) -> float:
+    """Median milliseconds for one batch-of-one forward pass"""
+    predict(samples[0])  # warm-up
+    timings = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        predict(samples[i % len(samples)])
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+def build_report(
+    model: PestDetectionModel,
+    images: List[np.ndarray],
+    labels: np.ndarray,
+    probabilities: np.ndarray,
+    healthy_probability: np.ndarray,
+    exit_threshold: float
+) -> Dict:
+    """Compare the full model alone against the gated cascade on held-out data"""
+    full_predictions = probabilities.argmax(axis=1)
+    exits = healthy_probability >= exit_threshold
+    cascade_predictions = np.where(exits, 0, full_predictions)
+
+    full_ms = time_single_image(
+        lambda image: model.predict_batch(model.preprocess_array(image)[None]), images
+    )
+    gate_ms = time_single_image(
+        lambda image: model.gate_model(
+            (cv2.resize(image, GATE_IMAGE_SIZE)[None] / 255.0).astype(np.float32), training=False
+        ),
+        images
+    )
+    exit_rate = float(exits.mean())
+    cascade_ms = gate_ms + (1 - exit_rate) * full_ms
+
+    return {
+        "samples": int(len(labels)),
+        "healthy_fraction": float((labels == 0).mean()),
+        "full_model": {
+            "accuracy": float((full_predictions == labels).mean()),
+            "ms_per_image": full_ms
+        },
+        "cascade": {
+            "accuracy": float((cascade_predictions == labels).mean()),
+            "early_exit_rate": exit_rate,
+            "early_exit_precision": float((labels[exits] == 0).mean()) if exits.any() else None,
+            "gate_ms_per_image": gate_ms,
+            "expected_ms_per_image": cascade_ms,
+            "speedup": full_ms / cascade_ms if cascade_ms else None
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the pest detection cascade")
+    parser.add_argument("data_dir")
+    parser.add_argument("--model-path", default=settings.PEST_DETECTION_MODEL_PATH)
+    parser.add_argument("--model-version", default=settings.PEST_DETECTION_MODEL_VERSION)
+    parser.add_argument("--gate-model-path", default=settings.PEST_GATE_MODEL_PATH)
+    parser.add_argument("--output", default=settings.PEST_CALIBRATION_PATH)
+    parser.add_argument("--holdout-fraction", type=float, default=0.3)
+    parser.add_argument("--gate-train-fraction", type=float, default=0.3,
+                        help="Fraction of all images used to train the gate with --train-gate-epochs")
+    parser.add_argument("--target-precision", type=float, default=0.9,
+                        help="Precision a class must reach above its confidence threshold")
+    parser.add_argument("--high-precision", type=float, default=0.97,
+                        help="Precision a class must reach to be reported as high severity")
+    parser.add_argument("--gate-precision", type=float, default=0.99,
+                        help="Precision of 'Healthy' required for the gate to exit early")
+    parser.add_argument("--train-gate-epochs", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    model = PestDetectionModel(
+        args.model_path,
+        model_version=args.model_version,
+        gate_model_path=args.gate_model_path,
+        calibration_path=args.output
+    )
+    images, labels = load_dataset(model, args.data_dir, args.workers)
+
+    order = np.random.default_rng(42).permutation(len(labels))
+    split = int(len(order) * (1 - args.holdout_fraction))
+    fit_index, report_index = order[:split], order[split:]
+    report_images = [images[i] for i in report_index]
+    # The classifier was trained elsewhere and is calibrated on every fit image;
+    # the gate is calibrated only on images it was not trained on
+    gate_fit_index = fit_index
+
+    if args.train_gate_epochs:
+        gate_split = int(len(order) * args.gate_train_fraction)
+        if not 0 < gate_split < split:
+            raise SystemExit("--gate-train-fraction must leave images for gate calibration")
+        gate_train_index, gate_fit_index = fit_index[:gate_split], fit_index[gate_split:]
+        train_gate(model, [images[i] for i in gate_train_index], labels[gate_train_index], args.train_gate_epochs)
+    if model.gate_model is None:
+        raise SystemExit("No gate model found; pass --train-gate-epochs to train one")
+
+    probabilities = classifier_probabilities(model, images, args.batch_size)
+    classifier = Calibration.fit(
+        model.class_names,
+        probabilities[fit_index],
+        labels[fit_index],
+        target_precision=args.target_precision,
+        high_precision=args.high_precision
+    )
+
+    gate_raw = gate_probabilities(model, images, args.batch_size)
+    gate_labels = (labels != 0).astype(int)
+    gate = Calibration.fit(GATE_CLASS_NAMES, gate_raw[gate_fit_index], gate_labels[gate_fit_index])
+    gate_calibrated = gate.apply(gate_raw)
+    exit_threshold = float(fit_class_thresholds(
+        gate_calibrated[gate_fit_index], gate_labels[gate_fit_index], args.gate_precision, 1.0
+    )[0])
+
+    report = build_report(
+        model,
+        report_images,
+        labels[report_index],
+        classifier.apply(probabilities[report_index]),
+        gate_calibrated[report_index, 0],
+        exit_threshold
+    )
+
+    save_calibration_file(args.output, {
+        "model_version": model.model_version,
+        "classifier": classifier.to_dict(),
+        "gate": {**gate.to_dict(), "exit_threshold": exit_threshold},
+        "report": report
+    })
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Evaluate weather alert rules for every user against current forecasts
+
+Intended to run from cron; each distinct farm location's forecast is fetched
+once per run.
+
+Usage:
+    python -m app.jobs.evaluate_weather_alerts [--sender log]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+
+from app.core.config import settings
+from app.services.alert_engine import run_alert_engine
+from app.services.notification_service import NOTIFICATION_SENDERS, get_notification_sender
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate weather alert rules")
+    parser.add_argument("--sender", default=settings.ALERT_NOTIFICATION_SENDER, choices=sorted(NOTIFICATION_SENDERS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        sender = get_notification_sender(args.sender)
+    except ValueError as e:
+        parser.error(str(e))
+    stats = asyncio.run(run_alert_engine(sender))
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
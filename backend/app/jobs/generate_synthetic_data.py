@@ -0,0 +1,551 @@
+"""
+Bulk-load synthetic data at production scale for index, pagination and load tests
+
+Generates users, market price series, forum posts with comments and likes,
+pest detections with synthetic leaf images, and weather series, with the
+shapes that matter for query plans:
+
+* prices are daily random walks with a seasonal swing per crop and market,
+  over several years, most popular markets first
+* forum popularity follows a power law: a few posts collect most comments and
+  likes, and the stored counters match the comment and like rows
+* activity is concentrated on a minority of users, locations and pests
+
+Rows are generated column-wise with NumPy in chunks and written with COPY on
+PostgreSQL (executemany elsewhere), so 10M price rows load in minutes. Primary
+keys continue after the current maximum, so runs append to an existing
+database. Every user shares the password given by --password.
+
+Usage:
+    python -m app.jobs.generate_synthetic_data --market-prices 10000000 --forum-posts 500000
+    python -m app.jobs.generate_synthetic_data --users 50000 --detections 200000 --images 500 --embeddings
+    python -m app.jobs.generate_synthetic_data --only market_prices weather --years 5
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, text
+
+from app.core.config import settings
+from app.database.connection import engine
+from app.database.migrations import upgrade_schema
+from app.ml_models.crop_recommendation import ENCODED_CATEGORIES
+from app.models.crop import Crop
+from app.models.forum import ForumComment, ForumLike, ForumPost
+from app.models.market import MarketPrice
+from app.models.pest import Pest, PestDetection
+from app.models.user import User
+from app.models.weather import WeatherData
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+YEAR = 365 * DAY
+STEPS = ("users", "market_prices", "forum", "detections", "weather")
+LOCAL_HOSTS = (None, "", "localhost", "127.0.0.1", "::1", "db")  # "db" is the docker-compose service
+
+BASE_LOCATIONS = (
+    "Pune", "Nashik", "Ludhiana", "Guntur", "Indore", "Karnal", "Coimbatore", "Rajkot",
+    "Amritsar", "Bathinda", "Hisar", "Meerut", "Agra", "Varanasi", "Patna", "Muzaffarpur",
+    "Nagpur", "Akola", "Jalgaon", "Kolhapur", "Belgaum", "Dharwad", "Mysore", "Mandya",
+    "Warangal", "Nizamabad", "Kurnool", "Nellore", "Thanjavur", "Madurai", "Erode", "Salem",
+    "Bhopal", "Ujjain", "Kota", "Jaipur", "Bikaner", "Anand", "Junagadh", "Cuttack"
+)
+CROPS = (
+    ("Rice", "Cereals", "kharif", 120, 2200), ("Wheat", "Cereals", "rabi", 140, 2100),
+    ("Maize", "Cereals", "kharif", 100, 1900), ("Cotton", "Cash Crops", "kharif", 180, 6500),
+    ("Sugarcane", "Cash Crops", "kharif", 360, 320), ("Soybean", "Oilseeds", "kharif", 100, 4300),
+    ("Mustard", "Oilseeds", "rabi", 120, 5400), ("Chickpea", "Pulses", "rabi", 110, 5200),
+    ("Pigeon Pea", "Pulses", "kharif", 160, 6800), ("Groundnut", "Oilseeds", "kharif", 120, 5800),
+    ("Potato", "Vegetables", "rabi", 100, 1200), ("Onion", "Vegetables", "rabi", 130, 1800),
+    ("Tomato", "Vegetables", "zaid", 90, 1500), ("Chili", "Spices", "kharif", 150, 9000),
+    ("Turmeric", "Spices", "kharif", 270, 7500), ("Cabbage", "Vegetables", "rabi", 90, 1000),
+    ("Banana", "Fruits", "kharif", 330, 1600), ("Mango", "Fruits", "zaid", 365, 4000),
+    ("Grapes", "Fruits", "rabi", 180, 5000), ("Pomegranate", "Fruits", "kharif", 210, 7000)
+)
+PESTS = (
+    ("Aphids", "Insect"), ("Whiteflies", "Insect"), ("Spider Mites", "Insect"), ("Thrips", "Insect"),
+    ("Leaf Miners", "Insect"), ("Caterpillars", "Insect"), ("Mealybugs", "Insect"), ("Scale Insects", "Insect"),
+    ("Leaf Blight", "Disease"), ("Powdery Mildew", "Fungus"), ("Rust", "Fungus"), ("Bacterial Spot", "Disease"),
+    ("Virus", "Disease"), ("Nematodes", "Insect"), ("Root Rot", "Fungus")
+)
+FARMING_METHODS = ("Organic", "Conventional", "Integrated", "Natural")
+# Profile values the crop model encodes, so for-location serves every synthetic user
+PROFILE_SOIL_TYPES = tuple(ENCODED_CATEGORIES["soil_type"])
+PROFILE_REGIONS = tuple(ENCODED_CATEGORIES["region"])
+SEVERITIES = ("Low", "Medium", "High", "Critical")
+FORUM_CATEGORIES = ("General", "Pest Control", "Market", "Irrigation", "Soil Health", "Weather", "Equipment")
+FORUM_TAGS = (
+    "wheat", "rice", "cotton", "aphid", "blight", "drip", "urea", "monsoon", "organic", "prices",
+    "seeds", "tractor", "compost", "subsidy", "storage", "neem", "rust", "mandi", "soil-test", "sowing"
+)
+FORUM_SENTENCES = (
+    "The leaves started yellowing from the edges last week.",
+    "We irrigate every four days with drip lines.",
+    "The mandi rate dropped sharply after the rains.",
+    "Is a neem oil spray enough at this stage?",
+    "Soil test shows low nitrogen and a pH of 7.8.",
+    "Yield was lower than last season despite more fertilizer.",
+    "Has anyone tried the new hybrid seed in black soil?",
+    "The spots are brown with a yellow ring around them."
+)
+
+class ZipfSampler:
+    """Indices in [0, n) with P(k) proportional to 1 / (k + 1) ** exponent"""
+
+    def __init__(self, n: int, exponent: float = 1.1):
+        weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+        self.cdf = np.cumsum(weights / weights.sum())
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return np.minimum(np.searchsorted(self.cdf, rng.random(size)), len(self.cdf) - 1)
+
+def location_names(count: int) -> List[str]:
+    """Deterministic location names, most popular first; shared with the load driver"""
+    base = len(BASE_LOCATIONS)
+    return [
+        BASE_LOCATIONS[i % base] if i < base else f"{BASE_LOCATIONS[i % base]} {i // base + 1}"
+        for i in range(count)
+    ]
+
+def synthetic_email(user_id: int) -> str:
+    return f"user{user_id}@synthetic.local"
+
+class BulkWriter:
+    """Append column chunks to a table: COPY on PostgreSQL, executemany elsewhere"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.postgres = engine.dialect.name == "postgresql"
+        self.placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+
+    def next_id(self, model) -> int:
+        with self.engine.connect() as conn:
+            return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+    def timestamps(self, seconds: np.ndarray) -> List[str]:
+        """Epoch seconds as UTC timestamp literals the target database parses"""
+        stamps = np.datetime_as_string(np.asarray(seconds, dtype=np.int64).astype("datetime64[s]"))
+        stamps = np.char.replace(stamps, "T", " ")
+        return np.char.add(stamps, "+00:00").tolist() if self.postgres else stamps.tolist()
+
+    def column_values(self, values: Any) -> list:
+        values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+        if self.postgres and values and isinstance(values[0], bytes):
+            # bytea in COPY text is hex-escaped
+            return [None if value is None else "\\x" + value.hex() for value in values]
+        return values
+
+    def write(self, model, chunk: Dict[str, Any]) -> int:
+        columns = list(chunk)
+        rows = list(zip(*(self.column_values(chunk[column]) for column in columns)))
+        table = model.__tablename__
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if self.postgres:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                placeholders = ", ".join(self.placeholder for _ in columns)
+                cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+            connection.commit()
+        finally:
+            connection.close()
+        return len(rows)
+
+    def reset_sequence(self, model):
+        """Move the id sequence past explicitly inserted keys"""
+        if not self.postgres:
+            return
+        table = model.__tablename__
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+            ))
+
+def user_id_range(writer: BulkWriter) -> Tuple[int, int]:
+    """Ids of the users that generated rows are attributed to"""
+    with writer.engine.connect() as conn:
+        low, high = conn.execute(select(func.min(User.id), func.max(User.id))).one()
+    if not high:
+        raise SystemExit("No users to attribute rows to; include the users step")
+    return low, high
+
+def ensure_reference_rows(writer: BulkWriter, model, rows: List[Dict[str, Any]]) -> np.ndarray:
+    """Insert reference rows (crops, pests) when the table has fewer, returning the ids in use"""
+    with writer.engine.connect() as conn:
+        ids = [row[0] for row in conn.execute(select(model.id).order_by(model.id))]
+    if len(ids) < len(rows):
+        start = (max(ids) if ids else 0) + 1
+        missing = rows[len(ids):]
+        chunk = {column: [row[column] for row in missing] for column in missing[0]}
+        chunk["id"] = list(range(start, start + len(missing)))
+        writer.write(model, chunk)
+        writer.reset_sequence(model)
+        ids += chunk["id"]
+    return np.array(ids[:len(rows)], dtype=np.int64)
+
+def user_chunks(rng, writer: BulkWriter, args, locations: List[str], hashed_password: str, now: int):
+    start_id = writer.next_id(User)
+    location_sampler = ZipfSampler(len(locations))
+    for offset in range(0, args.users, args.batch_size):
+        n = min(args.batch_size, args.users - offset)
+        ids = np.arange(start_id + offset, start_id + offset + n)
+        yield User, {
+            "id": ids,
+            "email": [synthetic_email(user_id) for user_id in ids.tolist()],
+            "username": [f"user{user_id}" for user_id in ids.tolist()],
+            "hashed_password": [hashed_password] * n,
+            "full_name": [f"Synthetic Farmer {user_id}" for user_id in ids.tolist()],
+            "location": np.array(locations, dtype=object)[location_sampler.sample(rng, n)],
+            "farm_size": [f"{size} acres" for size in rng.integers(1, 40, n).tolist()],
+            "is_active": rng.random(n) > 0.02,
+            "is_verified": rng.random(n) < 0.3,
+            "experience_years": rng.integers(0, 40, n),
+            "farming_method": np.array(FARMING_METHODS, dtype=object)[rng.integers(0, len(FARMING_METHODS), n)],
+            "soil_type": np.array(PROFILE_SOIL_TYPES, dtype=object)[rng.integers(0, len(PROFILE_SOIL_TYPES), n)],
+            "soil_ph": np.round(rng.normal(6.8, 0.7, n), 1),
+            "region": np.array(PROFILE_REGIONS, dtype=object)[rng.integers(0, len(PROFILE_REGIONS), n)],
+            "created_at": writer.timestamps(now - rng.uniform(0, args.years * YEAR, n))
+        }
+
+def market_price_chunks(rng, writer: BulkWriter, args, locations: List[str], crop_ids: np.ndarray, now: int):
+    """Daily price series per (crop, market), the most popular markets first"""
+    start_id = writer.next_id(MarketPrice)
+    base_prices = np.array([crop[4] for crop in CROPS], dtype=np.float64)[:len(crop_ids)]
+    series_count = min(math.ceil(args.market_prices / (args.years * 365)), len(crop_ids) * len(locations))
+    days = math.ceil(args.market_prices / series_count)
+    start = now - days * DAY
+    location_factor = rng.normal(1.0, 0.08, len(locations))
+    phase = rng.uniform(0, 2 * np.pi, len(crop_ids))
+    day_of_year = (np.arange(days) + (start // DAY)) % 365
+
+    series_per_chunk = max(1, args.batch_size // days)
+    written = 0
+    for first in range(0, series_count, series_per_chunk):
+        series = np.arange(first, min(first + series_per_chunk, series_count))
+        crop_index, location_index = series % len(crop_ids), series // len(crop_ids)
+
+        walk = np.cumsum(rng.normal(0, 0.012, (len(series), days)), axis=1)
+        season = 0.08 * np.sin(2 * np.pi * day_of_year[None, :] / 365 + phase[crop_index][:, None])
+        price = base_prices[crop_index][:, None] * location_factor[location_index][:, None] * np.exp(walk + season)
+        week_ago = np.concatenate([price[:, :1].repeat(7, axis=1), price[:, :-7]], axis=1)
+        change = (price / week_ago - 1) * 100
+
+        take = min(price.size, args.market_prices - written)
+        price, change = price.ravel()[:take], change.ravel()[:take]
+        recorded = (start + np.tile(np.arange(days), len(series)) * DAY + 9 * 3600)[:take]
+        trend = np.where(change > 2, "up", np.where(change < -2, "down", "stable")).astype(object)
+        yield MarketPrice, {
+            "id": np.arange(start_id + written, start_id + written + take),
+            "crop_id": np.repeat(crop_ids[crop_index], days)[:take],
+            "location": np.repeat(np.array(locations, dtype=object)[location_index], days)[:take],
+            "price_per_quintal": np.round(price, 2),
+            "price_per_kg": np.round(price / 100, 2),
+            "market_name": [f"{name} APMC" for name in np.repeat(np.array(locations, dtype=object)[location_index], days)[:take]],
+            "quality_grade": np.array(("A", "B", "C"), dtype=object)[rng.integers(0, 3, take)],
+            "trend": trend,
+            "price_change_percent": np.round(change, 2),
+            "recorded_at": writer.timestamps(recorded),
+            "source": ["synthetic"] * take
+        }
+        written += take
+        if written >= args.market_prices:
+            return
+
+def forum_chunks(rng, writer: BulkWriter, args, user_ids: Tuple[int, int], now: int):
+    """Posts with power-law popularity, then exactly as many comment and like rows as their counters say"""
+    post_id, comment_id, like_id = writer.next_id(ForumPost), writer.next_id(ForumComment), writer.next_id(ForumLike)
+    user_sampler = ZipfSampler(user_ids[1] - user_ids[0] + 1, exponent=0.9)
+    sentences = np.array(FORUM_SENTENCES, dtype=object)
+
+    for offset in range(0, args.forum_posts, args.batch_size):
+        n = min(args.batch_size, args.forum_posts - offset)
+        ids = np.arange(post_id + offset, post_id + offset + n)
+        popularity = rng.pareto(1.3, n) + 0.05
+        popularity /= popularity.mean()
+        likes = np.minimum(rng.poisson(args.likes_per_post * popularity), 10000)
+        comments = np.minimum(rng.poisson(args.comments_per_post * popularity), 2000)
+        # Newer posts are more common than old ones
+        created = now - np.minimum(rng.exponential(args.years * YEAR / 4, n), args.years * YEAR)
+        tag_counts = rng.integers(1, 5, n)
+
+        yield ForumPost, {
+            "id": ids,
+            "user_id": user_ids[0] + user_sampler.sample(rng, n),
+            "title": [f"{FORUM_TAGS[tag].capitalize()}: question {post}" for tag, post in zip(rng.integers(0, len(FORUM_TAGS), n).tolist(), ids.tolist())],
+            "content": [" ".join(sentences[rng.integers(0, len(sentences), count)]) for count in rng.integers(1, 12, n).tolist()],
+            "category": np.array(FORUM_CATEGORIES, dtype=object)[rng.integers(0, len(FORUM_CATEGORIES), n)],
+            "tags": [json.dumps([FORUM_TAGS[i] for i in rng.choice(len(FORUM_TAGS), count, replace=False)]) for count in tag_counts.tolist()],
+            "likes_count": likes,
+            "comments_count": comments,
+            "views_count": likes * 12 + rng.poisson(30, n),
+            "is_pinned": rng.random(n) < 0.001,
+            "is_active": rng.random(n) > 0.01,
+            "created_at": writer.timestamps(created)
+        }
+
+        total_comments = int(comments.sum())
+        if total_comments:
+            comment_ids = np.arange(comment_id, comment_id + total_comments)
+            comment_posts = np.repeat(ids, comments)
+            first_in_post = np.r_[True, comment_posts[1:] != comment_posts[:-1]]
+            is_reply = ~first_in_post & (rng.random(total_comments) < 0.3)
+            comment_likes = np.minimum(rng.poisson(0.8 * rng.pareto(2.0, total_comments)), 500)
+            comment_created = np.minimum(np.repeat(created, comments) + rng.exponential(2 * DAY, total_comments), now)
+            for first in range(0, total_comments, args.batch_size):
+                part = slice(first, first + args.batch_size)
+                size = len(comment_ids[part])
+                yield ForumComment, {
+                    "id": comment_ids[part],
+                    "post_id": comment_posts[part],
+                    "user_id": user_ids[0] + user_sampler.sample(rng, size),
+                    "parent_comment_id": np.where(is_reply[part], comment_ids[part] - 1, None),
+                    "content": sentences[rng.integers(0, len(sentences), size)],
+                    "likes_count": comment_likes[part],
+                    "is_active": np.ones(size, dtype=bool),
+                    "created_at": writer.timestamps(comment_created[part])
+                }
+            comment_id += total_comments
+
+            liked_comments = np.repeat(comment_ids, comment_likes)
+        else:
+            liked_comments = np.empty(0, dtype=np.int64)
+
+        liked_posts = np.repeat(ids, likes)
+        like_count = len(liked_posts) + len(liked_comments)
+        # Post likes first, then comment likes; each row targets exactly one of them
+        like_post = np.concatenate([liked_posts.astype(object), np.full(len(liked_comments), None, dtype=object)])
+        like_comment = np.concatenate([np.full(len(liked_posts), None, dtype=object), liked_comments.astype(object)])
+        for first in range(0, like_count, args.batch_size):
+            part = slice(first, first + args.batch_size)
+            size = len(like_post[part])
+            yield ForumLike, {
+                "id": np.arange(like_id + first, like_id + first + size),
+                "user_id": user_ids[0] + user_sampler.sample(rng, size),
+                "post_id": like_post[part],
+                "comment_id": like_comment[part],
+                "created_at": writer.timestamps(now - rng.uniform(0, 30 * DAY, size))
+            }
+        like_id += like_count
+
+def write_synthetic_images(rng, directory: str, count: int) -> List[str]:
+    """Leaf-like JPEGs with lesions, written once and shared by the detection rows"""
+    if not count:
+        return []
+    import cv2
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"synthetic_{i:05d}.jpg")
+        if not os.path.exists(path):
+            height, width = (int(v) for v in rng.choice([(480, 640), (960, 1280), (1536, 2048)]))
+            image = np.empty((height, width, 3), dtype=np.uint8)
+            image[:] = (40 + rng.integers(0, 30), 110 + rng.integers(0, 60), 40 + rng.integers(0, 30))  # BGR green
+            noise = rng.normal(0, 12, (height, width, 1))
+            image = np.clip(image + noise, 0, 255).astype(np.uint8)
+            for _ in range(int(rng.integers(0, 25))):
+                center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+                radius = int(rng.integers(3, max(4, width // 30)))
+                cv2.circle(image, center, radius, (30, 70 + int(rng.integers(0, 40)), 120), -1)
+            cv2.imwrite(path, cv2.GaussianBlur(image, (5, 5), 0))
+        paths.append(path)
+    return paths
+
+def detection_chunks(rng, writer: BulkWriter, args, user_ids: Tuple[int, int], pest_ids: np.ndarray, locations: List[str], now: int):
+    start_id = writer.next_id(PestDetection)
+    images = np.array(write_synthetic_images(rng, args.images_dir, args.images), dtype=object)
+    pest_sampler = ZipfSampler(len(pest_ids), exponent=0.8)
+    location_sampler = ZipfSampler(len(locations))
+    user_sampler = ZipfSampler(user_ids[1] - user_ids[0] + 1, exponent=0.9)
+    crops = np.array([crop[0] for crop in CROPS], dtype=object)
+    pest_names = np.array([pest[0] for pest in PESTS], dtype=object)
+    centroids = rng.normal(0, 1, (len(pest_ids) + 1, 512))
+    # Start of this and earlier calendar years, so day-of-year offsets land on real months
+    current_year = datetime.fromtimestamp(now, timezone.utc).year
+    year_starts = np.array([
+        datetime(current_year - years_back, 1, 1, tzinfo=timezone.utc).timestamp()
+        for years_back in range(math.ceil(args.years))
+    ])
+
+    for offset in range(0, args.detections, args.batch_size):
+        n = min(args.batch_size, args.detections - offset)
+        pest_index = pest_sampler.sample(rng, n)
+        healthy = rng.random(n) < 0.15
+        confidence = np.where(healthy, rng.beta(9, 2, n), rng.beta(6, 2, n))
+        # Detections peak in the monsoon months (June to September)
+        year_start = year_starts[rng.integers(0, len(year_starts), n)]
+        day_of_year = np.where(rng.random(n) < 0.4, rng.uniform(152, 273, n), rng.uniform(0, 365, n))
+        detected = np.minimum(year_start + day_of_year * DAY, now)
+        predictions = [
+            json.dumps([
+                {"class": "Healthy" if is_healthy else pest_names[index], "confidence": round(float(score), 4)},
+                {"class": pest_names[(index + 1) % len(pest_names)], "confidence": round(float((1 - score) * 0.6), 4)},
+                {"class": pest_names[(index + 2) % len(pest_names)], "confidence": round(float((1 - score) * 0.3), 4)}
+            ])
+            for index, is_healthy, score in zip(pest_index.tolist(), healthy.tolist(), confidence.tolist())
+        ]
+
+        chunk = {
+            "id": np.arange(start_id + offset, start_id + offset + n),
+            "user_id": user_ids[0] + user_sampler.sample(rng, n),
+            "image_path": images[rng.integers(0, len(images), n)] if len(images) else ["uploads/pest_detection/missing.jpg"] * n,
+            "detected_pest_id": np.where(healthy, None, pest_ids[pest_index].astype(object)),
+            "confidence_score": np.round(confidence, 4),
+            "model_version": [settings.PEST_DETECTION_MODEL_VERSION] * n,
+            "predictions": predictions,
+            "image_hash": rng.integers(0, 2 ** 62, n),
+            "detection_date": writer.timestamps(detected),
+            "location": np.array(locations, dtype=object)[location_sampler.sample(rng, n)],
+            "crop_affected": crops[rng.integers(0, len(crops), n)],
+            "severity": np.where(healthy, None, np.array(SEVERITIES, dtype=object)[rng.integers(0, len(SEVERITIES), n)]),
+            "is_verified": rng.random(n) < 0.1
+        }
+        if args.embeddings:
+            # Clustered per pest so similarity search has real neighbours
+            vectors = centroids[np.where(healthy, len(pest_ids), pest_index)] + rng.normal(0, 0.6, (n, 512))
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            chunk["embedding"] = [row.tobytes() for row in vectors.astype(np.float16)]
+        yield PestDetection, chunk
+
+def weather_chunks(rng, writer: BulkWriter, args, locations: List[str], now: int):
+    """Readings every --weather-interval-hours with seasonal and daily cycles and a monsoon"""
+    start_id = writer.next_id(WeatherData)
+    steps = int(args.weather_days * 24 / args.weather_interval_hours)
+    times = now - steps * args.weather_interval_hours * 3600 + np.arange(steps) * args.weather_interval_hours * 3600
+    day_of_year = (times // DAY) % 365
+    hour = (times // 3600) % 24
+    monsoon = ((day_of_year > 152) & (day_of_year < 273)).astype(np.float64)
+    weather_locations = locations[:args.weather_locations]
+    coordinates = np.column_stack([rng.uniform(8, 34, len(weather_locations)), rng.uniform(68, 97, len(weather_locations))])
+
+    locations_per_chunk = max(1, args.batch_size // steps)
+    written = 0
+    for first in range(0, len(weather_locations), locations_per_chunk):
+        group = np.arange(first, min(first + locations_per_chunk, len(weather_locations)))
+        shape = (len(group), steps)
+        base = rng.normal(26, 3, (len(group), 1))
+        temperature = (
+            base + 7 * np.sin(2 * np.pi * (day_of_year - 110) / 365)[None, :]
+            + 5 * np.sin(2 * np.pi * (hour - 9) / 24)[None, :] + rng.normal(0, 1.2, shape)
+        )
+        rain_chance = 0.05 + 0.45 * monsoon[None, :]
+        rainfall = np.where(rng.random(shape) < rain_chance, rng.exponential(4, shape), 0.0)
+        humidity = np.clip(45 + 35 * monsoon[None, :] + rng.normal(0, 8, shape) + rainfall, 10, 100)
+        condition = np.where(rainfall > 8, "Thunderstorm", np.where(rainfall > 0, "Rain", np.where(humidity > 75, "Clouds", "Clear")))
+
+        size = len(group) * steps
+        yield WeatherData, {
+            "id": np.arange(start_id + written, start_id + written + size),
+            "location": np.repeat(np.array(weather_locations, dtype=object)[group], steps),
+            "latitude": np.repeat(np.round(coordinates[group, 0], 4), steps),
+            "longitude": np.repeat(np.round(coordinates[group, 1], 4), steps),
+            "temperature": np.round(temperature, 1).ravel(),
+            "humidity": np.round(humidity, 0).ravel(),
+            "wind_speed": np.round(rng.gamma(2, 1.4, size), 1),
+            "wind_direction": rng.integers(0, 360, size).astype(np.float64),
+            "pressure": np.round(rng.normal(1008, 5, size), 0),
+            "rainfall": np.round(rainfall / args.weather_interval_hours, 2).ravel(),  # mm/h, like live observations
+            "uv_index": np.tile(np.round(10 * np.clip(np.sin(2 * np.pi * (hour - 6) / 24), 0, None), 1), len(group)),
+            "visibility": rng.integers(2000, 10001, size).astype(np.float64),
+            "weather_condition": condition.astype(object).ravel(),
+            "recorded_at": writer.timestamps(np.tile(times, len(group)))
+        }
+        written += size
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic data")
+    parser.add_argument("--only", nargs="+", choices=STEPS, default=list(STEPS))
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--password", default="synthetic-password", help="Password of every generated user")
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--market-prices", type=int, default=1000000)
+    parser.add_argument("--forum-posts", type=int, default=100000)
+    parser.add_argument("--comments-per-post", type=float, default=4.0, help="Mean; the tail is heavy")
+    parser.add_argument("--likes-per-post", type=float, default=6.0, help="Mean; the tail is heavy")
+    parser.add_argument("--detections", type=int, default=50000)
+    parser.add_argument("--images", type=int, default=200, help="Distinct synthetic images shared by detections")
+    parser.add_argument("--images-dir", default="uploads/pest_detection/synthetic")
+    parser.add_argument("--embeddings", action="store_true", help="Store 512-d embeddings for the similarity index")
+    parser.add_argument("--weather-locations", type=int, default=100)
+    parser.add_argument("--weather-days", type=int, default=365)
+    parser.add_argument("--weather-interval-hours", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a database that is not on localhost")
+    return parser
+
+def generate(args: argparse.Namespace, target_engine=engine) -> Dict[str, int]:
+    """Bring the schema up to date and load every step in ``args.only``, returning rows per table"""
+    if target_engine.url.host not in LOCAL_HOSTS and not args.allow_remote:
+        raise SystemExit(f"Refusing to load synthetic data into {target_engine.url.host}; pass --allow-remote")
+
+    upgrade_schema(target_engine)
+    writer = BulkWriter(target_engine)
+    rng = np.random.default_rng(args.seed)
+    now = int(time.time())
+    locations = location_names(args.locations)
+    crop_ids = ensure_reference_rows(writer, Crop, [
+        {"name": name, "category": category, "season": season, "duration_days": duration, "market_price": float(price), "is_active": True}
+        for name, category, season, duration, price in CROPS
+    ])
+    pest_ids = ensure_reference_rows(writer, Pest, [
+        {"name": name, "category": category, "severity_level": "Medium", "is_active": True}
+        for name, category in PESTS
+    ])
+
+    steps = []
+    if "users" in args.only:
+        from app.services.auth_service import pwd_context
+        steps.append(lambda: user_chunks(rng, writer, args, locations, pwd_context.hash(args.password), now))
+    if "market_prices" in args.only:
+        steps.append(lambda: market_price_chunks(rng, writer, args, locations, crop_ids, now))
+    if "forum" in args.only:
+        steps.append(lambda: forum_chunks(rng, writer, args, user_id_range(writer), now))
+    if "detections" in args.only:
+        steps.append(lambda: detection_chunks(rng, writer, args, user_id_range(writer), pest_ids, locations, now))
+    if "weather" in args.only:
+        steps.append(lambda: weather_chunks(rng, writer, args, locations, now))
+
+    counts: Dict[str, int] = {}
+    for step in steps:
+        for model, chunk in step():
+            started = time.perf_counter()
+            rows = writer.write(model, chunk)
+            counts[model.__tablename__] = counts.get(model.__tablename__, 0) + rows
+            logger.info(
+                f"{model.__tablename__}: +{rows} rows ({rows / (time.perf_counter() - started):,.0f} rows/s), "
+                f"{counts[model.__tablename__]:,} total"
+            )
+    for model in (User, MarketPrice, ForumPost, ForumComment, ForumLike, PestDetection, WeatherData):
+        writer.reset_sequence(model)
+    return counts
+
+def main():
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine.echo = False
+
+    started = time.perf_counter()
+    counts = generate(args)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    logger.info(f"Loaded {total:,} rows in {elapsed:.0f}s ({total / max(elapsed, 1e-9):,.0f} rows/s): {counts}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Re-score stored pest detections with the current pest detection model
+
+Usage:
+    python -m app.jobs.rescore_detections [--batch-size 64] [--workers 4] [--limit N] [--restart]
+"""
+
+import argparse
+import logging
+
+from app.core.config import settings
+from app.database.connection import SessionLocal
+from app.ml_models.pest_detection import PestDetectionModel
+from app.services.rescoring_service import RescoreJob, RescoringService
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score historical pest detections")
+    parser.add_argument("--model-path", default=settings.PEST_DETECTION_MODEL_PATH)
+    parser.add_argument("--model-version", default=settings.PEST_DETECTION_MODEL_VERSION)
+    parser.add_argument("--batch-size", type=int, default=settings.RESCORE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.RESCORE_WORKERS)
+    parser.add_argument("--prefetch", type=int, default=2, help="Pages decoded ahead of inference")
+    parser.add_argument("--checkpoint", default=settings.RESCORE_CHECKPOINT_PATH)
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many rows")
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # The API's re-scoring job and this one share the checkpoint, so only one may run
+    job = RescoreJob(args.checkpoint)
+    if not job.acquire():
+        raise SystemExit("Re-scoring is already running")
+
+    model = PestDetectionModel(args.model_path, model_version=args.model_version)
+    db = SessionLocal()
+    try:
+        stats = RescoringService(
+            db,
+            model,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            prefetch=args.prefetch,
+            checkpoint_path=args.checkpoint
+        ).run(limit=args.limit, resume=not args.restart, stop_event=job)
+    finally:
+        job.release()
+        db.close()
+
+    print(
+        f"Processed {stats['processed']} detections ({stats['failed']} failed) "
+        f"with model {stats['model_version']} at {stats['images_per_second']:.1f} images/s"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Confidence calibration for classifier outputs
+
+Temperature scaling and per-class decision thresholds are fitted offline on
+a labelled validation set and stored as JSON next to the model weights.
+"""
+
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EPSILON = 1e-7
+
+def apply_temperature(probabilities: np.ndarray, temperature: float) -> np.ndarray:
+    """Rescale softmax outputs as if their logits were divided by ``temperature``
+
+    ``log(p)`` differs from the logits only by a per-row constant, which the
+    softmax cancels, so raw probabilities are enough to apply the scaling.
+    """
+    logits = np.log(np.clip(probabilities, EPSILON, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+def fit_temperature(probabilities: np.ndarray, labels: np.ndarray) -> float:
+    """Find the temperature minimising validation negative log-likelihood"""
+    rows = np.arange(len(labels))
+
+    def nll(log_t: float) -> float:
+        scaled = apply_temperature(probabilities, float(np.exp(log_t)))
+        return float(-np.log(np.clip(scaled[rows, labels], EPSILON, 1.0)).mean())
+
+    # Golden-section search over log(T) in [1/20, 20]; NLL is unimodal in T
+    low, high = np.log(0.05), np.log(20.0)
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = high - ratio * (high - low), low + ratio * (high - low)
+    nll_a, nll_b = nll(a), nll(b)
+    for _ in range(60):
+        if nll_a < nll_b:
+            high, b, nll_b = b, a, nll_a
+            a = high - ratio * (high - low)
+            nll_a = nll(a)
+        else:
+            low, a, nll_a = a, b, nll_b
+            b = low + ratio * (high - low)
+            nll_b = nll(b)
+    return float(np.exp((low + high) / 2))
+
+def fit_class_thresholds(
+    probabilities: np.ndarray,
+    labels: np.ndarray,
+    target_precision: float,
+    default: float
+) -> np.ndarray:
+    """Lowest confidence per predicted class at which precision reaches the target
+
+    Classes that are never predicted, or never reach the target, fall back to
+    ``default`` (or 1.0 when even the most confident predictions miss).
+    """
+    predicted = probabilities.argmax(axis=1)
+    confidence = probabilities.max(axis=1)
+    thresholds = np.full(probabilities.shape[1], default, dtype=np.float64)
+
+    for cls in range(probabilities.shape[1]):
+        mask = predicted == cls
+        if not mask.any():
+            continue
+
+        order = np.argsort(confidence[mask])[::-1]
+        correct = (labels[mask][order] == cls).astype(np.float64)
+        # Precision of the top-k most confident predictions, for every k
+        precision = np.cumsum(correct) / np.arange(1, len(correct) + 1)
+        passing = np.nonzero(precision >= target_precision)[0]
+        thresholds[cls] = confidence[mask][order][passing[-1]] if len(passing) else 1.0
+
+    return thresholds
+
+class Calibration:
+    """Temperature and per-class thresholds for one classifier"""
+
+    def __init__(
+        self,
+        class_names: List[str],
+        temperature: float = 1.0,
+        class_thresholds: Optional[Dict[str, float]] = None,
+        high_thresholds: Optional[Dict[str, float]] = None,
+        default_threshold: float = 0.7,
+        default_high_threshold: float = 0.8
+    ):
+        self.class_names = class_names
+        self.temperature = temperature
+        class_thresholds = class_thresholds or {}
+        high_thresholds = high_thresholds or {}
+        self.class_thresholds = np.array(
+            [class_thresholds.get(name, default_threshold) for name in class_names]
+        )
+        self.high_thresholds = np.array(
+            [high_thresholds.get(name, default_high_threshold) for name in class_names]
+        )
+
+    def apply(self, probabilities: np.ndarray) -> np.ndarray:
+        """Calibrate one row or a batch of class probabilities"""
+        if self.temperature == 1.0:
+            return probabilities
+        return apply_temperature(probabilities, self.temperature)
+
+    def threshold(self, class_name: str) -> float:
+        return float(self.class_thresholds[self.class_names.index(class_name)])
+
+    def high_threshold(self, class_name: str) -> float:
+        return float(self.high_thresholds[self.class_names.index(class_name)])
+
+    @classmethod
+    def fit(
+        cls,
+        class_names: List[str],
+        probabilities: np.ndarray,
+        labels: np.ndarray,
+        target_precision: float = 0.9,
+        high_precision: float = 0.97
+    ) -> "Calibration":
+        """Fit temperature, then thresholds on the calibrated scores"""
+        temperature = fit_temperature(probabilities, labels)
+        calibrated = apply_temperature(probabilities, temperature)
+        thresholds = fit_class_thresholds(calibrated, labels, target_precision, 0.7)
+        high = fit_class_thresholds(calibrated, labels, high_precision, 0.8)
+        return cls(
+            class_names,
+            temperature=temperature,
+            class_thresholds=dict(zip(class_names, thresholds.tolist())),
+            high_thresholds=dict(zip(class_names, np.maximum(high, thresholds).tolist()))
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "temperature": self.temperature,
+            "class_thresholds": dict(zip(self.class_names, self.class_thresholds.tolist())),
+            "high_thresholds": dict(zip(self.class_names, self.high_thresholds.tolist()))
+        }
+
+    @classmethod
+    def from_dict(cls, class_names: List[str], data: Dict) -> "Calibration":
+        return cls(
+            class_names,
+            temperature=data.get("temperature", 1.0),
+            class_thresholds=data.get("class_thresholds"),
+            high_thresholds=data.get("high_thresholds")
+        )
+
+def load_calibration_file(path: str) -> Dict:
+    """Read a calibration JSON file, returning an empty dict if it is missing"""
+    if not path or not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading calibration file {path}: {e}")
+        return {}
+
+def save_calibration_file(path: str, data: Dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
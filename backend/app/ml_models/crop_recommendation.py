@@ -2,61 +2,84 @@
 Crop Recommendation ML Model using Scikit-learn
 """
 
-import joblib
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Tuple
 import logging
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 import os
+from app.core.lazy import lazy_import
+from app.core.metrics import stage_timer
+from app.ml_models.forest_compiler import CompiledForest
+from app.ml_models.recommendation_table import RecommendationTable
+
+joblib = lazy_import("joblib")
+pd = lazy_import("pandas")
 
 logger = logging.getLogger(__name__)
 
+# Sample crop data - in production, this would come from database
+CROP_DATA = {
+    'crop_name': [
+        'Rice', 'Wheat', 'Maize', 'Cotton', 'Sugarcane', 'Potato',
+        'Tomato', 'Onion', 'Chili', 'Cabbage', 'Cauliflower', 'Spinach',
+        'Mango', 'Banana', 'Orange', 'Apple', 'Grapes', 'Pomegranate'
+    ],
+    'temperature_min': [20, 15, 18, 20, 20, 10, 15, 10, 20, 10, 10, 5, 20, 20, 10, 5, 15, 20],
+    'temperature_max': [35, 25, 30, 35, 35, 25, 30, 25, 35, 25, 25, 20, 35, 35, 30, 25, 30, 35],
+    'humidity_min': [60, 40, 50, 50, 60, 60, 60, 50, 50, 60, 60, 70, 60, 70, 60, 50, 50, 60],
+    'humidity_max': [90, 80, 90, 90, 90, 90, 90, 80, 90, 90, 90, 95, 90, 95, 90, 80, 80, 90],
+    'ph_min': [5.5, 6.0, 5.5, 6.0, 6.0, 5.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0],
+    'ph_max': [7.5, 7.5, 7.0, 8.0, 7.5, 6.5, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0],
+    'rainfall_min': [1000, 300, 500, 500, 1000, 500, 500, 400, 500, 500, 500, 600, 1000, 1000, 800, 500, 500, 500],
+    'rainfall_max': [3000, 1000, 2000, 1500, 3000, 1500, 1500, 1200, 1500, 1500, 1500, 2000, 3000, 3000, 2000, 1500, 1500, 1500],
+    'soil_type': ['clay', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy'],
+    'season': ['kharif', 'rabi', 'kharif', 'kharif', 'kharif', 'rabi', 'kharif', 'rabi', 'kharif', 'rabi', 'rabi', 'rabi', 'kharif', 'kharif', 'kharif', 'rabi', 'kharif', 'kharif'],
+    'region': ['north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north'],
+    'water_requirement': ['high', 'medium', 'medium', 'medium', 'high', 'medium', 'medium', 'medium', 'medium', 'medium', 'medium', 'high', 'medium', 'high', 'medium', 'medium', 'medium', 'medium'],
+    'yield_per_hectare': [4.5, 3.8, 4.2, 2.2, 70, 25, 30, 20, 15, 35, 25, 20, 15, 25, 20, 15, 20, 15],
+    'market_price': [3500, 2200, 1800, 7000, 3500, 2000, 3000, 2500, 8000, 1500, 2000, 3000, 5000, 3000, 4000, 6000, 8000, 6000]
+}
+
+# Values the label encoders of a model trained on CROP_DATA accept
+ENCODED_CATEGORIES = {
+    col: sorted(set(CROP_DATA[col])) for col in ['soil_type', 'season', 'region', 'water_requirement']
+}
+
 class CropRecommendationModel:
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, compile_forest: bool = True, compiled_forest_dir: str = None):
         self.model_path = model_path or "app/ml_models/crop_recommendation_model.pkl"
+        self.compiled_forest_dir = compiled_forest_dir
         self.model = None
+        self.compiled_forest = None
         self.label_encoders = {}
+        self.category_codes = {}
+        self.lookup_table = None
         self.feature_columns = [
             'temperature', 'humidity', 'ph', 'rainfall', 'soil_type_encoded',
             'season_encoded', 'region_encoded', 'water_requirement_encoded'
         ]
         self.crop_data = self.load_crop_data()
+        # Row lookup by crop name, avoiding a DataFrame filter per recommendation
+        self.crop_rows = {row['crop_name']: row for row in self.crop_data.to_dict('records')}
         self.load_model()
+        if compile_forest:
+            self.compile_forest()
     
-    def load_crop_data(self) -> pd.DataFrame:
+    def load_crop_data(self) -> "pd.DataFrame":
         """Load crop data for recommendations"""
-        # Sample crop data - in production, this would come from database
-        crop_data = pd.DataFrame({
-            'crop_name': [
-                'Rice', 'Wheat', 'Maize', 'Cotton', 'Sugarcane', 'Potato',
-                'Tomato', 'Onion', 'Chili', 'Cabbage', 'Cauliflower', 'Spinach',
-                'Mango', 'Banana', 'Orange', 'Apple', 'Grapes', 'Pomegranate'
-            ],
-            'temperature_min': [20, 15, 18, 20, 20, 10, 15, 10, 20, 10, 10, 5, 20, 20, 10, 5, 15, 20],
-            'temperature_max': [35, 25, 30, 35, 35, 25, 30, 25, 35, 25, 25, 20, 35, 35, 30, 25, 30, 35],
-            'humidity_min': [60, 40, 50, 50, 60, 60, 60, 50, 50, 60, 60, 70, 60, 70, 60, 50, 50, 60],
-            'humidity_max': [90, 80, 90, 90, 90, 90, 90, 80, 90, 90, 90, 95, 90, 95, 90, 80, 80, 90],
-            'ph_min': [5.5, 6.0, 5.5, 6.0, 6.0, 5.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0],
-            'ph_max': [7.5, 7.5, 7.0, 8.0, 7.5, 6.5, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0, 7.0],
-            'rainfall_min': [1000, 300, 500, 500, 1000, 500, 500, 400, 500, 500, 500, 600, 1000, 1000, 800, 500, 500, 500],
-            'rainfall_max': [3000, 1000, 2000, 1500, 3000, 1500, 1500, 1200, 1500, 1500, 1500, 2000, 3000, 3000, 2000, 1500, 1500, 1500],
-            'soil_type': ['clay', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy', 'loamy'],
-            'season': ['kharif', 'rabi', 'kharif', 'kharif', 'kharif', 'rabi', 'kharif', 'rabi', 'kharif', 'rabi', 'rabi', 'rabi', 'kharif', 'kharif', 'kharif', 'rabi', 'kharif', 'kharif'],
-            'region': ['north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north', 'north'],
-            'water_requirement': ['high', 'medium', 'medium', 'medium', 'high', 'medium', 'medium', 'medium', 'medium', 'medium', 'medium', 'high', 'medium', 'high', 'medium', 'medium', 'medium', 'medium'],
-            'yield_per_hectare': [4.5, 3.8, 4.2, 2.2, 70, 25, 30, 20, 15, 35, 25, 20, 15, 25, 20, 15, 20, 15],
-            'market_price': [3500, 2200, 1800, 7000, 3500, 2000, 3000, 2500, 8000, 1500, 2000, 3000, 5000, 3000, 4000, 6000, 8000, 6000]
-        })
-        return crop_data
+        return pd.DataFrame(CROP_DATA)
     
     def load_model(self):
         """Load the pre-trained crop recommendation model"""
         try:
             if os.path.exists(self.model_path):
-                self.model = joblib.load(self.model_path)
+                saved = joblib.load(self.model_path)
+                if isinstance(saved, dict):
+                    self.model = saved["model"]
+                    self.label_encoders = saved["label_encoders"]
+                else:
+                    # Saved before the encoders were stored with it
+                    self.model = saved
+                    self.fit_label_encoders(self.crop_data.copy())
                 logger.info("Crop recommendation model loaded successfully")
             else:
                 self.create_model()
@@ -65,18 +88,35 @@ class CropRecommendationModel:
             logger.error(f"Error loading crop recommendation model: {e}")
             self.create_model()
     
+    def fit_label_encoders(self, df: "pd.DataFrame"):
+        """Fit one encoder per categorical column, adding its ``*_encoded`` column to ``df``"""
+        from sklearn.preprocessing import LabelEncoder
+        
+        categorical_columns = ['soil_type', 'season', 'region', 'water_requirement']
+        for col in categorical_columns:
+            le = LabelEncoder()
+            df[f'{col}_encoded'] = le.fit_transform(df[col])
+            self.label_encoders[col] = le
+    
+    def training_samples(self, per_crop: int = 50, seed: int = 42) -> "pd.DataFrame":
+        """Rows drawn uniformly from each crop's ranges, with its categorical values"""
+        rng = np.random.default_rng(seed)
+        df = self.crop_data.loc[self.crop_data.index.repeat(per_crop)].reset_index(drop=True)
+        for feature in ['temperature', 'humidity', 'ph', 'rainfall']:
+            df[feature] = rng.uniform(df[f'{feature}_min'], df[f'{feature}_max'])
+        return df
+    
     def create_model(self):
         """Create and train a new crop recommendation model"""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+        
         try:
-            # Prepare features
-            df = self.crop_data.copy()
+            # Prepare features; the crop data holds ranges, so train on samples from them
+            df = self.training_samples()
             
             # Encode categorical variables
-            categorical_columns = ['soil_type', 'season', 'region', 'water_requirement']
-            for col in categorical_columns:
-                le = LabelEncoder()
-                df[f'{col}_encoded'] = le.fit_transform(df[col])
-                self.label_encoders[col] = le
+            self.fit_label_encoders(df)
             
             # Prepare features and target
             X = df[self.feature_columns]
@@ -95,9 +135,9 @@ class CropRecommendationModel:
             )
             self.model.fit(X_train, y_train)
             
-            # Save model
+            # Save model, with the encoders its inputs need
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            joblib.dump(self.model, self.model_path)
+            joblib.dump({"model": self.model, "label_encoders": self.label_encoders}, self.model_path)
             
             logger.info("Crop recommendation model trained and saved")
             
@@ -105,6 +145,103 @@ class CropRecommendationModel:
             logger.error(f"Error creating crop recommendation model: {e}")
             raise
     
+    def compile_forest(self):
+        """Flatten the fitted forest into arrays for low-overhead scoring
+        
+        With ``compiled_forest_dir`` set, the arrays are saved there once and
+        memory-mapped on later starts for as long as the model file is unchanged.
+        """
+        try:
+            source_mtime = os.path.getmtime(self.model_path) if os.path.exists(self.model_path) else None
+            if self.compiled_forest_dir and source_mtime is not None:
+                self.compiled_forest = CompiledForest.load(self.compiled_forest_dir, source_mtime)
+                if self.compiled_forest is not None:
+                    logger.info("Crop recommendation forest mapped from disk")
+                    return
+            
+            self.compiled_forest = CompiledForest.from_sklearn(self.model)
+            logger.info("Crop recommendation forest compiled")
+            if self.compiled_forest_dir and source_mtime is not None:
+                self.compiled_forest.save(self.compiled_forest_dir, source_mtime)
+                self.compiled_forest = CompiledForest.load(self.compiled_forest_dir, source_mtime)
+        except Exception as e:
+            logger.error(f"Error compiling crop recommendation forest: {e}")
+            self.compiled_forest = None
+    
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities, identical to ``self.model.predict_proba``"""
+        if self.compiled_forest is not None:
+            return self.compiled_forest.predict_proba(features)
+        return self.model.predict_proba(features)
+    
+    def enable_lookup_table(self, steps: Dict[str, float], table_path: str = None, precompute: bool = False):
+        """Serve recommendations from a quantized top-5 table instead of the forest
+        
+        ``steps`` gives the grid step for temperature, humidity, ph and
+        rainfall. Cells persisted at ``table_path`` are reused when they were
+        built for the same grid and classes.
+        """
+        categorical_columns = ['soil_type', 'season', 'region', 'water_requirement']
+        table = RecommendationTable(
+            steps,
+            [len(self.label_encoders[col].classes_) for col in categorical_columns],
+            len(self.model.classes_)
+        )
+        
+        if table_path:
+            table.load(table_path, list(self.model.classes_))
+        if precompute:
+            try:
+                added = table.precompute(self.predict_proba)
+                logger.info(f"Precomputed {added} crop lookup cells")
+            except ValueError as e:
+                # Too fine a grid to fill up front still works lazily
+                logger.error(f"Not precomputing crop lookup table: {e}")
+        
+        self.lookup_table = table
+        self.lookup_table_path = table_path
+    
+    def save_lookup_table(self):
+        """Persist the lookup table cells filled so far next to the model"""
+        if self.lookup_table is not None and self.lookup_table_path:
+            self.lookup_table.save(self.lookup_table_path, list(self.model.classes_))
+    
+    def lookup_table_agreement(self, samples: int = 1000, seed: int = 42) -> Dict:
+        """Measure how often the table agrees with the exact forest
+        
+        Samples are drawn uniformly from the training ranges of the crop data
+        across all categorical combinations.
+        """
+        if self.lookup_table is None:
+            raise ValueError("Lookup table not enabled")
+        
+        rng = np.random.default_rng(seed)
+        columns = []
+        for feature in ['temperature', 'humidity', 'ph', 'rainfall']:
+            low = self.crop_data[f'{feature}_min'].min()
+            high = self.crop_data[f'{feature}_max'].max()
+            columns.append(rng.uniform(low, high, samples))
+        for col in ['soil_type', 'season', 'region', 'water_requirement']:
+            columns.append(rng.integers(0, len(self.label_encoders[col].classes_), samples))
+        
+        return self.lookup_table.agreement(np.column_stack(columns), self.predict_proba)
+    
+    def known_categories(self) -> Dict[str, List[str]]:
+        """Values the encoders accept for each categorical input"""
+        return {col: list(encoder.classes_) for col, encoder in self.label_encoders.items()}
+    
+    def encode_category(self, column: str, value: str) -> int:
+        """Label-encode one categorical value without sklearn's per-call overhead"""
+        encoder = self.label_encoders[column]
+        codes = self.category_codes.get(column)
+        if codes is None or codes[0] is not encoder:
+            codes = (encoder, {label: index for index, label in enumerate(encoder.classes_)})
+            self.category_codes[column] = codes
+        
+        if value not in codes[1]:
+            raise ValueError(f"Unknown {column}: {value}")
+        return codes[1][value]
+    
     def preprocess_input(self, input_data: Dict) -> np.ndarray:
         """Preprocess input data for prediction"""
         try:
@@ -114,10 +251,10 @@ class CropRecommendationModel:
                 input_data.get('humidity', 70),
                 input_data.get('ph', 6.5),
                 input_data.get('rainfall', 1000),
-                self.label_encoders['soil_type'].transform([input_data.get('soil_type', 'loamy')])[0],
-                self.label_encoders['season'].transform([input_data.get('season', 'kharif')])[0],
-                self.label_encoders['region'].transform([input_data.get('region', 'north')])[0],
-                self.label_encoders['water_requirement'].transform([input_data.get('water_requirement', 'medium')])[0]
+                self.encode_category('soil_type', input_data.get('soil_type', 'loamy')),
+                self.encode_category('season', input_data.get('season', 'kharif')),
+                self.encode_category('region', input_data.get('region', 'north')),
+                self.encode_category('water_requirement', input_data.get('water_requirement', 'medium'))
             ]).reshape(1, -1)
             
             return features
@@ -132,32 +269,39 @@ class CropRecommendationModel:
                 raise ValueError("Model not loaded")
             
             # Preprocess input
-            features = self.preprocess_input(input_data)
+            with stage_timer("crop_recommendation", "preprocess"):
+                features = self.preprocess_input(input_data)
             
-            # Get predictions with probabilities
-            probabilities = self.model.predict_proba(features)[0]
             crop_names = self.model.classes_
             
-            # Get top 5 recommendations
-            top_indices = np.argsort(probabilities)[-5:][::-1]
+            with stage_timer("crop_recommendation", "inference"):
+                if self.lookup_table is not None:
+                    top_indices, top_probabilities = self.lookup_table.lookup(features[0], self.predict_proba)
+                else:
+                    # Get predictions with probabilities
+                    probabilities = self.predict_proba(features)[0]
+                    
+                    # Get top 5 recommendations
+                    top_indices = np.argsort(probabilities)[-5:][::-1]
+                    top_probabilities = probabilities[top_indices]
             
-            recommendations = []
-            for idx in top_indices:
-                crop_name = crop_names[idx]
-                probability = probabilities[idx]
+            with stage_timer("crop_recommendation", "postprocess"):
+                recommendations = []
+                for idx, probability in zip(top_indices, top_probabilities):
+                    crop_name = crop_names[idx]
                 
-                # Get crop details
-                crop_info = self.crop_data[self.crop_data['crop_name'] == crop_name].iloc[0]
+                    # Get crop details
+                    crop_info = self.crop_rows[crop_name]
                 
-                recommendations.append({
-                    'crop_name': crop_name,
-                    'confidence': float(probability),
-                    'yield_per_hectare': float(crop_info['yield_per_hectare']),
-                    'market_price': float(crop_info['market_price']),
-                    'water_requirement': crop_info['water_requirement'],
-                    'season': crop_info['season'],
-                    'suitability_score': float(probability * 100)
-                })
+                    recommendations.append({
+                        'crop_name': crop_name,
+                        'confidence': float(probability),
+                        'yield_per_hectare': float(crop_info['yield_per_hectare']),
+                        'market_price': float(crop_info['market_price']),
+                        'water_requirement': crop_info['water_requirement'],
+                        'season': crop_info['season'],
+                        'suitability_score': float(probability * 100)
+                    })
             
             return {
                 'recommendations': recommendations,
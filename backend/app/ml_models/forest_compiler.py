@@ -0,0 +1,171 @@
+"""
+Flat array evaluator for fitted scikit-learn random forests
+
+``RandomForestClassifier.predict_proba`` validates input, dispatches through
+joblib and walks every tree from Python, which dominates the cost of scoring a
+single row. ``CompiledForest`` copies all trees into contiguous node arrays
+once and evaluates rows by stepping every (row, tree) pair one level per
+iteration, reproducing sklearn's arithmetic so the probabilities are
+bit-for-bit identical.
+"""
+
+import json
+import os
+
+import numpy as np
+
+def normalizes_leaves() -> bool:
+    """Before 1.4, tree leaves held weighted counts and predict_proba normalised them"""
+    import sklearn
+    return tuple(int(part) for part in sklearn.__version__.split(".")[:2]) < (1, 4)
+
+class CompiledForest:
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        depth: int,
+        n_features: int
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        # children[2 * node + go_right], flattened so one gather takes a step
+        self.children = np.ascontiguousarray(children).reshape(-1)
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.n_features = n_features
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "CompiledForest":
+        """Flatten a fitted single-output ``RandomForestClassifier``"""
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        n_classes = int(forest.n_classes_)
+        normalize = normalizes_leaves()
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            leaf = left == -1
+
+            # Leaves loop back to themselves so every row can take `depth` steps
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            left = np.where(leaf, node_ids, left) + offset
+            right = np.where(leaf, node_ids, right) + offset
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.stack([left, right], axis=1))
+
+            value = np.ascontiguousarray(tree.value[:, 0, :n_classes], dtype=np.float64)
+            if normalize:
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+
+            roots.append(offset)
+            offset += n_nodes
+            depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children).astype(np.intp),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.intp),
+            depth=depth,
+            n_features=int(forest.n_features_in_)
+        )
+
+    def save(self, directory: str, source_mtime: float = None):
+        """Write the node arrays as ``.npy`` files that ``load`` can memory-map"""
+        os.makedirs(directory, exist_ok=True)
+        # Each file is replaced atomically and meta.json last, so concurrent
+        # readers never map a half-written forest
+        for name in ("feature", "threshold", "children", "value", "roots"):
+            path = os.path.join(directory, f"{name}.npy")
+            with open(f"{path}.{os.getpid()}.tmp", "wb") as f:
+                np.save(f, getattr(self, name))
+            os.replace(f"{path}.{os.getpid()}.tmp", path)
+        meta_path = os.path.join(directory, "meta.json")
+        meta = {"depth": self.depth, "n_features": self.n_features, "source_mtime": source_mtime}
+        with open(f"{meta_path}.{os.getpid()}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.{os.getpid()}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory: str, source_mtime: float = None, mmap_mode: str = "r"):
+        """Map a saved forest, or return ``None`` if it is missing or was compiled from another model
+
+        Mapped arrays live in the page cache, so every worker process on the
+        node shares one copy of the nodes.
+        """
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if source_mtime is not None and meta.get("source_mtime") != source_mtime:
+            return None
+
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ("feature", "threshold", "children", "value", "roots")
+        }
+        return cls(depth=meta["depth"], n_features=meta["n_features"], **arrays)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Global leaf index reached by every row in every tree, shape (n, n_trees)"""
+        if len(X) == 1:
+            # Single rows index a 1-D feature vector, which is much cheaper
+            x = X[0]
+            nodes = self.roots
+            for _ in range(self.depth):
+                # x > threshold picks the right child, matching sklearn's `x <= t` test
+                go_right = x[self.feature[nodes]] > self.threshold[nodes]
+                nodes = self.children[2 * nodes + go_right]
+            return nodes[np.newaxis]
+        
+        # Offsetting feature ids by row turns the 2-D gather into a flat one
+        flat = X.reshape(-1)
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.depth):
+            go_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities in ``forest.classes_`` order for one row or a batch"""
+        # sklearn evaluates splits on float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+
+        nodes = self.apply(X)
+        
+        # Sum trees strictly in order, as sklearn accumulates per estimator
+        if len(X) == 1:
+            total = np.cumsum(self.value[nodes[0]], axis=0)[-1:]
+        else:
+            total = np.zeros((len(X), self.value.shape[1]), dtype=np.float64)
+            for tree in range(self.n_trees):
+                total += self.value[nodes[:, tree]]
+        total /= self.n_trees
+        return total
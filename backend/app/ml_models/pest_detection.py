@@ -2,27 +2,67 @@
 Pest Detection ML Model using TensorFlow/Keras
 """
 
-import tensorflow as tf
 import numpy as np
-import cv2
-from PIL import Image
 import os
-from typing import Dict, List, Tuple
+import time
+from typing import Dict, List, Optional, Tuple
 import logging
+from app.core.lazy import lazy_import
+from app.core.metrics import ML_STAGE_SECONDS, stage_timer
+from app.core.tracing import span
+from app.ml_models.calibration import Calibration, load_calibration_file
+from app.ml_models.compiled_inference import CompiledModel, configure_threads
+
+tf = lazy_import("tensorflow")
+cv2 = lazy_import("cv2")
 
 logger = logging.getLogger(__name__)
 
+IMAGE_SIZE = (224, 224)
+GATE_IMAGE_SIZE = (64, 64)
+GATE_CLASS_NAMES = ["Healthy", "Not Healthy"]
+
+def severity_for_confidence(confidence: float, high_threshold: float = 0.8) -> str:
+    """Map a primary prediction confidence to a detection severity"""
+    return "High" if confidence > high_threshold else "Medium"
+
 class PestDetectionModel:
-    def __init__(self, model_path: str = None):
+    def __init__(
+        self,
+        model_path: str = None,
+        model_version: str = None,
+        gate_model_path: str = None,
+        calibration_path: str = None,
+        batch_sizes: Optional[List[int]] = None,
+        jit_compile: bool = False,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0
+    ):
         self.model_path = model_path or "app/ml_models/pest_detection_model.h5"
+        self.model_version = model_version or "1.0.0"
+        self.gate_model_path = gate_model_path or "app/ml_models/pest_gate_model.h5"
+        self.calibration_path = calibration_path or "app/ml_models/pest_calibration.json"
+        self.batch_sizes = batch_sizes or [1, 4, 16, 64]
+        self.jit_compile = jit_compile
         self.model = None
+        self.embedding_model = None
+        self.gate_model = None
+        self.compiled = None
+        self.compiled_gate = None
+        # Running estimate of per-image inference cost, used for tile budgets
+        self.ms_per_image = 15.0
         self.class_names = [
             "Healthy", "Aphids", "Whiteflies", "Spider Mites", "Thrips",
             "Leaf Miners", "Caterpillars", "Mealybugs", "Scale Insects",
             "Leaf Blight", "Powdery Mildew", "Rust", "Bacterial Spot",
             "Virus", "Nematodes", "Root Rot"
         ]
+        configure_threads(intra_op_threads, inter_op_threads)
         self.load_model()
+        self.build_embedding_model()
+        self.load_gate_model()
+        self.load_calibration()
+        self.compile()
     
     def load_model(self):
         """Load the pre-trained pest detection model"""
@@ -69,22 +109,121 @@ class PestDetectionModel:
             logger.error(f"Error creating pest detection model: {e}")
             raise
     
+    def build_embedding_model(self):
+        """Expose the penultimate Dense layer alongside the class scores
+        
+        The returned model shares weights with ``self.model``, so one forward
+        pass yields both the prediction and the image embedding.
+        """
+        dense_layers = [layer for layer in self.model.layers if isinstance(layer, tf.keras.layers.Dense)]
+        if len(dense_layers) < 2:
+            logger.warning("Pest detection model has no embedding layer")
+            return
+        
+        self.embedding_model = tf.keras.Model(
+            inputs=self.model.inputs,
+            outputs=[self.model.output, dense_layers[-2].output]
+        )
+    
+    def load_gate_model(self):
+        """Load the healthy-vs-not gate model if one has been trained
+        
+        An untrained gate would send arbitrary images down the early-exit
+        path, so the cascade stays disabled until a trained gate exists.
+        """
+        try:
+            if os.path.exists(self.gate_model_path):
+                self.gate_model = tf.keras.models.load_model(self.gate_model_path)
+                logger.info("Pest gate model loaded successfully")
+        except Exception as e:
+            logger.error(f"Error loading pest gate model: {e}")
+            self.gate_model = None
+    
+    def create_gate_model(self):
+        """Create the small healthy-vs-not CNN run ahead of the full model"""
+        model = tf.keras.Sequential([
+            tf.keras.layers.Conv2D(8, (3, 3), strides=2, activation='relu', input_shape=(*GATE_IMAGE_SIZE, 3)),
+            tf.keras.layers.Conv2D(16, (3, 3), strides=2, activation='relu'),
+            tf.keras.layers.Conv2D(32, (3, 3), strides=2, activation='relu'),
+            tf.keras.layers.GlobalAveragePooling2D(),
+            tf.keras.layers.Dense(len(GATE_CLASS_NAMES), activation='softmax')
+        ])
+        
+        model.compile(
+            optimizer='adam',
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        
+        self.gate_model = model
+        return model
+    
+    def compile(self):
+        """Trace fixed-signature inference functions for the classifier and gate
+        
+        The classifier function returns the embedding alongside the class
+        scores whenever the model has an embedding layer.
+        """
+        self.compiled = CompiledModel(
+            self.embedding_model or self.model,
+            (*IMAGE_SIZE, 3),
+            batch_sizes=self.batch_sizes,
+            jit_compile=self.jit_compile
+        )
+        if self.gate_model is not None:
+            self.compiled_gate = CompiledModel(
+                self.gate_model,
+                (*GATE_IMAGE_SIZE, 3),
+                batch_sizes=self.batch_sizes,
+                jit_compile=self.jit_compile
+            )
+    
+    def warm_up(self) -> Dict[str, Dict[int, float]]:
+        """Run every compiled function once on synthetic input
+        
+        Returns the first-call latency in ms per model and batch size.
+        """
+        timings = {"classifier": self.compiled.warm_up()}
+        if self.compiled_gate is not None:
+            timings["gate"] = self.compiled_gate.warm_up()
+        return timings
+    
+    def load_calibration(self):
+        """Load fitted temperatures and thresholds for both cascade stages"""
+        data = load_calibration_file(self.calibration_path)
+        if data and data.get("model_version") not in (None, self.model_version):
+            logger.warning(
+                f"Ignoring pest calibration fitted for model {data.get('model_version')}, "
+                f"running {self.model_version}"
+            )
+            data = {}
+        
+        self.calibration = Calibration.from_dict(self.class_names, data.get("classifier", {}))
+        self.gate_calibration = Calibration.from_dict(GATE_CLASS_NAMES, data.get("gate", {}))
+        # Calibrated P(Healthy) at or above which the gate answers on its own
+        self.gate_exit_threshold = data.get("gate", {}).get("exit_threshold", 1.0)
+    
+    def load_image(self, image_path: str) -> np.ndarray:
+        """Load an image from disk as an RGB uint8 array"""
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError("Could not load image")
+        
+        # Convert BGR to RGB
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    
+    def preprocess_array(self, image: np.ndarray) -> np.ndarray:
+        """Resize and normalize an RGB image to a single (224, 224, 3) input"""
+        # Resize to model input size
+        image = cv2.resize(image, IMAGE_SIZE)
+        
+        # Normalize pixel values
+        return image.astype(np.float32) / 255.0
+    
     def preprocess_image(self, image_path: str) -> np.ndarray:
         """Preprocess image for model prediction"""
         try:
-            # Load and resize image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError("Could not load image")
-            
-            # Convert BGR to RGB
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Resize to model input size
-            image = cv2.resize(image, (224, 224))
-            
-            # Normalize pixel values
-            image = image.astype(np.float32) / 255.0
+            image = self.preprocess_array(self.load_image(image_path))
             
             # Add batch dimension
             image = np.expand_dims(image, axis=0)
@@ -94,41 +233,266 @@ class PestDetectionModel:
             logger.error(f"Error preprocessing image: {e}")
             raise
     
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        """Run one forward pass over a preprocessed (N, 224, 224, 3) batch
+        
+        Returns the raw (N, num_classes) probability matrix.
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded")
+        
+        return self.compiled(images)[0]
+    
+    def predict_with_embedding(self, images: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Run one forward pass returning (probabilities, embeddings)"""
+        probabilities, embeddings = self.compiled(images)
+        return probabilities, embeddings
+    
+    def image_hash(self, image: np.ndarray) -> int:
+        """64-bit difference hash of an RGB image, as a signed integer
+        
+        Re-encoded, resized or re-compressed copies of a photo share the same
+        hash, which makes exact lookups on it a cheap duplicate check.
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return int(np.packbits(bits.ravel()).view(">i8")[0])
+    
+    def gate_healthy_probability(self, images: np.ndarray) -> np.ndarray:
+        """Calibrated P(Healthy) from the gate for a batch of RGB uint8 images"""
+        batch = np.stack([cv2.resize(image, GATE_IMAGE_SIZE) for image in images])
+        probabilities = self.compiled_gate(batch.astype(np.float32) / 255.0)[0]
+        return self.gate_calibration.apply(probabilities)[:, 0]
+    
     def predict(self, image_path: str) -> Dict:
         """Predict pest/disease from image"""
+        try:
+            return self.predict_image(self.load_image(image_path))
+        except Exception as e:
+            logger.error(f"Error in pest prediction: {e}")
+            return {
+                "error": str(e),
+                "primary_prediction": {"class": "Unknown", "confidence": 0.0}
+            }
+    
+    def predict_image(self, image: np.ndarray) -> Dict:
+        """Predict pest/disease from an RGB image array
+        
+        When a trained gate is available it runs first, and images it is
+        confidently healthy about skip the full 16-class model. Otherwise the
+        result also carries the image ``embedding`` from the same forward pass.
+        """
         try:
             if self.model is None:
                 raise ValueError("Model not loaded")
             
+            if self.compiled_gate is not None:
+                with stage_timer("pest_gate", "inference"):
+                    healthy_probability = float(self.gate_healthy_probability([image])[0])
+                if healthy_probability >= self.gate_exit_threshold:
+                    return self.format_gate_prediction(healthy_probability)
+            
             # Preprocess image
-            processed_image = self.preprocess_image(image_path)
+            with stage_timer("pest_detection", "preprocess"):
+                processed_image = np.expand_dims(self.preprocess_array(image), axis=0)
             
             # Make prediction
-            predictions = self.model.predict(processed_image)
-            confidence_scores = predictions[0]
+            with stage_timer("pest_detection", "inference"):
+                outputs = self.compiled(processed_image)
+            with stage_timer("pest_detection", "postprocess"):
+                result = self.format_predictions(self.calibration.apply(outputs[0][0]))
+            if len(outputs) > 1:
+                result["embedding"] = outputs[1][0]
+            return result
             
-            # Get top 3 predictions
-            top_indices = np.argsort(confidence_scores)[-3:][::-1]
+        except Exception as e:
+            logger.error(f"Error in pest prediction: {e}")
+            return {
+                "error": str(e),
+                "primary_prediction": {"class": "Unknown", "confidence": 0.0}
+            }
+    
+    def format_predictions(self, confidence_scores: np.ndarray) -> Dict:
+        """Build the prediction payload from one row of class scores"""
+        # Get top 3 predictions
+        top_indices = np.argsort(confidence_scores)[-3:][::-1]
+        
+        results = []
+        for idx in top_indices:
+            results.append({
+                "class": self.class_names[idx],
+                "confidence": float(confidence_scores[idx])
+            })
+        
+        # Get primary prediction
+        primary_prediction = results[0]
+        threshold = self.calibration.threshold(primary_prediction["class"])
+        
+        return {
+            "primary_prediction": primary_prediction,
+            "all_predictions": results,
+            "confidence_threshold": threshold,
+            "is_confident": primary_prediction["confidence"] >= threshold,
+            "high_severity_threshold": self.calibration.high_threshold(primary_prediction["class"]),
+            "is_healthy": primary_prediction["class"] == "Healthy",
+            "stage": "classifier"
+        }
+    
+    def format_gate_prediction(self, healthy_probability: float) -> Dict:
+        """Build the prediction payload for an early exit at the gate"""
+        primary_prediction = {"class": "Healthy", "confidence": healthy_probability}
+        return {
+            "primary_prediction": primary_prediction,
+            "all_predictions": [primary_prediction],
+            "confidence_threshold": self.gate_exit_threshold,
+            "is_confident": True,
+            "high_severity_threshold": self.calibration.high_threshold("Healthy"),
+            "is_healthy": True,
+            "stage": "gate"
+        }
+    
+    def plan_tiles(self, height: int, width: int, overlap: float, max_tiles: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Choose top-left corners of square tiles covering a (height, width) image
+        
+        Tiles overlap by ``overlap`` of their side. When the full grid exceeds
+        ``max_tiles`` the per-axis counts are scaled down together and the
+        tiles are spread evenly, trading overlap for the latency budget.
+        """
+        tile = IMAGE_SIZE[0]
+        stride = max(1, int(tile * (1 - overlap)))
+        rows = int(np.ceil(max(height - tile, 0) / stride)) + 1
+        cols = int(np.ceil(max(width - tile, 0) / stride)) + 1
+        
+        if rows * cols > max_tiles:
+            scale = np.sqrt(max_tiles / (rows * cols))
+            # A long thin image can scale one axis past the cap on its own
+            rows = min(max_tiles, max(1, int(rows * scale)))
+            cols = max(1, min(int(cols * scale), max_tiles // rows))
+        
+        ys = np.linspace(0, height - tile, rows).round().astype(np.int64)
+        xs = np.linspace(0, width - tile, cols).round().astype(np.int64)
+        grid_y, grid_x = np.meshgrid(ys, xs, indexing="ij")
+        return grid_y.ravel(), grid_x.ravel()
+    
+    def extract_tiles(self, image: np.ndarray, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        """Gather (N, 224, 224, 3) tiles at the given corners with one fancy-index"""
+        offsets = np.arange(IMAGE_SIZE[0])
+        rows = ys[:, None] + offsets
+        cols = xs[:, None] + offsets
+        return image[rows[:, :, None], cols[:, None, :]]
+    
+    def augment_tiles(self, tiles: np.ndarray, tta: bool) -> np.ndarray:
+        """Stack flip/rotate views of every tile as (views, N, 224, 224, 3)"""
+        if not tta:
+            return tiles[None]
+        
+        return np.stack([
+            tiles,
+            tiles[:, :, ::-1],
+            tiles[:, ::-1, :],
+            np.rot90(tiles, k=1, axes=(1, 2))
+        ])
+    
+    def predict_tiled(
+        self,
+        image: np.ndarray,
+        overlap: float = 0.25,
+        tta: bool = True,
+        latency_budget_ms: Optional[float] = None,
+        max_tiles: int = 64,
+        top_k: int = 5
+    ) -> Dict:
+        """Predict pest/disease from overlapping full-resolution tiles of an RGB image array
+        
+        Small lesions vanish when a field photo is squashed to 224x224, so the
+        image is cut into native-resolution tiles (plus one resized global
+        view), each optionally augmented with flips and a rotation, and all of
+        them are scored in a single batched forward pass. A class is reported
+        for the whole image if it is strong in any tile, while "Healthy" has to
+        hold for every tile. The tile count is capped by ``max_tiles`` and by
+        ``latency_budget_ms`` using the measured per-image inference cost.
+        """
+        try:
+            if self.model is None:
+                raise ValueError("Model not loaded")
             
-            results = []
-            for idx in top_indices:
-                results.append({
-                    "class": self.class_names[idx],
-                    "confidence": float(confidence_scores[idx])
-                })
+            preprocess_started = time.perf_counter()
+            height, width = image.shape[:2]
             
-            # Get primary prediction
-            primary_prediction = results[0]
+            # Upscale images smaller than one tile so every tile fits
+            tile = IMAGE_SIZE[0]
+            if min(height, width) < tile:
+                scale = tile / min(height, width)
+                image = cv2.resize(image, (max(tile, round(width * scale)), max(tile, round(height * scale))))
+            scale_y = height / image.shape[0]
+            scale_x = width / image.shape[1]
             
-            return {
-                "primary_prediction": primary_prediction,
-                "all_predictions": results,
-                "confidence_threshold": 0.7,
-                "is_healthy": primary_prediction["class"] == "Healthy"
-            }
+            views = 4 if tta else 1
+            if latency_budget_ms is not None:
+                affordable = int(latency_budget_ms / (self.ms_per_image * views)) - 1
+                max_tiles = max(1, min(max_tiles, affordable))
+            
+            ys, xs = self.plan_tiles(image.shape[0], image.shape[1], overlap, max_tiles)
+            tiles = self.extract_tiles(image, ys, xs)
+            
+            # The resized whole image keeps the standard prediction as a baseline
+            global_view = cv2.resize(image, IMAGE_SIZE)[None]
+            tiles = np.concatenate([global_view, tiles])
+            
+            batch = self.augment_tiles(tiles, tta)
+            num_views, num_tiles = batch.shape[:2]
+            batch = batch.reshape(-1, tile, tile, 3).astype(np.float32) / 255.0
+            
+            started = time.perf_counter()
+            ML_STAGE_SECONDS.labels("pest_detection_tiled", "preprocess").observe(started - preprocess_started)
+            with span("pest_detection_tiled.inference", **{"ml.batch_size": len(batch)}):
+                probabilities = self.calibration.apply(self.predict_batch(batch))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.ms_per_image = 0.8 * self.ms_per_image + 0.2 * elapsed_ms / len(batch)
+            ML_STAGE_SECONDS.labels("pest_detection_tiled", "inference").observe(elapsed_ms / 1000)
+            postprocess_started = time.perf_counter()
+            
+            # Average over augmented views, then split the global view off
+            tile_scores = probabilities.reshape(num_views, num_tiles, -1).mean(axis=0)
+            global_scores, tile_scores = tile_scores[0], tile_scores[1:]
+            
+            healthy = self.class_names.index("Healthy")
+            image_scores = np.maximum(global_scores, tile_scores.max(axis=0))
+            image_scores[healthy] = min(global_scores[healthy], tile_scores[:, healthy].min())
+            image_scores = image_scores / image_scores.sum()
+            
+            # Rank tiles by their strongest non-healthy class
+            pest_scores = tile_scores.copy()
+            pest_scores[:, healthy] = -1.0
+            best_class = pest_scores.argmax(axis=1)
+            best_score = pest_scores[np.arange(len(best_class)), best_class]
+            order = np.argsort(best_score)[::-1][:top_k]
+            
+            result = self.format_predictions(image_scores)
+            result.update({
+                "mode": "tiled",
+                "tiles_evaluated": int(num_tiles - 1),
+                "augmented_views": int(num_views),
+                "top_patches": [
+                    {
+                        "x": int(round(xs[i] * scale_x)),
+                        "y": int(round(ys[i] * scale_y)),
+                        "width": int(round(tile * scale_x)),
+                        "height": int(round(tile * scale_y)),
+                        "class": self.class_names[best_class[i]],
+                        "confidence": float(best_score[i])
+                    }
+                    for i in order
+                ]
+            })
+            ML_STAGE_SECONDS.labels("pest_detection_tiled", "postprocess").observe(
+                time.perf_counter() - postprocess_started
+            )
+            return result
             
         except Exception as e:
-            logger.error(f"Error in pest prediction: {e}")
+            logger.error(f"Error in tiled pest prediction: {e}")
             return {
                 "error": str(e),
                 "primary_prediction": {"class": "Unknown", "confidence": 0.0}
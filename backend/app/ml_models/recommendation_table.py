@@ -0,0 +1,304 @@
+"""
+Quantized lookup table for crop recommendations
+
+Continuous inputs are snapped to a grid and every (grid cell, categorical
+combination) maps to the top-k classes the forest predicts at the cell centre.
+Cells are filled lazily on first use (or precomputed in bulk) and stored in
+flat NumPy arrays that are persisted next to the model.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONTINUOUS_FEATURES = ["temperature", "humidity", "ph", "rainfall"]
+
+# Physically plausible input ranges; values outside them bypass the table
+DEFAULT_RANGES = {
+    "temperature": (-10.0, 50.0),
+    "humidity": (0.0, 100.0),
+    "ph": (0.0, 14.0),
+    "rainfall": (0.0, 5000.0)
+}
+
+class RecommendationTable:
+    """Array-backed memo of top-k predictions per quantized input cell"""
+
+    def __init__(
+        self,
+        steps: Dict[str, float],
+        category_sizes: Sequence[int],
+        n_classes: int,
+        top_k: int = 5,
+        ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+        capacity: int = 4096
+    ):
+        self.steps = np.array([steps[name] for name in CONTINUOUS_FEATURES], dtype=np.float64)
+        ranges = ranges or DEFAULT_RANGES
+        self.lows = np.array([ranges[name][0] for name in CONTINUOUS_FEATURES], dtype=np.float64)
+        self.highs = np.array([ranges[name][1] for name in CONTINUOUS_FEATURES], dtype=np.float64)
+        self.bins = np.floor((self.highs - self.lows) / self.steps).astype(np.int64) + 1
+        self.category_sizes = np.array(category_sizes, dtype=np.int64)
+        self.n_classes = n_classes
+        self.top_k = min(top_k, n_classes)
+
+        self.lock = threading.Lock()
+        self.slots: Dict[int, int] = {}
+        self.keys = np.empty(capacity, dtype=np.int64)
+        self.classes = np.empty((capacity, self.top_k), dtype=np.int16)
+        self.probabilities = np.empty((capacity, self.top_k), dtype=np.float32)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @property
+    def total_cells(self) -> int:
+        return int(np.prod(self.bins) * np.prod(self.category_sizes))
+
+    def cell(self, features: np.ndarray) -> Optional[Tuple[int, np.ndarray]]:
+        """Return (cell key, quantized feature row) or ``None`` if out of range
+
+        ``features`` is one row in model column order: the four continuous
+        features followed by the encoded categoricals.
+        """
+        continuous = features[:4].astype(np.float64)
+        if np.any(continuous < self.lows) or np.any(continuous > self.highs):
+            return None
+
+        indices = np.rint((continuous - self.lows) / self.steps).astype(np.int64)
+        indices = np.minimum(indices, self.bins - 1)
+        categories = features[4:].astype(np.int64)
+
+        key = 0
+        for index, size in zip(categories, self.category_sizes):
+            key = key * size + index
+        for index, size in zip(indices, self.bins):
+            key = key * size + index
+
+        quantized = features.astype(np.float64).copy()
+        quantized[:4] = self.lows + indices * self.steps
+        return int(key), quantized
+
+    def decode(self, keys: np.ndarray) -> np.ndarray:
+        """Rebuild quantized feature rows from cell keys"""
+        keys = np.asarray(keys, dtype=np.int64).copy()
+        columns = []
+        for size in self.bins[::-1]:
+            columns.append(keys % size)
+            keys //= size
+        continuous = self.lows + np.stack(columns[::-1], axis=1) * self.steps
+
+        categories = []
+        for size in self.category_sizes[::-1]:
+            categories.append(keys % size)
+            keys //= size
+        return np.hstack([continuous, np.stack(categories[::-1], axis=1)])
+
+    def _store(self, keys: np.ndarray, probabilities: np.ndarray):
+        order = np.argsort(probabilities, axis=1)[:, ::-1][:, :self.top_k]
+        top = np.take_along_axis(probabilities, order, axis=1)
+
+        with self.lock:
+            needed = self.size + len(keys)
+            if needed > len(self.keys):
+                capacity = max(needed, 2 * len(self.keys))
+                self.keys = np.resize(self.keys, capacity)
+                self.classes = np.resize(self.classes, (capacity, self.top_k))
+                self.probabilities = np.resize(self.probabilities, (capacity, self.top_k))
+
+            for key, classes, probs in zip(keys, order, top):
+                key = int(key)
+                if key in self.slots:
+                    continue
+                slot = self.size
+                self.keys[slot] = key
+                self.classes[slot] = classes
+                self.probabilities[slot] = probs
+                self.slots[key] = slot
+                self.size += 1
+
+    def lookup(
+        self,
+        features: np.ndarray,
+        predict_proba: Callable[[np.ndarray], np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (class indices, probabilities) for one feature row
+
+        Misses evaluate ``predict_proba`` at the cell centre and memoize it, so
+        the answer for a cell never depends on which request filled it.
+        """
+        cell = self.cell(features)
+        if cell is None:
+            with self.lock:
+                self.bypassed += 1
+            probabilities = predict_proba(features.reshape(1, -1))[0]
+            order = np.argsort(probabilities)[::-1][:self.top_k]
+            return order, probabilities[order]
+
+        key, quantized = cell
+        slot = self.slots.get(key)
+        if slot is None:
+            with self.lock:
+                self.misses += 1
+            self._store(np.array([key]), predict_proba(quantized.reshape(1, -1)))
+            slot = self.slots[key]
+        else:
+            with self.lock:
+                self.hits += 1
+
+        return self.classes[slot].astype(np.int64), self.probabilities[slot]
+
+    def precompute(
+        self,
+        predict_proba: Callable[[np.ndarray], np.ndarray],
+        max_cells: int = 5_000_000,
+        batch_size: int = 65536
+    ) -> int:
+        """Fill every cell of the grid in batches, returning the cells added"""
+        if self.total_cells > max_cells:
+            raise ValueError(
+                f"Grid has {self.total_cells} cells, more than max_cells={max_cells}; "
+                "use coarser steps or rely on lazy filling"
+            )
+
+        added = 0
+        for start in range(0, self.total_cells, batch_size):
+            keys = np.arange(start, min(start + batch_size, self.total_cells), dtype=np.int64)
+            keys = keys[[int(key) not in self.slots for key in keys]]
+            if len(keys):
+                self._store(keys, predict_proba(self.decode(keys)))
+                added += len(keys)
+        return added
+
+    def agreement(
+        self,
+        samples: np.ndarray,
+        predict_proba: Callable[[np.ndarray], np.ndarray]
+    ) -> Dict:
+        """Compare table answers to the exact model on raw (unquantized) samples
+
+        A cell's answer is the model at its centre, so the table's answers are
+        computed from the quantized samples directly, without filling cells or
+        counting lookups.
+        """
+        exact = predict_proba(samples)
+        exact_top = np.argsort(exact, axis=1)[:, ::-1][:, :self.top_k]
+
+        quantized = np.array(samples, dtype=np.float64)
+        for i, row in enumerate(samples):
+            cell = self.cell(row)
+            if cell is not None:
+                quantized[i] = cell[1]
+        table_top = np.argsort(predict_proba(quantized), axis=1)[:, ::-1][:, :self.top_k]
+
+        top1 = 0
+        overlap = 0.0
+        for classes, expected in zip(table_top, exact_top):
+            top1 += int(classes[0] == expected[0])
+            overlap += len(set(classes.tolist()) & set(expected.tolist())) / self.top_k
+
+        return {
+            "samples": int(len(samples)),
+            "top1_agreement": top1 / len(samples),
+            "topk_overlap": overlap / len(samples)
+        }
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "cells_filled": self.size,
+            "total_cells": self.total_cells,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _read(self, path: str, class_labels: List[str]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Persisted (keys, classes, probabilities), or ``None`` if missing or built for another grid"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if (
+                not np.array_equal(data["steps"], self.steps)
+                or not np.array_equal(data["lows"], self.lows)
+                or not np.array_equal(data["highs"], self.highs)
+                or not np.array_equal(data["category_sizes"], self.category_sizes)
+                or data["class_labels"].tolist() != list(class_labels)
+                or data["classes"].shape[1] != self.top_k
+            ):
+                logger.info("Ignoring crop lookup table built for a different grid or model")
+                return None
+            return data["keys"], data["classes"], data["probabilities"]
+
+    def save(self, path: str, class_labels: List[str]):
+        """Merge the cells filled here into the file at ``path``
+
+        Every worker saves on shutdown, so writers take an exclusive lock on
+        ``<path>.lock``, keep the cells earlier writers stored and replace the
+        file atomically; readers never see a partly written table.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self.lock:
+                size = self.size
+                keys = self.keys[:size].copy()
+                classes = self.classes[:size].copy()
+                probabilities = self.probabilities[:size].copy()
+
+            try:
+                stored = self._read(path, class_labels)
+            except Exception as e:
+                logger.warning(f"Overwriting unreadable crop lookup table: {e}")
+                stored = None
+            if stored is not None:
+                new = ~np.isin(stored[0], keys)
+                keys = np.concatenate([keys, stored[0][new]])
+                classes = np.concatenate([classes, stored[1][new].astype(np.int16)])
+                probabilities = np.concatenate([probabilities, stored[2][new].astype(np.float32)])
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    steps=self.steps,
+                    lows=self.lows,
+                    highs=self.highs,
+                    category_sizes=self.category_sizes,
+                    class_labels=np.array(class_labels),
+                    keys=keys,
+                    classes=classes,
+                    probabilities=probabilities
+                )
+            os.replace(tmp_path, path)
+
+    def load(self, path: str, class_labels: List[str]) -> bool:
+        """Load persisted cells if they were built for the same grid and classes"""
+        try:
+            stored = self._read(path, class_labels)
+            if stored is None:
+                return False
+            keys, classes, probabilities = stored
+            self._store_loaded(keys, classes, probabilities)
+            logger.info(f"Loaded crop lookup table with {len(keys)} cells")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading crop lookup table: {e}")
+            return False
+
+    def _store_loaded(self, keys: np.ndarray, classes: np.ndarray, probabilities: np.ndarray):
+        with self.lock:
+            capacity = max(len(self.keys), 2 * len(keys))
+            self.keys = np.resize(keys.astype(np.int64), capacity)
+            self.classes = np.resize(classes.astype(np.int16), (capacity, self.top_k))
+            self.probabilities = np.resize(probabilities.astype(np.float32), (capacity, self.top_k))
+            self.slots = {int(key): slot for slot, key in enumerate(keys)}
+            self.size = len(keys)
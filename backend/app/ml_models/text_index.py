@@ -0,0 +1,204 @@
+"""
+BM25 full-text index for advisory retrieval
+
+Postings are stored as flat NumPy arrays in CSR layout (per-term offsets into
+a document id array), with the BM25 weight of every (term, document) pair
+precomputed at build time. Scoring a query is then a gather of the postings of
+its terms plus one ``bincount`` over the collection, with no per-document
+Python work. Document metadata is stored as JSON in the same ``.npz`` as the
+postings, so replacing that one file swaps both at once and a worker reloading
+mid-rebuild never pairs new postings with old documents.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its "
+    "my of on or should so than that the their then there these this to was what when "
+    "where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+class BM25Index:
+    """Precomputed BM25 index over ``(document, text)`` pairs
+
+    ``document`` is a JSON-serialisable dict returned with each hit, so callers
+    can answer from the index without a database round trip.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.vocabulary: Optional[Dict[str, int]] = None
+        self.offsets = None
+        self.doc_ids = None
+        self.weights = None
+        self.documents: List[Dict] = []
+        self.loaded_mtime: Optional[float] = None
+        self.checked_at = float("-inf")
+        self.load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def load(self):
+        """Load a previously built index, if there is one"""
+        try:
+            if os.path.exists(self._path("postings.npz")):
+                # The open file stays the one read even if a rebuild replaces it meanwhile
+                with open(self._path("postings.npz"), "rb") as f:
+                    mtime = os.fstat(f.fileno()).st_mtime
+                    with np.load(f) as postings:
+                        offsets, doc_ids, weights = postings["offsets"], postings["doc_ids"], postings["weights"]
+                        meta = json.loads(postings["meta"].tobytes()) if "meta" in postings.files else None
+                if meta is None:
+                    # Saved before the metadata moved into the postings file
+                    with open(self._path("documents.json")) as f:
+                        meta = json.load(f)
+                with self.lock:
+                    self.offsets = offsets
+                    self.doc_ids = doc_ids
+                    self.weights = weights
+                    self.vocabulary = {term: i for i, term in enumerate(meta["vocabulary"])}
+                    self.documents = meta["documents"]
+                    self.loaded_mtime = mtime
+                logger.info(f"Loaded text index with {len(self.documents)} documents")
+        except Exception as e:
+            logger.error(f"Error loading text index: {e}")
+            with self.lock:
+                self.vocabulary = self.offsets = self.doc_ids = self.weights = None
+                self.documents = []
+
+    def reload_if_changed(self, interval: float) -> bool:
+        """Load a rebuilt index, checking the files at most every ``interval`` seconds
+
+        Lets every worker process pick up an index rebuilt by a job or
+        reloaded through another worker, without any coordination.
+        """
+        now = time.monotonic()
+        if now - self.checked_at < interval:
+            return False
+        self.checked_at = now
+        try:
+            mtime = os.stat(self._path("postings.npz")).st_mtime
+        except OSError:
+            return False
+        if mtime == self.loaded_mtime:
+            return False
+        self.load()
+        return True
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def build(self, items: Iterable[Tuple[Dict, str]], save: bool = True):
+        """Build the index from ``(document, text)`` pairs, replacing the current one"""
+        vocabulary: Dict[str, int] = {}
+        documents: List[Dict] = []
+        term_ids: List[np.ndarray] = []
+        term_counts: List[np.ndarray] = []
+
+        for document, text in items:
+            counts = Counter(tokenize(text))
+            if not counts:
+                continue
+            ids = np.fromiter(
+                (vocabulary.setdefault(term, len(vocabulary)) for term in counts),
+                dtype=np.int32, count=len(counts)
+            )
+            term_ids.append(ids)
+            term_counts.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            documents.append(document)
+
+        if not documents:
+            raise ValueError("No documents to index")
+
+        lengths = np.array([counts.sum() for counts in term_counts], dtype=np.float32)
+        posting_docs = np.repeat(np.arange(len(documents), dtype=np.int32), [len(ids) for ids in term_ids])
+        posting_terms = np.concatenate(term_ids)
+        tf = np.concatenate(term_counts)
+
+        # Group postings by term; a stable sort keeps each list in document order
+        order = np.argsort(posting_terms, kind="stable")
+        posting_terms, posting_docs, tf = posting_terms[order], posting_docs[order], tf[order]
+        df = np.bincount(posting_terms, minlength=len(vocabulary))
+        offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        n_docs = len(documents)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / lengths.mean())
+        weights = idf[posting_terms] * tf * (self.k1 + 1) / (tf + norm[posting_docs])
+
+        with self.lock:
+            self.vocabulary = vocabulary
+            self.offsets = offsets
+            self.doc_ids = posting_docs
+            self.weights = weights.astype(np.float32)
+            self.documents = documents
+
+        if save:
+            self.save()
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with self.lock:
+            vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+            meta = json.dumps({"vocabulary": vocabulary, "documents": self.documents}).encode()
+            tmp_postings = self._path("postings.tmp.npz")
+            np.savez(
+                tmp_postings,
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                weights=self.weights,
+                meta=np.frombuffer(meta, dtype=np.uint8)
+            )
+        os.replace(tmp_postings, self._path("postings.npz"))
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Dict, float]]:
+        """Return up to ``k`` (document, BM25 score) pairs, best first"""
+        with self.lock:
+            vocabulary, offsets, doc_ids, weights = self.vocabulary, self.offsets, self.doc_ids, self.weights
+            documents = self.documents
+
+        if vocabulary is None:
+            return []
+
+        query_terms = Counter(term for term in tokenize(query) if term in vocabulary)
+        if not query_terms:
+            return []
+
+        hit_docs, hit_weights = [], []
+        for term, count in query_terms.items():
+            term_id = vocabulary[term]
+            start, end = offsets[term_id], offsets[term_id + 1]
+            hit_docs.append(doc_ids[start:end])
+            hit_weights.append(weights[start:end] * count)
+
+        scores = np.bincount(np.concatenate(hit_docs), np.concatenate(hit_weights), minlength=len(documents))
+        candidates = np.flatnonzero(scores)
+        top = min(k, len(candidates))
+        if top == 0:
+            return []
+        best = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+        best = best[np.argsort(-scores[best])]
+        return [(documents[i], float(scores[i])) for i in best]
@@ -0,0 +1,248 @@
+"""
+Approximate nearest-neighbour index for image embeddings
+
+An inverted-file (IVF) index in plain NumPy: vectors are clustered with
+spherical k-means, stored grouped by cluster in memory-mapped ``.npy`` files,
+and a query only scans the ``n_probe`` clusters closest to it. Vectors are
+L2-normalised and kept as float16, so a million 512-d embeddings take ~1 GB
+on disk and only the probed pages are read into memory.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def pack_vector(vector: np.ndarray) -> bytes:
+    """Serialise a normalised embedding as float16 bytes for database storage"""
+    return normalize(vector).astype(np.float16).tobytes()
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 15, seed: int = 42) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity, returning unit centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_clusters(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Re-seed empty clusters from random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+
+    return centroids
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the most similar centroid for every vector, in bounded-memory chunks"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + chunk_size] = (chunk @ centroids.T).argmax(axis=1)
+    return assignments
+
+class IVFIndex:
+    """Memory-mapped IVF index with an in-memory buffer for recent additions
+
+    Vectors added after the last build are kept in a small buffer that is
+    searched exhaustively; a periodic rebuild folds them into the mapped files.
+    Loading a rebuilt index drops the buffered vectors it already holds, and
+    beyond ``max_buffer`` the oldest buffered vectors wait for the next build.
+
+    A build replaces each file atomically, ``vectors.npy`` last, so processes
+    that still map the old files keep reading them until they reload.
+    """
+
+    def __init__(self, index_dir: str, dim: int = 512, n_probe: int = 8, max_buffer: int = 50_000):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.n_probe = n_probe
+        self.max_buffer = max_buffer
+        self.lock = threading.Lock()
+        self.centroids = None
+        self.offsets = None
+        self.ids = None
+        self.vectors = None
+        self.buffer_ids: List[int] = []
+        self.buffer_vectors: List[np.ndarray] = []
+        self.loaded_mtime: Optional[float] = None
+        self.checked_at = float("-inf")
+        self.load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, f"{name}.npy")
+
+    def _read_files(self) -> Optional[Tuple[float, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Map the index files, or return ``None`` if a build replaced them while reading"""
+        mtime = os.stat(self._path("vectors")).st_mtime
+        centroids = np.load(self._path("centroids"))
+        offsets = np.load(self._path("offsets"))
+        ids = np.load(self._path("ids"), mmap_mode="r")
+        vectors = np.load(self._path("vectors"), mmap_mode="r")
+        consistent = (
+            os.stat(self._path("vectors")).st_mtime == mtime
+            and len(offsets) == len(centroids) + 1
+            and offsets[-1] == len(ids) == len(vectors)
+        )
+        return (mtime, centroids, offsets, ids, vectors) if consistent else None
+
+    def load(self):
+        """Map a previously built index, if there is one"""
+        try:
+            if os.path.exists(self._path("vectors")):
+                files = self._read_files() or self._read_files()
+                if files is None:
+                    raise ValueError("index files changed while loading")
+                mtime, centroids, offsets, ids, vectors = files
+                with self.lock:
+                    self.centroids, self.offsets, self.ids, self.vectors = centroids, offsets, ids, vectors
+                    self.loaded_mtime = mtime
+                    # Vectors the rebuild picked up would otherwise be returned twice
+                    if self.buffer_ids:
+                        keep = ~np.isin(np.array(self.buffer_ids, dtype=np.int64), ids)
+                        self.buffer_ids = [item_id for item_id, kept in zip(self.buffer_ids, keep) if kept]
+                        self.buffer_vectors = [vector for vector, kept in zip(self.buffer_vectors, keep) if kept]
+                logger.info(f"Loaded vector index with {len(ids)} vectors, {len(self.buffer_ids)} buffered")
+        except Exception as e:
+            logger.error(f"Error loading vector index: {e}")
+            with self.lock:
+                self.centroids = self.offsets = self.ids = self.vectors = None
+
+    def reload_if_changed(self, interval: float) -> bool:
+        """Map a rebuilt index, checking the files at most every ``interval`` seconds"""
+        now = time.monotonic()
+        if now - self.checked_at < interval:
+            return False
+        self.checked_at = now
+        try:
+            mtime = os.stat(self._path("vectors")).st_mtime
+        except OSError:
+            return False
+        if mtime == self.loaded_mtime:
+            return False
+        self.load()
+        return True
+
+    def __len__(self) -> int:
+        return (0 if self.ids is None else len(self.ids)) + len(self.buffer_ids)
+
+    def add(self, item_id: int, vector: np.ndarray):
+        """Make a vector searchable immediately, until the next rebuild"""
+        with self.lock:
+            self.buffer_ids.append(item_id)
+            self.buffer_vectors.append(normalize(vector).astype(np.float16))
+            excess = len(self.buffer_ids) - self.max_buffer
+            if excess > 0:
+                del self.buffer_ids[:excess], self.buffer_vectors[:excess]
+
+    def build(
+        self,
+        batches: Iterable[Tuple[np.ndarray, np.ndarray]],
+        total: int,
+        n_lists: Optional[int] = None,
+        sample_size: int = 100_000
+    ):
+        """Build the index from ``(ids, vectors)`` batches holding ``total`` rows
+
+        Rows are first spooled to a memory-mapped scratch file so that inputs
+        larger than memory can be clustered from a sample, assigned in chunks
+        and rewritten grouped by cluster.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        scratch_path = os.path.join(self.index_dir, "scratch.npy")
+        scratch = np.lib.format.open_memmap(scratch_path, mode="w+", dtype=np.float16, shape=(total, self.dim))
+        all_ids = np.empty(total, dtype=np.int64)
+
+        count = 0
+        for ids, vectors in batches:
+            size = min(len(ids), total - count)
+            scratch[count:count + size] = normalize(vectors[:size])
+            all_ids[count:count + size] = ids[:size]
+            count += size
+        if count == 0:
+            raise ValueError("No vectors to index")
+
+        n_lists = n_lists or int(np.clip(4 * np.sqrt(count), 1, 65536))
+        n_lists = min(n_lists, count)
+        rng = np.random.default_rng(42)
+        sample = np.sort(rng.choice(count, min(sample_size, count), replace=False))
+        centroids = spherical_kmeans(np.asarray(scratch[sample], dtype=np.float32), n_lists)
+
+        assignments = assign_clusters(scratch[:count], centroids)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))])
+
+        tmp_vectors = self._path("vectors.tmp")
+        vectors_out = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float16, shape=(count, self.dim))
+        for start in range(0, count, 65536):
+            chunk = order[start:start + 65536]
+            # Read rows in file order, then place them back in cluster order
+            read_order = np.argsort(chunk)
+            block = np.empty((len(chunk), self.dim), dtype=np.float16)
+            block[read_order] = scratch[chunk[read_order]]
+            vectors_out[start:start + len(chunk)] = block
+        vectors_out.flush()
+        del vectors_out, scratch
+        os.remove(scratch_path)
+
+        # Other processes keep mapping the replaced files until they reload;
+        # vectors.npy goes last because its mtime marks a new build
+        for name, array in (("centroids", centroids), ("offsets", offsets), ("ids", all_ids[:count][order])):
+            np.save(self._path(f"{name}.tmp"), array)
+            os.replace(self._path(f"{name}.tmp"), self._path(name))
+        os.replace(tmp_vectors, self._path("vectors"))
+        # Keeps buffered vectors added while building, which the new files do not hold
+        self.load()
+
+    def search(self, query: np.ndarray, k: int = 10, exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return up to ``k`` (id, cosine similarity) pairs, most similar first"""
+        query = normalize(query)
+        candidate_ids, candidate_scores = [], []
+
+        with self.lock:
+            centroids, offsets, ids, vectors = self.centroids, self.offsets, self.ids, self.vectors
+            buffer_ids = list(self.buffer_ids)
+            buffer_vectors = list(self.buffer_vectors)
+
+        if vectors is not None:
+            n_probe = min(self.n_probe, len(centroids))
+            probes = np.argpartition(-(centroids @ query), n_probe - 1)[:n_probe]
+            for cluster in probes:
+                start, end = offsets[cluster], offsets[cluster + 1]
+                if start == end:
+                    continue
+                candidate_ids.append(np.asarray(ids[start:end]))
+                candidate_scores.append(np.asarray(vectors[start:end], dtype=np.float32) @ query)
+
+        if buffer_ids:
+            candidate_ids.append(np.array(buffer_ids, dtype=np.int64))
+            candidate_scores.append(np.stack(buffer_vectors).astype(np.float32) @ query)
+
+        if not candidate_ids:
+            return []
+
+        all_ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        if exclude_id is not None:
+            scores = np.where(all_ids == exclude_id, -np.inf, scores)
+
+        top = min(k, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(int(all_ids[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
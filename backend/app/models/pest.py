@@ -2,7 +2,7 @@
 Pest and disease models for pest detection system
 """
 
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Text, DateTime, Boolean, JSON, LargeBinary
 from sqlalchemy.sql import func
 from app.database.connection import Base
 
@@ -31,6 +31,10 @@ class PestDetection(Base):
     image_path = Column(String(500), nullable=False)
     detected_pest_id = Column(Integer, nullable=True, index=True)
     confidence_score = Column(Float, nullable=True)  # ML model confidence
+    model_version = Column(String(50), nullable=True, index=True)  # Model that produced the score
+    predictions = Column(JSON, nullable=True)  # Top predictions returned to the user
+    image_hash = Column(BigInteger, nullable=True, index=True)  # Perceptual hash for duplicate lookup
+    embedding = Column(LargeBinary, nullable=True)  # Penultimate-layer embedding (float16)
     detection_date = Column(DateTime(timezone=True), server_default=func.now())
     location = Column(String(255), nullable=True)
     crop_affected = Column(String(100), nullable=True)
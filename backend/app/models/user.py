@@ -2,7 +2,7 @@
 User model for authentication and user management
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float
 from sqlalchemy.sql import func
 from app.database.connection import Base
 
@@ -27,3 +27,6 @@ class User(Base):
     experience_years = Column(Integer, default=0)
     primary_crops = Column(Text, nullable=True)  # JSON string of crops
     farming_method = Column(String(100), nullable=True)  # Organic, Conventional, etc.
+    soil_type = Column(String(50), nullable=True)  # clay, loamy, sandy, silt or black
+    soil_ph = Column(Float, nullable=True)
+    region = Column(String(50), nullable=True)  # north, south, east, west or central
@@ -18,7 +18,7 @@ class WeatherData(Base):
     wind_speed = Column(Float, nullable=True)
     wind_direction = Column(Float, nullable=True)
     pressure = Column(Float, nullable=True)
-    rainfall = Column(Float, nullable=True)
+    rainfall = Column(Float, nullable=True)  # mm/h
     uv_index = Column(Float, nullable=True)
     visibility = Column(Float, nullable=True)
     weather_condition = Column(String(100), nullable=True)  # Sunny, Rainy, Cloudy, etc.
@@ -38,3 +38,16 @@ class WeatherAlert(Base):
     end_date = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class WeatherAlertRule(Base):
+    __tablename__ = "weather_alert_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    metric = Column(String(50), nullable=False)  # temperature_max, rainfall_total, wind_speed_max, etc.
+    comparator = Column(String(10), nullable=False)  # above, below
+    threshold = Column(Float, nullable=False)
+    alert_type = Column(String(50), nullable=False)  # Storm, Drought, Flood, etc.
+    severity = Column(String(20), nullable=False)  # Low, Medium, High, Critical
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
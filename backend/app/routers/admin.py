@@ -0,0 +1,124 @@
+"""
+Operational admin API endpoints
+"""
+
+import asyncio
+import os
+import tracemalloc
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.profiling import (
+    flamegraph_svg,
+    format_collapsed,
+    load_profile,
+    memory_diff,
+    memory_snapshots,
+    memory_summary,
+    memory_top,
+    start_memory_tracing,
+    start_profile,
+    stop_memory_tracing,
+    stop_profile,
+    take_memory_snapshot
+)
+from app.core.pubsub import broker
+from app.core.response_cache import response_cache
+from app.core.security import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.post("/cache/{namespace}/invalidate")
+async def invalidate_response_cache(namespace: str):
+    """Invalidate every cached response in a namespace after reference data changes"""
+    version = await response_cache.invalidate(namespace)
+    return {"namespace": namespace, "version": version}
+
+@router.get("/cache/stats")
+async def get_response_cache_stats():
+    """Get response cache hit counts for this process"""
+    return {**response_cache.stats, "l1_entries": len(response_cache.l1)}
+
+@router.get("/push/stats")
+async def get_push_stats():
+    """Get real-time push connection counts and fan-out latency for this process"""
+    return broker.metrics()
+
+def render_profile(stacks: Dict[str, int], output: str, title: str) -> Response:
+    if output == "svg":
+        return Response(flamegraph_svg(stacks, title=title), media_type="image/svg+xml")
+    return PlainTextResponse(format_collapsed(stacks))
+
+@router.get("/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10, gt=0),
+    interval_ms: Optional[float] = Query(None, ge=1, le=100),
+    output: str = Query("collapsed", pattern="^(collapsed|svg)$"),
+    idle: bool = False
+):
+    """Sample every thread of this worker for ``seconds`` under live traffic
+    
+    Returns collapsed stacks (for flamegraph.pl, speedscope) or a flamegraph
+    SVG. Idle threads (event loop waiting in select, parked pool threads) are
+    left out unless ``idle`` is set.
+    """
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.PROFILING_MAX_SECONDS}")
+    
+    profiler = start_profile(interval_ms)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await run_in_threadpool(stop_profile, profiler)
+    
+    title = f"pid {os.getpid()}, {profiler.duration:.1f}s, {profiler.samples} samples"
+    return render_profile(profiler.collapsed(include_idle=idle), output, title)
+
+@router.get("/profile/requests/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    output: str = Query("collapsed", pattern="^(collapsed|svg)$")
+):
+    """Get the profile of a request sent with ``X-Profile: 1`` by its ``X-Profile-Id``"""
+    stacks = await run_in_threadpool(load_profile, profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return render_profile(stacks, output, f"request {profile_id}")
+
+@router.post("/profile/memory/start")
+async def start_memory_profile(frames: int = Query(25, ge=1, le=100)):
+    """Start tracemalloc in this worker, keeping ``frames`` frames per allocation"""
+    start_memory_tracing(frames)
+    return memory_summary()
+
+@router.post("/profile/memory/snapshot")
+async def snapshot_memory_profile(
+    limit: int = Query(25, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|traceback)$")
+):
+    """Snapshot traced allocations: the first is the baseline, later ones are diffed against it"""
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="Memory tracing is not running in this worker")
+    snapshot = await run_in_threadpool(take_memory_snapshot)
+    return {**memory_summary(), "top": memory_top(snapshot, group_by, limit)}
+
+@router.get("/profile/memory/diff")
+async def diff_memory_profile(
+    limit: int = Query(25, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|traceback)$")
+):
+    """Allocation growth between the baseline snapshot and the latest one"""
+    if len(memory_snapshots) < 2:
+        raise HTTPException(status_code=409, detail="Take at least two snapshots in this worker first")
+    growth = await run_in_threadpool(memory_diff, group_by, limit)
+    return {**memory_summary(), "growth": growth}
+
+@router.post("/profile/memory/stop")
+async def stop_memory_profile():
+    """Stop tracemalloc and drop the snapshots of this worker"""
+    stop_memory_tracing()
+    return memory_summary()
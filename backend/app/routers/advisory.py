@@ -3,14 +3,39 @@ AI Advisory API endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 from app.database import get_db
+from app.database.connection import SessionLocal
+from app.ml_models.text_index import BM25Index
 from app.schemas.advisory import AdvisoryRequest, AdvisoryResponse
+from app.services.advisory_retrieval_service import AdvisoryRetrievalService
 from app.services.advisory_service import AdvisoryService
-from typing import Optional
+from app.core.config import settings
+from app.core.security import require_admin
+from app.core.response_cache import cached_response
+from app.core.responses import SSE_HEADERS, sse_event
+from typing import Any, Dict, Iterator, Optional
+import logging
+import re
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+WORDS_PER_TOKEN_EVENT = 8
+
+# BM25 index over knowledge-base articles and forum threads
+advisory_index = BM25Index(settings.ADVISORY_INDEX_DIR)
+
+def query_context(db: Session, request: AdvisoryRequest) -> Dict[str, Any]:
+    """Request context plus retrieved passages and the user's cached farm snapshot"""
+    advisory_index.reload_if_changed(settings.ADVISORY_INDEX_CHECK_SECONDS)
+    retrieved = AdvisoryRetrievalService(db, advisory_index).retrieve(request.query, request.user_id)
+    return {**(request.context or {}), **retrieved}
+
 @router.post("/chat", response_model=AdvisoryResponse)
 async def get_ai_advice(
     request: AdvisoryRequest,
@@ -20,11 +45,15 @@ async def get_ai_advice(
     advisory_service = AdvisoryService(db)
     
     try:
+        # Retrieval and the snapshot lookup block on the database, Redis and the index
+        context = await run_in_threadpool(query_context, db, request)
+        
         # Process the user query
-        advice = advisory_service.process_query(
+        advice = await run_in_threadpool(
+            advisory_service.process_query,
             query=request.query,
             user_id=request.user_id,
-            context=request.context
+            context=context
         )
         
         # Save the conversation
@@ -46,6 +75,74 @@ async def get_ai_advice(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing advisory request: {str(e)}")
 
+def response_chunks(text: str, words: int = WORDS_PER_TOKEN_EVENT) -> Iterator[str]:
+    """Split a response into chunks of whole words, keeping the original whitespace"""
+    tokens = re.findall(r"\s*\S+\s*", text)
+    for start in range(0, len(tokens), words):
+        yield "".join(tokens[start:start + words])
+
+def save_streamed_conversation(request: AdvisoryRequest, result: Dict[str, Any]):
+    """Persist a streamed conversation once the stream has closed"""
+    if "advice" not in result:
+        return
+    db = SessionLocal()
+    try:
+        AdvisoryService(db).save_conversation({
+            "user_id": request.user_id,
+            "query": request.query,
+            "response": result["advice"]["response"],
+            "context": request.context
+        })
+    except Exception as e:
+        logger.error(f"Error saving streamed conversation for user {request.user_id}: {e}")
+    finally:
+        db.close()
+
+@router.post("/chat/stream")
+async def stream_ai_advice(
+    request: AdvisoryRequest,
+    db: Session = Depends(get_db)
+):
+    """Get AI-powered farming advice as a Server-Sent Events stream
+    
+    Events: ``start`` as soon as the request is accepted, ``token`` chunks of
+    the response text, one ``recommendation`` per recommendation,
+    ``related_topics``, then ``done`` with the confidence score (or
+    ``error``). The conversation is saved after the stream closes, so unlike
+    ``/chat`` the stream carries no ``conversation_id``.
+    """
+    advisory_service = AdvisoryService(db)
+    result: Dict[str, Any] = {}
+
+    async def stream():
+        yield sse_event("start", {"user_id": request.user_id, "query": request.query})
+        try:
+            context = await run_in_threadpool(query_context, db, request)
+            advice = await run_in_threadpool(
+                advisory_service.process_query,
+                query=request.query,
+                user_id=request.user_id,
+                context=context
+            )
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error processing advisory request: {str(e)}"})
+            return
+
+        result["advice"] = advice
+        for chunk in response_chunks(advice["response"]):
+            yield sse_event("token", {"text": chunk})
+        for recommendation in advice["recommendations"]:
+            yield sse_event("recommendation", recommendation)
+        yield sse_event("related_topics", advice["related_topics"])
+        yield sse_event("done", {"confidence_score": advice["confidence_score"]})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(save_streamed_conversation, request, result)
+    )
+
 @router.get("/conversations/{user_id}")
 async def get_user_conversations(
     user_id: int,
@@ -72,6 +169,7 @@ async def get_user_conversations(
         raise HTTPException(status_code=500, detail=f"Error fetching conversations: {str(e)}")
 
 @router.get("/quick-actions")
+@cached_response("advisory")
 async def get_quick_actions(
     category: Optional[str] = None,
     db: Session = Depends(get_db)
@@ -107,6 +205,7 @@ async def get_personalized_recommendations(
         raise HTTPException(status_code=500, detail=f"Error generating recommendations: {str(e)}")
 
 @router.get("/knowledge-base")
+@cached_response("advisory")
 async def get_knowledge_base(
     topic: Optional[str] = None,
     category: Optional[str] = None,
@@ -159,3 +258,13 @@ async def submit_feedback(
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error submitting feedback: {str(e)}")
+
+@router.post("/admin/retrieval-index/reload", dependencies=[Depends(require_admin)])
+async def reload_retrieval_index():
+    """Load the most recently built advisory retrieval index
+
+    Only this worker loads it immediately; the others notice the new files
+    within ``ADVISORY_INDEX_CHECK_SECONDS``.
+    """
+    advisory_index.load()
+    return {"documents": len(advisory_index)}
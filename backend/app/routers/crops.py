@@ -4,17 +4,49 @@ Crop Recommendation API endpoints
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 from app.database import get_db
 from app.ml_models.crop_recommendation import CropRecommendationModel
-from app.schemas.crop import CropRecommendationRequest, CropRecommendationResponse
+from app.schemas.crop import (
+    CropRecommendationRequest,
+    CropRecommendationResponse,
+    LocationRecommendationRequest,
+    LocationRecommendationResponse
+)
 from app.services.crop_service import CropService
+from app.services.advisory_retrieval_service import invalidate_advisory_context
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.location_recommendation_service import CONTINUOUS_FEATURES, LocationRecommendationService
 from app.core.config import settings
+from app.core.lazy import LazyObject
+from app.core.security import require_admin
+from app.core.response_cache import cached_response
 from typing import Optional
 
 router = APIRouter()
 
-# Initialize ML model
-crop_model = CropRecommendationModel(settings.CROP_RECOMMENDATION_MODEL_PATH)
+def load_crop_model() -> CropRecommendationModel:
+    model = CropRecommendationModel(
+        settings.CROP_RECOMMENDATION_MODEL_PATH,
+        compile_forest=settings.CROP_COMPILED_FOREST_ENABLED,
+        compiled_forest_dir=settings.CROP_COMPILED_FOREST_DIR
+    )
+    
+    if settings.CROP_LOOKUP_ENABLED:
+        model.enable_lookup_table(
+            {
+                "temperature": settings.CROP_LOOKUP_TEMPERATURE_STEP,
+                "humidity": settings.CROP_LOOKUP_HUMIDITY_STEP,
+                "ph": settings.CROP_LOOKUP_PH_STEP,
+                "rainfall": settings.CROP_LOOKUP_RAINFALL_STEP
+            },
+            table_path=settings.CROP_LOOKUP_TABLE_PATH,
+            precompute=settings.CROP_LOOKUP_PRECOMPUTE
+        )
+    return model
+
+# ML model, loaded on first use (or by main.preload_models)
+crop_model = LazyObject(load_crop_model)
 
 @router.post("/recommend", response_model=CropRecommendationResponse)
 async def recommend_crops(
@@ -57,7 +89,67 @@ async def recommend_crops(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating recommendations: {str(e)}")
 
+@router.post("/recommend/for-location", response_model=LocationRecommendationResponse)
+async def recommend_crops_for_location(
+    request: LocationRecommendationRequest,
+    db: Session = Depends(get_db)
+):
+    """Get crop recommendations with weather, climate and farm data filled in server-side"""
+    pipeline = LocationRecommendationService()
+    context = await pipeline.gather_context(request.user_id, request.location)
+    
+    if context["profile"] is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if context["location"] is None:
+        raise HTTPException(status_code=400, detail="No location given and none stored in the farm profile")
+    
+    overrides = request.model_dump(exclude={"user_id", "location"}, exclude_none=True)
+    input_data, sources = pipeline.assemble_features(overrides, context, crop_model.known_categories())
+    
+    missing = [name for name in CONTINUOUS_FEATURES if name not in input_data]
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Could not determine {', '.join(missing)} for {context['location']}; provide them in the request"
+        )
+    
+    recommendations = crop_model.recommend_crops(input_data)
+    if "error" in recommendations:
+        raise HTTPException(status_code=400, detail=recommendations["error"])
+    
+    crop_service = CropService(db)
+    recommendation_record = crop_service.create_recommendation({
+        "user_id": request.user_id,
+        "input_parameters": input_data,
+        "recommendations": recommendations["recommendations"]
+    })
+    
+    return {
+        "recommendation_id": recommendation_record.id,
+        "recommendations": recommendations["recommendations"],
+        "input_parameters": recommendations["input_parameters"],
+        "total_crops_analyzed": recommendations["total_crops_analyzed"],
+        "location": context["location"],
+        "feature_sources": sources,
+        "current_weather": context["weather"],
+        "climate": context["climate"]
+    }
+
+@router.get("/recommend/lookup-stats", dependencies=[Depends(require_admin)])
+async def get_lookup_table_stats(samples: int = 1000):
+    """Get hit rate and agreement with the exact forest for the lookup table"""
+    if crop_model.lookup_table is None:
+        raise HTTPException(status_code=404, detail="Lookup table is not enabled")
+    
+    # Up to 100k forest evaluations; kept off the event loop
+    agreement = await run_in_threadpool(crop_model.lookup_table_agreement, samples=min(samples, 100000))
+    return {
+        "table": crop_model.lookup_table.stats(),
+        "agreement": agreement
+    }
+
 @router.get("/crops")
+@cached_response("crops")
 async def get_crops_list(
     category: Optional[str] = None,
     season: Optional[str] = None,
@@ -73,6 +165,7 @@ async def get_crops_list(
     }
 
 @router.get("/crops/{crop_id}")
+@cached_response("crops")
 async def get_crop_details(
     crop_id: int,
     db: Session = Depends(get_db)
@@ -124,6 +217,8 @@ async def add_user_crop(
         "area_planted": area_planted,
         "notes": notes
     })
+    invalidate_dashboard(user_id, ["user_crops", "farm_statistics", "market_updates"])
+    invalidate_advisory_context(user_id)
     
     return user_crop
 
@@ -159,5 +254,7 @@ async def update_user_crop(
     
     if not updated_crop:
         raise HTTPException(status_code=404, detail="User crop not found")
+    invalidate_dashboard(updated_crop.user_id, ["user_crops", "farm_statistics"])
+    invalidate_advisory_context(updated_crop.user_id)
     
     return updated_crop
@@ -3,10 +3,14 @@ Forum API endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.forum import ForumPostCreate, ForumPostResponse, ForumCommentCreate
+from app.schemas.forum import ForumPostCreate, ForumPostResponse, ForumCommentCreate, ForumComment
 from app.services.forum_service import ForumService
+from app.core.pubsub import broker
+from app.core.response_cache import cached_response
+from app.core.responses import fast_json_response
 from typing import Optional
 
 router = APIRouter()
@@ -21,10 +25,17 @@ async def create_post(
     
     try:
         post = forum_service.create_post(post_data)
-        return post
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating post: {str(e)}")
+    
+    if post_data.category:
+        await broker.publish(f"forum_category:{post_data.category}", "forum_post", {
+            "post_id": post.id,
+            "user_id": post_data.user_id,
+            "title": post_data.title
+        })
+    return post
 
 @router.get("/posts")
 async def get_posts(
@@ -45,14 +56,14 @@ async def get_posts(
             limit=limit
         )
         
-        return {
+        return fast_json_response({
             "posts": posts,
             "total": len(posts),
             "filters": {
                 "category": category,
                 "tags": tags
             }
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching posts: {str(e)}")
@@ -92,10 +103,16 @@ async def add_comment(
     
     try:
         comment = forum_service.add_comment(post_id, comment_data)
-        return comment
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding comment: {str(e)}")
+    
+    await broker.publish(
+        f"forum_post:{post_id}",
+        "forum_comment",
+        jsonable_encoder(ForumComment.model_validate(comment, from_attributes=True))
+    )
+    return comment
 
 @router.get("/posts/{post_id}/comments")
 async def get_post_comments(
@@ -133,10 +150,16 @@ async def like_post(
     
     try:
         result = forum_service.toggle_like(post_id, user_id, "post")
-        return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error liking post: {str(e)}")
+    
+    await broker.publish(f"forum_post:{post_id}", "forum_like", {
+        "post_id": post_id,
+        "user_id": user_id,
+        "result": jsonable_encoder(result)
+    })
+    return result
 
 @router.post("/comments/{comment_id}/like")
 async def like_comment(
@@ -170,6 +193,7 @@ async def get_trending_topics(
         raise HTTPException(status_code=500, detail=f"Error fetching trending topics: {str(e)}")
 
 @router.get("/categories")
+@cached_response("forum_categories")
 async def get_categories(
     db: Session = Depends(get_db)
 ):
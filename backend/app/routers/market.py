@@ -8,8 +8,9 @@ from app.database import get_db
 from app.schemas.market import MarketPriceResponse, MarketNewsResponse
 from app.services.market_service import MarketService
 from app.core.config import settings
+from app.core.pubsub import broker
+from app.core.upstream import upstream_client
 from typing import Optional
-import httpx
 
 router = APIRouter()
 
@@ -38,6 +39,8 @@ async def get_market_prices(
                 # Save external data to database
                 for price_data in external_prices:
                     market_service.create_price_record(price_data)
+                    if price_data.get("crop_id") is not None:
+                        await broker.publish(f"crop:{price_data['crop_id']}", "market_price", price_data)
                 prices = market_service.get_market_prices(location=location, limit=limit)
         
         return {
@@ -159,9 +162,9 @@ async def get_market_analysis(
 async def fetch_external_prices(location: str):
     """Fetch market prices from external API"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream_client("market_data") as client:
             response = await client.get(
-                f"https://api.marketdata.com/prices",
+                f"{settings.MARKET_DATA_BASE_URL}/prices",
                 params={
                     "location": location,
                     "api_key": settings.MARKET_DATA_API_KEY
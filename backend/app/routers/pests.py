@@ -2,30 +2,98 @@
 Pest Detection API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.ml_models.pest_detection import PestDetectionModel
-from app.schemas.pest import PestDetectionResponse, PestDetectionCreate
+from app.database.connection import SessionLocal
+from app.ml_models.pest_detection import PestDetectionModel, severity_for_confidence
+from app.ml_models.vector_index import IVFIndex, pack_vector, unpack_vector
+from app.schemas.pest import PestDetectionResponse, PestDetectionCreate, RescoreRequest
+from app.services.advisory_retrieval_service import invalidate_advisory_context
+from app.services.dashboard_service import invalidate_dashboard
 from app.services.pest_service import PestService
+from app.services.rescoring_service import RescoreJob, RescoringService
+from app.services.similarity_service import SimilarityService
 from app.core.config import settings
+from app.core.lazy import LazyObject
+from app.core.security import require_admin
+from app.core.response_cache import cached_response
+import logging
 import os
 import uuid
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-# Initialize ML model
-pest_model = PestDetectionModel(settings.PEST_DETECTION_MODEL_PATH)
+# ML model, loaded on first use (or by main.preload_models)
+pest_model = LazyObject(lambda: PestDetectionModel(
+    settings.PEST_DETECTION_MODEL_PATH,
+    model_version=settings.PEST_DETECTION_MODEL_VERSION,
+    gate_model_path=settings.PEST_GATE_MODEL_PATH,
+    calibration_path=settings.PEST_CALIBRATION_PATH,
+    batch_sizes=settings.PEST_INFERENCE_BATCH_SIZES,
+    jit_compile=settings.PEST_INFERENCE_XLA,
+    intra_op_threads=settings.TF_INTRA_OP_THREADS,
+    inter_op_threads=settings.TF_INTER_OP_THREADS
+))
+
+# Nearest-neighbour index over detection embeddings
+similarity_index = IVFIndex(
+    settings.PEST_EMBEDDING_INDEX_DIR,
+    n_probe=settings.PEST_EMBEDDING_INDEX_N_PROBE,
+    max_buffer=settings.PEST_EMBEDDING_INDEX_MAX_BUFFER
+)
+
+# Prediction fields stored with a detection and replayed for duplicates
+STORED_PREDICTION_FIELDS = (
+    "primary_prediction", "all_predictions", "confidence_threshold",
+    "is_confident", "high_severity_threshold", "is_healthy", "stage"
+)
+
+# Re-scoring job shared by every worker through its checkpoint files
+rescore_job = RescoreJob(settings.RESCORE_CHECKPOINT_PATH)
+
+def predict_upload(file_path: str, mode: str, latency_budget_ms: Optional[float], similarity_service: SimilarityService):
+    """Decode and score a saved upload: image hash, duplicate detection (or None) and predictions"""
+    image = pest_model.load_image(file_path)
+    image_hash = pest_model.image_hash(image)
+    
+    # Re-uploads of an already scored photo reuse the stored result
+    duplicate = None
+    if settings.PEST_DEDUP_ENABLED and mode == "standard":
+        duplicate = similarity_service.find_duplicate(image_hash, pest_model.model_version)
+    
+    # Run ML prediction
+    if duplicate is not None:
+        prediction_result = dict(duplicate.predictions)
+    elif mode == "tiled":
+        prediction_result = pest_model.predict_tiled(
+            image,
+            overlap=settings.PEST_TILE_OVERLAP,
+            latency_budget_ms=latency_budget_ms or settings.PEST_TILE_LATENCY_BUDGET_MS,
+            max_tiles=settings.PEST_TILE_MAX_TILES
+        )
+    else:
+        prediction_result = pest_model.predict_image(image)
+    return image_hash, duplicate, prediction_result
 
 @router.post("/detect", response_model=PestDetectionResponse)
 async def detect_pest(
     file: UploadFile = File(...),
     location: Optional[str] = Form(None),
     crop_affected: Optional[str] = Form(None),
+    mode: str = Form("standard"),
+    latency_budget_ms: Optional[float] = Form(None),
     db: Session = Depends(get_db)
 ):
-    """Detect pest/disease from uploaded image"""
+    """Detect pest/disease from uploaded image
+    
+    ``mode="tiled"`` scores overlapping full-resolution tiles with flip/rotate
+    augmentation, for high-resolution photos where lesions are small.
+    """
     
     # Validate file
     if not file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
@@ -34,6 +102,9 @@ async def detect_pest(
             detail="Only JPEG and PNG images are allowed"
         )
     
+    if mode not in ("standard", "tiled"):
+        raise HTTPException(status_code=400, detail="mode must be 'standard' or 'tiled'")
+    
     # Save uploaded file
     file_extension = file.filename.split(".")[-1]
     filename = f"{uuid.uuid4()}.{file_extension}"
@@ -47,8 +118,17 @@ async def detect_pest(
         buffer.write(content)
     
     try:
-        # Run ML prediction
-        prediction_result = pest_model.predict(file_path)
+        similarity_service = SimilarityService(db, similarity_index)
+        # Decoding and inference take the whole latency budget; keep them off the event loop
+        image_hash, duplicate, prediction_result = await run_in_threadpool(
+            predict_upload, file_path, mode, latency_budget_ms, similarity_service
+        )
+        
+        embedding = prediction_result.pop("embedding", None)
+        if embedding is not None:
+            embedding_bytes = pack_vector(embedding)
+        else:
+            embedding_bytes = duplicate.embedding if duplicate is not None else None
         
         # Get treatment recommendations
         pest_class = prediction_result["primary_prediction"]["class"]
@@ -62,9 +142,28 @@ async def detect_pest(
             "confidence_score": prediction_result["primary_prediction"]["confidence"],
             "location": location,
             "crop_affected": crop_affected,
-            "severity": "High" if prediction_result["primary_prediction"]["confidence"] > 0.8 else "Medium"
+            "severity": severity_for_confidence(
+                prediction_result["primary_prediction"]["confidence"],
+                prediction_result.get("high_severity_threshold", 0.8)
+            ),
+            "model_version": pest_model.model_version,
+            "predictions": None if "error" in prediction_result else {
+                field: prediction_result[field]
+                for field in STORED_PREDICTION_FIELDS
+                if field in prediction_result
+            },
+            "image_hash": image_hash,
+            "embedding": embedding_bytes
         })
         
+        invalidate_advisory_context(detection.user_id)
+        invalidate_dashboard(detection.user_id, ["recent_detections", "farm_statistics"])
+        
+        if embedding is not None:
+            similarity_service.index_detection(detection.id, embedding)
+        elif embedding_bytes is not None:
+            similarity_service.index_detection(detection.id, unpack_vector(embedding_bytes))
+        
         return {
             "detection_id": detection.id,
             "image_path": file_path,
@@ -72,7 +171,9 @@ async def detect_pest(
             "all_predictions": prediction_result["all_predictions"],
             "treatment_recommendations": treatment_recommendations,
             "is_healthy": prediction_result["is_healthy"],
-            "confidence_threshold": prediction_result["confidence_threshold"]
+            "confidence_threshold": prediction_result["confidence_threshold"],
+            "top_patches": prediction_result.get("top_patches"),
+            "duplicate_of": duplicate.id if duplicate is not None else None
         }
         
     except Exception as e:
@@ -110,7 +211,37 @@ async def get_detection_details(
     
     return detection
 
+@router.get("/detections/{detection_id}/similar")
+async def get_similar_detections(
+    detection_id: int,
+    limit: int = 10,
+    db: Session = Depends(get_db)
+):
+    """Get past detections whose images look most like this one"""
+    similarity_index.reload_if_changed(settings.PEST_EMBEDDING_INDEX_CHECK_SECONDS)
+    similarity_service = SimilarityService(db, similarity_index)
+    similar = similarity_service.get_similar_detections(detection_id, limit=min(limit, 50))
+    
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Detection not found")
+    
+    return {
+        "detection_id": detection_id,
+        "similar_detections": similar,
+        "total": len(similar)
+    }
+
+@router.post("/admin/similarity-index/reload", dependencies=[Depends(require_admin)])
+async def reload_similarity_index():
+    """Map the most recently built similarity index files in the worker that answers
+
+    Other workers map them within ``PEST_EMBEDDING_INDEX_CHECK_SECONDS``.
+    """
+    similarity_index.load()
+    return {"vectors": len(similarity_index)}
+
 @router.get("/pests")
+@cached_response("pests")
 async def get_pests_list(
     category: Optional[str] = None,
     db: Session = Depends(get_db)
@@ -125,6 +256,7 @@ async def get_pests_list(
     }
 
 @router.get("/pests/{pest_id}")
+@cached_response("pests")
 async def get_pest_details(
     pest_id: int,
     db: Session = Depends(get_db)
@@ -137,3 +269,49 @@ async def get_pest_details(
         raise HTTPException(status_code=404, detail="Pest not found")
     
     return pest
+
+def run_rescore_job(request: RescoreRequest):
+    """Run the re-scoring job with its own session, then release the job lock"""
+    db = SessionLocal()
+    try:
+        service = RescoringService(
+            db,
+            pest_model.get(),
+            batch_size=request.batch_size or settings.RESCORE_BATCH_SIZE,
+            workers=request.workers or settings.RESCORE_WORKERS,
+            checkpoint_path=settings.RESCORE_CHECKPOINT_PATH
+        )
+        service.run(limit=request.limit, resume=not request.restart, stop_event=rescore_job)
+    except Exception as e:
+        logger.error(f"Re-scoring failed: {e}")
+        rescore_job.record_error(str(e))
+    finally:
+        rescore_job.release()
+        db.close()
+
+@router.post("/admin/rescore", dependencies=[Depends(require_admin)])
+async def start_rescore(
+    request: RescoreRequest,
+    background_tasks: BackgroundTasks
+):
+    """Start re-scoring stored detections with the current model"""
+    if not rescore_job.acquire():
+        raise HTTPException(status_code=409, detail="Re-scoring is already running")
+    
+    background_tasks.add_task(run_rescore_job, request)
+    
+    return {
+        "message": "Re-scoring started",
+        "model_version": pest_model.model_version
+    }
+
+@router.get("/admin/rescore", dependencies=[Depends(require_admin)])
+async def get_rescore_status():
+    """Get progress and throughput of the re-scoring job, whichever worker runs it"""
+    return rescore_job.status()
+
+@router.delete("/admin/rescore", dependencies=[Depends(require_admin)])
+async def stop_rescore():
+    """Stop the running re-scoring job after its current batch"""
+    rescore_job.request_stop()
+    return {"message": "Stop requested", "running": rescore_job.running()}
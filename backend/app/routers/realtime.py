@@ -0,0 +1,132 @@
+"""
+Real-time push API endpoints (WebSocket and Server-Sent Events)
+
+``user:{id}`` topics carry a user's alerts and notifications, so they need an
+access token for that user: an ``Authorization: Bearer`` header or, since
+browsers cannot set headers on WebSocket or EventSource connections, an
+``access_token`` query parameter.
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.pubsub import broker, normalize_topic
+from app.core.responses import SSE_HEADERS, sse_event
+from app.core.security import bearer_user, token_user
+
+router = APIRouter()
+
+def parse_topics(topics: List[str]) -> List[str]:
+    return [topic for topic in topics if topic.strip()]
+
+def connection_user(authorization: Optional[str], access_token: Optional[str]) -> Optional[str]:
+    """Verified user id of a push connection, or ``None`` when anonymous"""
+    return bearer_user(authorization) or (token_user(access_token) if access_token else None)
+
+def permitted_topics(topics: List[str], user_id: Optional[str]) -> Tuple[List[str], List[str]]:
+    """Split topics into those the connection may subscribe to and other users' topics"""
+    allowed, forbidden = [], []
+    for topic in topics:
+        kind, _, key = (normalize_topic(topic) or "").partition(":")
+        if kind == "user" and key != user_id:
+            forbidden.append(topic)
+        else:
+            allowed.append(topic)
+    return allowed, forbidden
+
+def client_event(event: dict) -> dict:
+    return {"topic": event["topic"], "type": event["type"], "data": event["data"]}
+
+@router.websocket("/ws")
+async def push_websocket(
+    websocket: WebSocket,
+    topics: List[str] = Query([]),
+    access_token: Optional[str] = Query(None)
+):
+    """Push events for the subscribed topics over a WebSocket
+
+    Topics can be given in the query string (``?topics=user:42&topics=crop:7``;
+    keys may contain commas, so topics are never comma-separated) and
+    changed later by sending ``{"action": "subscribe" | "unsubscribe",
+    "topics": [...]}``. Other users' ``user:`` topics are refused with an
+    ``error`` message.
+    """
+    await websocket.accept()
+    user_id = connection_user(websocket.headers.get("authorization"), access_token)
+    subscription = broker.connect()
+
+    async def subscribe(requested: List[str]):
+        allowed, forbidden = permitted_topics(requested, user_id)
+        if forbidden:
+            await websocket.send_json({"type": "error", "detail": "Not authorized for topics", "topics": forbidden})
+        added = subscription.subscribe(allowed)
+        await websocket.send_json({"type": "subscribed", "topics": sorted(added)})
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action")
+            requested = message.get("topics") or []
+            if action == "subscribe":
+                await subscribe(requested)
+            elif action == "unsubscribe":
+                subscription.unsubscribe(requested)
+                await websocket.send_json({"type": "unsubscribed", "topics": requested})
+            else:
+                await websocket.send_json({"type": "error", "detail": "Unknown action"})
+
+    async def send():
+        while True:
+            event = await subscription.get(settings.PUSH_HEARTBEAT_SECONDS)
+            await websocket.send_json(client_event(event) if event else {"type": "heartbeat"})
+
+    try:
+        await subscribe(parse_topics(topics))
+        tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+@router.get("/events")
+async def push_events(
+    request: Request,
+    topics: List[str] = Query(..., description="Topics, one per repeated parameter"),
+    access_token: Optional[str] = Query(None)
+):
+    """Push events for the given topics as a Server-Sent Events stream"""
+    requested = parse_topics(topics)
+    invalid = [topic for topic in requested if normalize_topic(topic) is None]
+    if invalid or not requested:
+        raise HTTPException(status_code=400, detail=f"Invalid topics: {', '.join(invalid) or 'none given'}")
+    _, forbidden = permitted_topics(requested, connection_user(request.headers.get("authorization"), access_token))
+    if forbidden:
+        raise HTTPException(status_code=403, detail=f"Not authorized for topics: {', '.join(forbidden)}")
+
+    subscription = broker.connect()
+    added = subscription.subscribe(requested)
+
+    async def stream():
+        try:
+            yield sse_event("subscribed", sorted(added))
+            while not await request.is_disconnected():
+                event = await subscription.get(settings.PUSH_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield sse_event(event["type"], client_event(event))
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -2,10 +2,14 @@
 User management API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from sqlalchemy.orm import Session
+from app.core.response_cache import etag_matches
+from app.core.responses import AppJSONResponse
 from app.database import get_db
 from app.schemas.user import UserProfile, UserUpdate
+from app.services.advisory_retrieval_service import invalidate_advisory_context
+from app.services.dashboard_service import SECTION_LOADERS, DashboardService, compute_etag, invalidate_dashboard
 from app.services.user_service import UserService
 from typing import Optional
 
@@ -47,6 +51,9 @@ async def update_user_profile(
         if not updated_user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        invalidate_dashboard(user_id, ["user_profile"])
+        invalidate_advisory_context(user_id)
+        
         return updated_user
         
     except HTTPException:
@@ -57,17 +64,32 @@ async def update_user_profile(
 @router.get("/dashboard/{user_id}")
 async def get_user_dashboard(
     user_id: int,
-    db: Session = Depends(get_db)
+    sections: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
 ):
-    """Get user dashboard data"""
-    user_service = UserService(db)
+    """Get user dashboard data
     
-    try:
-        dashboard_data = user_service.get_dashboard_data(user_id)
-        return dashboard_data
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching dashboard data: {str(e)}")
+    Sections are fetched concurrently and cached individually; pass a
+    comma-separated ``sections`` list to fetch only some of them. Sections
+    that fail are listed in ``failed_sections`` instead of failing the request.
+    """
+    requested = None
+    if sections:
+        requested = [name.strip() for name in sections.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in SECTION_LOADERS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {', '.join(unknown)}")
+    
+    dashboard = await DashboardService().get_dashboard(user_id, requested)
+    if "user_profile" in dashboard and dashboard["user_profile"] is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    etag = compute_etag(dashboard)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    return AppJSONResponse(content=dashboard, headers=headers)
 
 @router.get("/farm-stats/{user_id}")
 async def get_farm_statistics(
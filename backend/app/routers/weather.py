@@ -2,13 +2,22 @@
 Weather API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.weather import WeatherDataResponse, WeatherAlertResponse
+from app.models.weather import WeatherAlertRule
+from app.schemas.weather import WeatherDataResponse, WeatherAlertResponse, WeatherAlertRuleCreate
+from app.services.advisory_retrieval_service import invalidate_advisory_context
+from app.services.alert_engine import COMPARATORS, METRICS
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.forecast_service import ForecastSummary, get_forecast_summary
 from app.services.weather_service import WeatherService
 from app.core.config import settings
+from app.core.pubsub import broker
+from app.core.upstream import upstream_client
+from app.core.responses import fast_json_response
 from typing import Optional
+import asyncio
 import httpx
 
 router = APIRouter()
@@ -23,9 +32,9 @@ async def get_current_weather(
     
     try:
         # Get weather data from external API
-        async with httpx.AsyncClient() as client:
+        async with upstream_client("openweather") as client:
             response = await client.get(
-                f"http://api.openweathermap.org/data/2.5/weather",
+                f"{settings.OPENWEATHER_BASE_URL}/weather",
                 params={
                     "q": location,
                     "appid": settings.OPENWEATHER_API_KEY,
@@ -61,41 +70,30 @@ async def get_current_weather(
 @router.get("/forecast/{location}")
 async def get_weather_forecast(
     location: str,
-    days: int = 7,
-    db: Session = Depends(get_db)
+    days: int = Query(5, ge=1),
+    resolution: str = Query("3h", pattern="^(3h|daily|summary)$")
 ):
-    """Get weather forecast for a location"""
-    weather_service = WeatherService(db)
+    """Get weather forecast for a location
     
+    ``resolution`` selects 3-hourly points, daily aggregates (min/max/mean,
+    rainfall, growing degree days, spray hours) or a single summary. The
+    upstream forecast covers 5 days; longer requests get those 5 days.
+    """
+    days = min(days, 5)
     try:
-        # Get forecast data from external API
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://api.openweathermap.org/data/2.5/forecast",
-                params={
-                    "q": location,
-                    "appid": settings.OPENWEATHER_API_KEY,
-                    "units": "metric",
-                    "cnt": days * 8  # 8 data points per day (3-hour intervals)
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Forecast data not available")
-            
-            forecast_data = response.json()
-        
-        # Process forecast data
-        processed_forecast = weather_service.process_forecast_data(forecast_data, location)
-        
-        return {
-            "location": location,
-            "forecast_days": days,
-            "forecast": processed_forecast
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching forecast: {str(e)}")
+        summary = await get_forecast_summary(location, days)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching forecast: {str(e)}")
+    
+    if summary is None:
+        raise HTTPException(status_code=400, detail="Forecast data not available")
+    
+    return fast_json_response({
+        "location": location,
+        "forecast_days": days,
+        "resolution": resolution,
+        "forecast": summary.render(resolution)
+    })
 
 @router.get("/alerts/{user_id}")
 async def get_weather_alerts(
@@ -130,9 +128,57 @@ async def create_weather_alert(
         "severity": severity,
         "message": message
     })
+    invalidate_dashboard(user_id, ["weather_alerts"])
+    invalidate_advisory_context(user_id)
+    event = {
+        "id": alert.id,
+        "location": location,
+        "alert_type": alert_type,
+        "severity": severity,
+        "message": message
+    }
+    await broker.publish(f"user:{user_id}", "weather_alert", event)
+    await broker.publish(f"location:{location}", "weather_alert", event)
     
     return alert
 
+@router.post("/alert-rules")
+async def create_alert_rule(
+    rule: WeatherAlertRuleCreate,
+    db: Session = Depends(get_db)
+):
+    """Create a forecast threshold rule evaluated by the alert engine
+    
+    Users without any rules get the engine's default heavy rain, flood,
+    heatwave, frost and storm rules.
+    """
+    if rule.metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric; expected one of {', '.join(METRICS)}")
+    if rule.comparator not in COMPARATORS:
+        raise HTTPException(status_code=400, detail="Comparator must be 'above' or 'below'")
+    
+    db_rule = WeatherAlertRule(**rule.model_dump())
+    db.add(db_rule)
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+@router.get("/alert-rules/{user_id}")
+async def get_alert_rules(
+    user_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a user's active alert rules"""
+    rules = (
+        db.query(WeatherAlertRule)
+        .filter(WeatherAlertRule.user_id == user_id, WeatherAlertRule.is_active == True)
+        .all()
+    )
+    return {
+        "rules": rules,
+        "total": len(rules)
+    }
+
 @router.get("/historical/{location}")
 async def get_historical_weather(
     location: str,
@@ -157,8 +203,14 @@ async def get_farming_conditions(
     """Get farming-specific weather conditions and recommendations"""
     weather_service = WeatherService(db)
     
-    # Get current weather
-    current_weather = await get_current_weather(location, db)
+    # Get current weather and the (usually cached) forecast summary together
+    current_weather, forecast = await asyncio.gather(
+        get_current_weather(location, db),
+        get_forecast_summary(location),
+        return_exceptions=True
+    )
+    if isinstance(current_weather, Exception):
+        raise current_weather
     
     # Analyze farming conditions
     farming_analysis = weather_service.analyze_farming_conditions(current_weather)
@@ -167,5 +219,6 @@ async def get_farming_conditions(
         "location": location,
         "current_weather": current_weather,
         "farming_analysis": farming_analysis,
+        "forecast_outlook": forecast.summary() if isinstance(forecast, ForecastSummary) else None,
         "recommendations": weather_service.get_farming_recommendations(farming_analysis)
     }
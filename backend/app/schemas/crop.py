@@ -16,6 +16,19 @@ class CropRecommendationRequest(BaseModel):
     region: str
     water_requirement: str
 
+class LocationRecommendationRequest(BaseModel):
+    """Recommendation inputs resolved server-side; any field given here wins"""
+    user_id: int
+    location: Optional[str] = None
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    ph: Optional[float] = None
+    rainfall: Optional[float] = None
+    soil_type: Optional[str] = None
+    season: Optional[str] = None
+    region: Optional[str] = None
+    water_requirement: Optional[str] = None
+
 class CropRecommendation(BaseModel):
     crop_name: str
     confidence: float
@@ -31,6 +44,12 @@ class CropRecommendationResponse(BaseModel):
     input_parameters: Dict[str, Any]
     total_crops_analyzed: int
 
+class LocationRecommendationResponse(CropRecommendationResponse):
+    location: str
+    feature_sources: Dict[str, str]
+    current_weather: Optional[Dict[str, Any]] = None
+    climate: Optional[Dict[str, Any]] = None
+
 class CropInfo(BaseModel):
     id: int
     name: str
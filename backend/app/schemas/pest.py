@@ -20,6 +20,14 @@ class PestDetectionResponse(BaseModel):
     treatment_recommendations: Dict[str, List[str]]
     is_healthy: bool
     confidence_threshold: float
+    top_patches: Optional[List[Dict[str, Any]]] = None
+    duplicate_of: Optional[int] = None
+
+class RescoreRequest(BaseModel):
+    batch_size: Optional[int] = None
+    workers: Optional[int] = None
+    limit: Optional[int] = None
+    restart: bool = False
 
 class PestInfo(BaseModel):
     id: int
@@ -2,10 +2,14 @@
 User schemas
 """
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, EmailStr, ValidationInfo, field_validator
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+# Farm profile values the crop recommendation model is trained on
+SOIL_TYPES = ("clay", "loamy", "sandy", "silt", "black")
+REGIONS = ("north", "south", "east", "west", "central")
+
 class UserProfile(BaseModel):
     id: int
     email: EmailStr
@@ -18,6 +22,9 @@ class UserProfile(BaseModel):
     experience_years: int
     primary_crops: Optional[str]
     farming_method: Optional[str]
+    soil_type: Optional[str] = None
+    soil_ph: Optional[float] = None
+    region: Optional[str] = None
     is_verified: bool
     created_at: datetime
 
@@ -30,6 +37,21 @@ class UserUpdate(BaseModel):
     experience_years: Optional[int] = None
     primary_crops: Optional[str] = None
     farming_method: Optional[str] = None
+    soil_type: Optional[str] = None
+    soil_ph: Optional[float] = None
+    region: Optional[str] = None
+
+    @field_validator("soil_type", "region")
+    @classmethod
+    def normalize_profile_category(cls, value: Optional[str], info: ValidationInfo) -> Optional[str]:
+        """Store recommendation categories lower-cased, as the model encodes them"""
+        if value is None:
+            return None
+        value = value.strip().lower()
+        allowed = SOIL_TYPES if info.field_name == "soil_type" else REGIONS
+        if value not in allowed:
+            raise ValueError(f"must be one of {', '.join(allowed)}")
+        return value
 
 class DashboardData(BaseModel):
     user_profile: UserProfile
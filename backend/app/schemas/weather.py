@@ -37,3 +37,11 @@ class WeatherAlertResponse(BaseModel):
     end_date: Optional[datetime]
     is_active: bool
     created_at: datetime
+
+class WeatherAlertRuleCreate(BaseModel):
+    user_id: int
+    metric: str
+    comparator: str  # above, below
+    threshold: float
+    alert_type: str
+    severity: str = "Medium"
@@ -0,0 +1,110 @@
+"""
+Retrieval for the advisory engine
+
+Every chat turn needs the knowledge-base and forum passages relevant to the
+query plus a snapshot of the asking user's farm: profile, crops, recent pest
+detections, active weather alerts and the latest local weather. Passages come
+from a prebuilt BM25 index; the user snapshot is cached between turns of a
+conversation and dropped when the profile, crops or detections change.
+
+Each worker caches snapshots in process, tagged with the user's context
+version. A change bumps that version in Redis, so every worker reloads the
+snapshot on the user's next turn, not only the one that handled the change.
+If Redis is unreachable versions are not checked (only the changing worker
+drops its snapshot) and Redis is retried after a back-off.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.core.cache import SharedVersions, TTLCache
+from app.core.config import settings
+from app.core.tracing import span
+from app.ml_models.text_index import BM25Index
+from app.models.weather import WeatherData
+from app.services.dashboard_service import (
+    load_recent_detections,
+    load_user_crops,
+    load_user_profile,
+    load_weather_alerts
+)
+
+logger = logging.getLogger(__name__)
+
+context_cache = TTLCache(name="advisory_context")
+context_versions = SharedVersions(settings.REDIS_URL, settings.ADVISORY_CONTEXT_TTL_SECONDS, "advisory:context")
+
+def invalidate_advisory_context(user_id: int):
+    """Drop a user's cached snapshot in every worker after a profile, crop or detection change"""
+    context_cache.delete(user_id)
+    context_versions.bump(user_id)
+
+def load_latest_weather(db: Session, location: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not location:
+        return None
+    row = (
+        db.query(WeatherData)
+        .filter(WeatherData.location == location)
+        .order_by(WeatherData.recorded_at.desc())
+        .first()
+    )
+    if row is None:
+        return None
+    return {
+        "temperature": row.temperature,
+        "humidity": row.humidity,
+        "rainfall": row.rainfall,
+        "wind_speed": row.wind_speed,
+        "weather_condition": row.weather_condition,
+        "recorded_at": row.recorded_at
+    }
+
+class AdvisoryRetrievalService:
+    def __init__(
+        self,
+        db: Session,
+        index: BM25Index,
+        cache: TTLCache = context_cache,
+        versions: SharedVersions = context_versions
+    ):
+        self.db = db
+        self.index = index
+        self.cache = cache
+        self.versions = versions
+
+    def get_user_context(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Snapshot of the user's farm, cached for ``ADVISORY_CONTEXT_TTL_SECONDS``"""
+        # Read before loading: a change made while loading bumps past the stored version
+        version = self.versions.get(user_id)
+        found, cached = self.cache.get(user_id)
+        if found and (version is None or cached[0] == version):
+            return cached[1]
+
+        profile = load_user_profile(self.db, user_id)
+        if profile is None:
+            return None
+
+        snapshot = jsonable_encoder({
+            "profile": profile,
+            "crops": load_user_crops(self.db, user_id),
+            "recent_detections": load_recent_detections(self.db, user_id),
+            "weather_alerts": load_weather_alerts(self.db, user_id),
+            "weather": load_latest_weather(self.db, profile["location"])
+        })
+        self.cache.set(user_id, (version, snapshot), settings.ADVISORY_CONTEXT_TTL_SECONDS)
+        return snapshot
+
+    def search_knowledge(self, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Knowledge-base articles and forum threads ranked by BM25 relevance"""
+        hits = self.index.search(query, k=k or settings.ADVISORY_RETRIEVAL_TOP_K)
+        return [{**document, "score": score} for document, score in hits]
+
+    def retrieve(self, query: str, user_id: int) -> Dict[str, Any]:
+        with span("advisory.user_context", **{"user.id": user_id}):
+            user_context = self.get_user_context(user_id)
+        with span("advisory.search_knowledge"):
+            passages = self.search_knowledge(query)
+        return {"user_context": user_context, "passages": passages}
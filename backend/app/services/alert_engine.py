@@ -0,0 +1,381 @@
+"""
+Batched evaluation of weather alert rules against location forecasts
+
+Users are grouped by normalised farm location and each distinct location's
+forecast is fetched once. The forecasts are reduced to a (locations x metrics)
+matrix over the alert horizon, and every rule, whether a user's own
+``WeatherAlertRule`` or the defaults for users without any, is evaluated as
+array comparisons against that matrix in chunks. Triggered alerts are
+bulk-inserted, skipping users who already hold an active alert of the same
+type, and handed to a ``NotificationSender``. Users with new alerts get their
+cached dashboard alerts and advisory context dropped.
+
+The in-process scheduler claims each run through a Redis key held for just
+under the interval, so with several workers or instances the engine normally
+runs once per interval. Runs can still overlap: a run longer than the
+interval overlaps the next one, and if Redis is unreachable every worker runs.
+The duplicate check is not atomic, so overlapping runs may store an alert twice.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import redis.asyncio as aioredis
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.database.connection import SessionLocal
+from app.models.user import User
+from app.models.weather import WeatherAlert, WeatherAlertRule
+from app.services.advisory_retrieval_service import invalidate_advisory_context
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.forecast_service import HOURS_PER_STEP, ForecastSummary, get_forecast_summary
+from app.services.notification_service import NotificationSender, get_notification_sender
+
+logger = logging.getLogger(__name__)
+
+METRICS = [
+    "temperature_max",
+    "temperature_min",
+    "rainfall_total",
+    "rainfall_3h_max",
+    "wind_speed_max",
+    "humidity_max",
+    "rain_probability_max"
+]
+METRIC_INDEX = {name: index for index, name in enumerate(METRICS)}
+METRIC_UNITS = {
+    "temperature_max": "°C",
+    "temperature_min": "°C",
+    "rainfall_total": " mm",
+    "rainfall_3h_max": " mm",
+    "wind_speed_max": " m/s",
+    "humidity_max": "%",
+    "rain_probability_max": ""
+}
+COMPARATORS = ("above", "below")
+
+# Held by the worker making the current scheduled run
+SCHEDULE_LOCK_KEY = "alert_engine:schedule"
+
+# (metric, comparator, threshold, alert_type, severity) for users without rules of their own
+DEFAULT_RULES = [
+    ("rainfall_total", "above", 50.0, "Heavy Rain", "High"),
+    ("rainfall_3h_max", "above", 20.0, "Flood", "Critical"),
+    ("temperature_max", "above", 40.0, "Heatwave", "High"),
+    ("temperature_min", "below", 4.0, "Frost", "High"),
+    ("wind_speed_max", "above", 15.0, "Storm", "High")
+]
+
+def horizon_metrics(summary: ForecastSummary, horizon_hours: int) -> np.ndarray:
+    """Reduce the first ``horizon_hours`` of a forecast to one value per metric"""
+    steps = slice(0, max(1, horizon_hours // HOURS_PER_STEP))
+    return np.array([
+        summary.temp_max[steps].max(),
+        summary.temp_min[steps].min(),
+        summary.rainfall[steps].sum(),
+        summary.rainfall[steps].max(),
+        summary.wind_speed[steps].max(),
+        summary.humidity[steps].max(),
+        summary.rain_probability[steps].max()
+    ])
+
+class RuleChunk:
+    """Column arrays for a batch of (user, rule) pairs"""
+
+    def __init__(
+        self,
+        user_ids: np.ndarray,
+        location_index: np.ndarray,
+        metric_index: np.ndarray,
+        above: np.ndarray,
+        thresholds: np.ndarray,
+        alert_types: np.ndarray,
+        severities: np.ndarray
+    ):
+        self.user_ids = user_ids
+        self.location_index = location_index
+        self.metric_index = metric_index
+        self.above = above
+        self.thresholds = thresholds
+        self.alert_types = alert_types
+        self.severities = severities
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def evaluate(self, matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (triggered mask, metric values); missing forecasts never trigger"""
+        values = matrix[self.location_index, self.metric_index]
+        with np.errstate(invalid="ignore"):
+            triggered = np.where(self.above, values > self.thresholds, values < self.thresholds)
+        return triggered & ~np.isnan(values), values
+
+class WeatherAlertEngine:
+    def __init__(
+        self,
+        db: Session,
+        sender: NotificationSender,
+        horizon_hours: int = 48,
+        chunk_size: int = 10000,
+        fetch_concurrency: int = 10,
+        forecast_days: int = 5
+    ):
+        self.db = db
+        self.sender = sender
+        self.horizon_hours = horizon_hours
+        self.chunk_size = chunk_size
+        self.fetch_concurrency = fetch_concurrency
+        self.forecast_days = forecast_days
+        self.location_key = func.lower(func.trim(User.location))
+
+    def location_groups(self) -> Dict[str, str]:
+        """Map each normalised location to a spelling to query the forecast with"""
+        rows = (
+            self.db.query(self.location_key, func.min(User.location))
+            .filter(User.location.isnot(None), User.location != "", User.is_active == True)
+            .group_by(self.location_key)
+            .all()
+        )
+        return {key: location for key, location in rows}
+
+    async def fetch_metrics(self, groups: Dict[str, str]) -> Tuple[List[str], np.ndarray]:
+        """Fetch every location's forecast once, at most ``fetch_concurrency`` at a time"""
+        keys = list(groups)
+        matrix = np.full((len(keys), len(METRICS)), np.nan)
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def fetch(row: int, key: str):
+            async with semaphore:
+                try:
+                    summary = await get_forecast_summary(groups[key], self.forecast_days)
+                    if summary is not None and len(summary):
+                        matrix[row] = horizon_metrics(summary, self.horizon_hours)
+                except Exception as e:
+                    # Includes malformed 200 bodies; the location's row stays NaN and never triggers
+                    logger.warning(f"Forecast fetch failed for {groups[key]}: {e}")
+
+        await asyncio.gather(*(fetch(row, key) for row, key in enumerate(keys)))
+        return keys, matrix
+
+    def iter_rule_chunks(self, location_rows: Dict[str, int]) -> Iterator[RuleChunk]:
+        """Yield users' own active rules, then the defaults for users without any"""
+        last_id = 0
+        while True:
+            rows = (
+                self.db.query(
+                    WeatherAlertRule.id,
+                    WeatherAlertRule.user_id,
+                    self.location_key,
+                    WeatherAlertRule.metric,
+                    WeatherAlertRule.comparator,
+                    WeatherAlertRule.threshold,
+                    WeatherAlertRule.alert_type,
+                    WeatherAlertRule.severity
+                )
+                .join(User, User.id == WeatherAlertRule.user_id)
+                .filter(
+                    WeatherAlertRule.id > last_id,
+                    WeatherAlertRule.is_active == True,
+                    User.is_active == True,
+                    User.location.isnot(None)
+                )
+                .order_by(WeatherAlertRule.id)
+                .limit(self.chunk_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            rows = [row for row in rows if row[2] in location_rows and row[3] in METRIC_INDEX]
+            if rows:
+                _, user_ids, locations, metrics, comparators, thresholds, alert_types, severities = zip(*rows)
+                yield RuleChunk(
+                    np.array(user_ids, dtype=np.int64),
+                    np.array([location_rows[location] for location in locations], dtype=np.int64),
+                    np.array([METRIC_INDEX[metric] for metric in metrics], dtype=np.int64),
+                    np.array(comparators) == "above",
+                    np.array(thresholds, dtype=np.float64),
+                    np.array(alert_types, dtype=object),
+                    np.array(severities, dtype=object)
+                )
+
+        default_metrics = np.array([METRIC_INDEX[rule[0]] for rule in DEFAULT_RULES], dtype=np.int64)
+        default_above = np.array([rule[1] == "above" for rule in DEFAULT_RULES])
+        default_thresholds = np.array([rule[2] for rule in DEFAULT_RULES], dtype=np.float64)
+        default_types = np.array([rule[3] for rule in DEFAULT_RULES], dtype=object)
+        default_severities = np.array([rule[4] for rule in DEFAULT_RULES], dtype=object)
+        has_rules = exists().where(WeatherAlertRule.user_id == User.id, WeatherAlertRule.is_active == True)
+        users_per_chunk = max(1, self.chunk_size // len(DEFAULT_RULES))
+
+        last_id = 0
+        while True:
+            rows = (
+                self.db.query(User.id, self.location_key)
+                .filter(
+                    User.id > last_id,
+                    User.is_active == True,
+                    User.location.isnot(None),
+                    ~has_rules
+                )
+                .order_by(User.id)
+                .limit(users_per_chunk)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            rows = [row for row in rows if row[1] in location_rows]
+            if not rows:
+                continue
+            user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            locations = np.array([location_rows[row[1]] for row in rows], dtype=np.int64)
+            n_users, n_rules = len(user_ids), len(DEFAULT_RULES)
+            yield RuleChunk(
+                np.repeat(user_ids, n_rules),
+                np.repeat(locations, n_rules),
+                np.tile(default_metrics, n_users),
+                np.tile(default_above, n_users),
+                np.tile(default_thresholds, n_users),
+                np.tile(default_types, n_users),
+                np.tile(default_severities, n_users)
+            )
+
+    def store_alerts(
+        self,
+        chunk: RuleChunk,
+        triggered: np.ndarray,
+        values: np.ndarray,
+        locations: Sequence[str]
+    ) -> Tuple[int, int, int]:
+        """Bulk-insert new alerts for triggered rules; returns (created, skipped, notified)"""
+        hits = np.flatnonzero(triggered)
+        if len(hits) == 0:
+            return 0, 0, 0
+
+        now = datetime.utcnow()
+        active = {
+            (user_id, alert_type)
+            for user_id, alert_type in self.db.query(WeatherAlert.user_id, WeatherAlert.alert_type).filter(
+                WeatherAlert.user_id.in_(np.unique(chunk.user_ids[hits]).tolist()),
+                WeatherAlert.is_active == True,
+                WeatherAlert.end_date >= now
+            )
+        }
+
+        end_date = now + timedelta(hours=self.horizon_hours)
+        rows, skipped = [], 0
+        for i in hits:
+            user_id, alert_type = int(chunk.user_ids[i]), chunk.alert_types[i]
+            if (user_id, alert_type) in active:
+                skipped += 1
+                continue
+            active.add((user_id, alert_type))
+
+            metric = METRICS[chunk.metric_index[i]]
+            unit = METRIC_UNITS[metric]
+            direction = "above" if chunk.above[i] else "below"
+            rows.append({
+                "user_id": user_id,
+                "location": locations[chunk.location_index[i]],
+                "alert_type": alert_type,
+                "severity": chunk.severities[i],
+                "message": (
+                    f"{alert_type}: forecast {metric.replace('_', ' ')} of {values[i]:.1f}{unit} is "
+                    f"{direction} {chunk.thresholds[i]:g}{unit} in the next {self.horizon_hours} hours"
+                ),
+                "start_date": now,
+                "end_date": end_date,
+                "is_active": True
+            })
+
+        if rows:
+            self.db.bulk_insert_mappings(WeatherAlert, rows)
+            self.db.commit()
+            for user_id in {row["user_id"] for row in rows}:
+                invalidate_dashboard(user_id, ["weather_alerts"])
+                invalidate_advisory_context(user_id)
+
+        notified = self.sender.send_batch([
+            {key: row[key] for key in ("user_id", "alert_type", "severity", "message")}
+            for row in rows
+        ]) if rows else 0
+        return len(rows), skipped, notified
+
+    def evaluate_and_store(self, keys: List[str], matrix: np.ndarray, groups: Dict[str, str]) -> Dict:
+        location_rows = {key: row for row, key in enumerate(keys)}
+        locations = [groups[key] for key in keys]
+        stats = {"rules_evaluated": 0, "alerts_created": 0, "duplicates_skipped": 0, "notifications_sent": 0}
+
+        for chunk in self.iter_rule_chunks(location_rows):
+            triggered, values = chunk.evaluate(matrix)
+            created, skipped, notified = self.store_alerts(chunk, triggered, values, locations)
+            stats["rules_evaluated"] += len(chunk)
+            stats["alerts_created"] += created
+            stats["duplicates_skipped"] += skipped
+            stats["notifications_sent"] += notified
+        return stats
+
+    async def run(self) -> Dict:
+        """Evaluate every rule once; database work runs off the event loop"""
+        started = time.perf_counter()
+        groups = await run_in_threadpool(self.location_groups)
+        keys, matrix = await self.fetch_metrics(groups)
+        fetch_seconds = time.perf_counter() - started
+
+        stats = await run_in_threadpool(self.evaluate_and_store, keys, matrix, groups)
+        stats.update({
+            "locations": len(keys),
+            "forecasts_failed": int(np.isnan(matrix[:, 0]).sum()) if len(keys) else 0,
+            "fetch_seconds": fetch_seconds,
+            "seconds": time.perf_counter() - started
+        })
+        return stats
+
+async def run_alert_engine(sender: Optional[NotificationSender] = None) -> Dict:
+    db = SessionLocal()
+    try:
+        return await WeatherAlertEngine(
+            db,
+            sender or get_notification_sender(settings.ALERT_NOTIFICATION_SENDER),
+            horizon_hours=settings.ALERT_HORIZON_HOURS,
+            chunk_size=settings.ALERT_CHUNK_SIZE,
+            fetch_concurrency=settings.ALERT_FETCH_CONCURRENCY
+        ).run()
+    finally:
+        db.close()
+
+async def claim_scheduled_run(interval_minutes: float) -> bool:
+    """Whether this process makes the current run: the first to claim it holds it for the interval"""
+    client = aioredis.from_url(settings.REDIS_URL, socket_timeout=1.0, socket_connect_timeout=1.0)
+    try:
+        hold_ms = max(1000, int(interval_minutes * 60_000) - 1000)
+        return bool(await client.set(SCHEDULE_LOCK_KEY, os.getpid(), nx=True, px=hold_ms))
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Alert engine schedule lock unavailable, running in this process: {e}")
+        return True
+    finally:
+        await client.close()
+
+async def run_alert_engine_periodically(interval_minutes: float):
+    """Background loop run by every worker; only the one that claims a run evaluates the rules"""
+    sender = get_notification_sender(settings.ALERT_NOTIFICATION_SENDER)
+    while True:
+        try:
+            if await claim_scheduled_run(interval_minutes):
+                stats = await run_alert_engine(sender)
+                logger.info(f"Weather alert run: {stats}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Weather alert run failed: {e}")
+        await asyncio.sleep(interval_minutes * 60)
@@ -0,0 +1,328 @@
+"""
+Composite dashboard assembled from independently cached sections
+
+Sections missing from the cache are loaded concurrently in the thread pool,
+each on its own database session, with at most
+``DASHBOARD_MAX_CONCURRENT_SECTIONS`` in flight per request so a dashboard
+never holds more pooled connections than that. Each section has its own
+timeout once it starts, and the whole request has a deadline that also
+covers waiting for a slot, so hung sections holding every slot cannot stall
+the rest. A section that fails or times out falls back to its last cached
+value when there is one and is otherwise reported in ``failed_sections``
+without failing the dashboard.
+
+Sections are cached per worker under the user's dashboard version, which
+``invalidate_dashboard`` bumps in Redis so that every worker reloads after a
+write, not only the one that handled it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import SharedVersions, TTLCache
+from app.core.config import settings
+from app.database.connection import SessionLocal
+from app.models.crop import Crop, UserCrop
+from app.models.forum import ForumPost
+from app.models.market import MarketPrice
+from app.models.pest import PestDetection
+from app.models.user import User
+from app.models.weather import WeatherAlert
+
+logger = logging.getLogger(__name__)
+
+section_cache = TTLCache(name="dashboard_section")
+dashboard_versions = SharedVersions(
+    settings.REDIS_URL, max(settings.DASHBOARD_SECTION_TTL_SECONDS.values(), default=60), "dashboard"
+)
+
+def load_user_profile(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    return {
+        "id": user.id,
+        "username": user.username,
+        "full_name": user.full_name,
+        "location": user.location,
+        "farm_size": user.farm_size,
+        "farming_method": user.farming_method,
+        "soil_type": user.soil_type,
+        "soil_ph": user.soil_ph,
+        "region": user.region,
+        "is_verified": user.is_verified
+    }
+
+def load_user_crops(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    rows = (
+        db.query(UserCrop, Crop.name)
+        .outerjoin(Crop, Crop.id == UserCrop.crop_id)
+        .filter(UserCrop.user_id == user_id)
+        .order_by(UserCrop.created_at.desc())
+        .all()
+    )
+    return [
+        {
+            "id": user_crop.id,
+            "crop_id": user_crop.crop_id,
+            "crop_name": crop_name,
+            "status": user_crop.status,
+            "planting_date": user_crop.planting_date,
+            "expected_harvest_date": user_crop.expected_harvest_date,
+            "area_planted": user_crop.area_planted
+        }
+        for user_crop, crop_name in rows
+    ]
+
+def load_farm_statistics(db: Session, user_id: int) -> Dict[str, Any]:
+    total_crops, active_crops, total_area = (
+        db.query(
+            func.count(UserCrop.id),
+            func.count(UserCrop.id).filter(UserCrop.status != "harvested"),
+            func.coalesce(func.sum(UserCrop.area_planted), 0.0)
+        )
+        .filter(UserCrop.user_id == user_id)
+        .one()
+    )
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+    recent_detections = (
+        db.query(func.count(PestDetection.id))
+        .filter(PestDetection.user_id == user_id, PestDetection.detection_date >= since)
+        .scalar()
+    )
+    forum_posts = (
+        db.query(func.count(ForumPost.id))
+        .filter(ForumPost.user_id == user_id, ForumPost.is_active == True)
+        .scalar()
+    )
+    return {
+        "total_crops": total_crops,
+        "active_crops": active_crops,
+        "total_area": float(total_area),
+        "recent_detections": recent_detections,
+        "forum_posts": forum_posts
+    }
+
+def load_recent_detections(db: Session, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
+    rows = (
+        db.query(PestDetection)
+        .filter(PestDetection.user_id == user_id)
+        .order_by(PestDetection.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": row.id,
+            "detected_pest_id": row.detected_pest_id,
+            "confidence_score": row.confidence_score,
+            "severity": row.severity,
+            "crop_affected": row.crop_affected,
+            "detection_date": row.detection_date
+        }
+        for row in rows
+    ]
+
+def load_weather_alerts(db: Session, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+    rows = (
+        db.query(WeatherAlert)
+        .filter(WeatherAlert.user_id == user_id, WeatherAlert.is_active == True)
+        .order_by(WeatherAlert.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": row.id,
+            "alert_type": row.alert_type,
+            "severity": row.severity,
+            "message": row.message,
+            "start_date": row.start_date,
+            "end_date": row.end_date
+        }
+        for row in rows
+    ]
+
+def load_market_updates(db: Session, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+    """Latest price per (crop, market location) for the crops the user grows"""
+    crop_ids = db.query(UserCrop.crop_id).filter(UserCrop.user_id == user_id).distinct()
+    rows = (
+        db.query(MarketPrice)
+        .filter(MarketPrice.crop_id.in_(crop_ids))
+        .order_by(MarketPrice.recorded_at.desc())
+        .limit(limit * 5)
+        .all()
+    )
+
+    seen, updates = set(), []
+    for row in rows:
+        if (row.crop_id, row.location) in seen:
+            continue
+        seen.add((row.crop_id, row.location))
+        updates.append({
+            "crop_id": row.crop_id,
+            "location": row.location,
+            "market_name": row.market_name,
+            "price_per_quintal": row.price_per_quintal,
+            "trend": row.trend,
+            "price_change_percent": row.price_change_percent,
+            "recorded_at": row.recorded_at
+        })
+        if len(updates) == limit:
+            break
+    return updates
+
+def load_forum_activity(db: Session, user_id: int, limit: int = 5) -> Dict[str, Any]:
+    rows = (
+        db.query(ForumPost)
+        .filter(ForumPost.user_id == user_id, ForumPost.is_active == True)
+        .order_by(ForumPost.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return {
+        "recent_posts": [
+            {
+                "id": row.id,
+                "title": row.title,
+                "category": row.category,
+                "likes_count": row.likes_count,
+                "comments_count": row.comments_count,
+                "created_at": row.created_at
+            }
+            for row in rows
+        ]
+    }
+
+SECTION_LOADERS: Dict[str, Callable[[Session, int], Any]] = {
+    "user_profile": load_user_profile,
+    "farm_statistics": load_farm_statistics,
+    "user_crops": load_user_crops,
+    "recent_detections": load_recent_detections,
+    "weather_alerts": load_weather_alerts,
+    "market_updates": load_market_updates,
+    "forum_activity": load_forum_activity
+}
+
+def invalidate_dashboard(user_id: int, sections: Optional[Iterable[str]] = None):
+    """Drop cached sections after a write so the next dashboard in any worker reflects it
+
+    Other workers reload all of the user's sections on the new version; the
+    local delete covers ``sections`` when Redis is unavailable.
+    """
+    version = dashboard_versions.get(user_id)
+    for name in sections or SECTION_LOADERS:
+        section_cache.delete((name, user_id, version))
+    dashboard_versions.bump(user_id)
+
+def compute_etag(payload: Any) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+class DashboardService:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        cache: TTLCache = section_cache,
+        versions: SharedVersions = dashboard_versions
+    ):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.versions = versions
+
+    def _load(self, name: str, user_id: int) -> Any:
+        db = self.session_factory()
+        try:
+            return jsonable_encoder(SECTION_LOADERS[name](db, user_id))
+        finally:
+            db.close()
+
+    async def _load_in_slot(
+        self,
+        name: str,
+        user_id: int,
+        version: Optional[int],
+        slots: asyncio.Semaphore,
+        started: asyncio.Event
+    ) -> Tuple[Any, Optional[str]]:
+        """Load and cache a section once a slot is free, holding the slot until its thread returns"""
+        async with slots:
+            started.set()
+            try:
+                value = await run_in_threadpool(self._load, name, user_id)
+            except Exception as e:
+                logger.warning(f"Dashboard section {name} failed for user {user_id}: {e}")
+                return None, "error"
+        self.cache.set((name, user_id, version), value, settings.DASHBOARD_SECTION_TTL_SECONDS.get(name, 60))
+        return value, None
+
+    async def get_section(
+        self,
+        name: str,
+        user_id: int,
+        version: Optional[int],
+        slots: asyncio.Semaphore,
+        deadline: float
+    ) -> Tuple[Any, Optional[str]]:
+        """Return (value, failure reason); a stale value may accompany a failure"""
+        key = (name, user_id, version)
+        found, value = self.cache.get(key)
+        if found:
+            return value, None
+
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        load = asyncio.ensure_future(self._load_in_slot(name, user_id, version, slots, started))
+        try:
+            if not started.is_set():
+                await asyncio.wait_for(started.wait(), timeout=max(deadline - loop.time(), 0))
+            # Shielded: a timed-out load keeps its slot and session until the
+            # query returns, then still refreshes the cache
+            value, reason = await asyncio.wait_for(
+                asyncio.shield(load),
+                timeout=max(min(settings.DASHBOARD_SECTION_TIMEOUT_SECONDS, deadline - loop.time()), 0)
+            )
+        except asyncio.TimeoutError:
+            if not started.is_set():
+                # Never got a slot: drop it rather than load after the response
+                load.cancel()
+            reason = "timeout"
+        if reason is None:
+            return value, None
+
+        found, value = self.cache.get(key, allow_stale=True)
+        return (value if found else None), reason
+
+    async def get_dashboard(self, user_id: int, sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        names = sections or list(SECTION_LOADERS)
+        deadline = asyncio.get_running_loop().time() + settings.DASHBOARD_REQUEST_TIMEOUT_SECONDS
+        # Read before loading: a write made while loading bumps past the cached version
+        version = await run_in_threadpool(self.versions.get, user_id)
+        slots = asyncio.Semaphore(settings.DASHBOARD_MAX_CONCURRENT_SECTIONS)
+        results = await asyncio.gather(
+            *(self.get_section(name, user_id, version, slots, deadline) for name in names)
+        )
+
+        dashboard: Dict[str, Any] = {"user_id": user_id}
+        failed, stale = {}, []
+        for name, (value, reason) in zip(names, results):
+            if reason is None:
+                dashboard[name] = value
+            elif value is not None:
+                dashboard[name] = value
+                stale.append(name)
+            else:
+                failed[name] = reason
+
+        dashboard["failed_sections"] = failed
+        dashboard["stale_sections"] = stale
+        return dashboard
@@ -0,0 +1,216 @@
+"""
+Vectorised forecast summaries at selectable resolutions
+
+An OpenWeather 3-hourly forecast is turned into column arrays once, and the
+daily aggregates (min/max/mean temperature, rainfall totals, growing degree
+days, spray-window hours) are computed from them with NumPy reductions in
+the same pass. The result is cached per location so the forecast endpoint and
+the farming-conditions endpoint share one computation.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.upstream import upstream_client
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ("3h", "daily", "summary")
+
+# Conditions under which spraying is advised: little drift, no wash-off,
+# and a temperature range in which most products are labelled for use
+SPRAY_MAX_WIND_SPEED = 4.2  # m/s, about 15 km/h
+SPRAY_MAX_RAIN_PROBABILITY = 0.3
+SPRAY_MIN_TEMPERATURE = 10.0
+SPRAY_MAX_TEMPERATURE = 30.0
+RAINY_DAY_THRESHOLD_MM = 2.5
+HOURS_PER_STEP = 3
+
+forecast_cache = TTLCache(max_entries=2000, name="forecast")
+
+class ForecastSummary:
+    def __init__(self, data: Dict[str, Any], base_temperature: float = 10.0):
+        entries = data.get("list", [])
+        self.location = data.get("city", {}).get("name")
+        self.base_temperature = base_temperature
+        offset = int(data.get("city", {}).get("timezone", 0))
+
+        self.times = np.array([entry["dt"] for entry in entries], dtype=np.int64)
+        self.temperature = np.array([entry["main"]["temp"] for entry in entries], dtype=np.float64)
+        self.temp_min = np.array([entry["main"].get("temp_min", entry["main"]["temp"]) for entry in entries], dtype=np.float64)
+        self.temp_max = np.array([entry["main"].get("temp_max", entry["main"]["temp"]) for entry in entries], dtype=np.float64)
+        self.humidity = np.array([entry["main"].get("humidity", 0) for entry in entries], dtype=np.float64)
+        self.wind_speed = np.array([entry.get("wind", {}).get("speed", 0.0) for entry in entries], dtype=np.float64)
+        self.rainfall = np.array([entry.get("rain", {}).get("3h", 0.0) for entry in entries], dtype=np.float64)
+        self.rain_probability = np.array([entry.get("pop", 0.0) for entry in entries], dtype=np.float64)
+        conditions = [entry["weather"][0]["main"] if entry.get("weather") else "Unknown" for entry in entries]
+        self.condition_names, self.condition_codes = np.unique(np.array(conditions, dtype=str), return_inverse=True)
+
+        # Spraying also needs the following step to stay dry so the product can dry
+        rain_next = np.append(self.rainfall[1:], 0.0)
+        self.spray_ok = (
+            (self.wind_speed <= SPRAY_MAX_WIND_SPEED)
+            & (self.rainfall == 0)
+            & (rain_next == 0)
+            & (self.rain_probability <= SPRAY_MAX_RAIN_PROBABILITY)
+            & (self.temperature >= SPRAY_MIN_TEMPERATURE)
+            & (self.temperature <= SPRAY_MAX_TEMPERATURE)
+        )
+
+        self.day_numbers = (self.times + offset) // 86400
+        self._compute_daily()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _compute_daily(self):
+        if len(self.times) == 0:
+            self.days = np.array([], dtype=np.int64)
+            return
+
+        self.days, starts, day_index = np.unique(self.day_numbers, return_index=True, return_inverse=True)
+        counts = np.bincount(day_index)
+
+        self.day_min = np.minimum.reduceat(self.temp_min, starts)
+        self.day_max = np.maximum.reduceat(self.temp_max, starts)
+        self.day_mean = np.add.reduceat(self.temperature, starts) / counts
+        self.day_humidity = np.add.reduceat(self.humidity, starts) / counts
+        self.day_rainfall = np.add.reduceat(self.rainfall, starts)
+        self.day_rain_probability = np.maximum.reduceat(self.rain_probability, starts)
+        self.day_max_wind = np.maximum.reduceat(self.wind_speed, starts)
+        self.day_spray_hours = np.add.reduceat(self.spray_ok.astype(np.int64), starts) * HOURS_PER_STEP
+        self.day_gdd = np.maximum((self.day_max + self.day_min) / 2 - self.base_temperature, 0.0)
+
+        # Most frequent condition per day
+        tally = np.zeros((len(self.days), len(self.condition_names)), dtype=np.int64)
+        np.add.at(tally, (day_index, self.condition_codes), 1)
+        self.day_condition = self.condition_names[tally.argmax(axis=1)]
+
+    def spray_windows(self) -> List[Dict[str, Any]]:
+        """Contiguous runs of spray-suitable steps as start/end timestamps"""
+        edges = np.diff(np.concatenate([[0], self.spray_ok.astype(np.int8), [0]]))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        return [
+            {
+                "start": datetime.fromtimestamp(int(self.times[start]), tz=timezone.utc),
+                "end": datetime.fromtimestamp(int(self.times[end - 1]) + HOURS_PER_STEP * 3600, tz=timezone.utc),
+                "hours": int(end - start) * HOURS_PER_STEP
+            }
+            for start, end in zip(starts, ends)
+        ]
+
+    def three_hourly(self) -> List[Dict[str, Any]]:
+        columns = zip(
+            self.times.tolist(),
+            self.temperature.tolist(),
+            self.humidity.tolist(),
+            self.wind_speed.tolist(),
+            self.rainfall.tolist(),
+            self.rain_probability.tolist(),
+            self.condition_names[self.condition_codes].tolist(),
+            self.spray_ok.tolist()
+        )
+        return [
+            {
+                "datetime": datetime.fromtimestamp(dt, tz=timezone.utc),
+                "temperature": temperature,
+                "humidity": humidity,
+                "wind_speed": wind_speed,
+                "rainfall": rainfall,
+                "rain_probability": rain_probability,
+                "weather_condition": condition,
+                "spray_window": spray_ok
+            }
+            for dt, temperature, humidity, wind_speed, rainfall, rain_probability, condition, spray_ok in columns
+        ]
+
+    def daily(self) -> List[Dict[str, Any]]:
+        if len(self.days) == 0:
+            return []
+        columns = zip(
+            self.days.tolist(),
+            np.round(self.day_min, 2).tolist(),
+            np.round(self.day_max, 2).tolist(),
+            np.round(self.day_mean, 2).tolist(),
+            np.round(self.day_humidity, 1).tolist(),
+            np.round(self.day_rainfall, 2).tolist(),
+            self.day_rain_probability.tolist(),
+            self.day_max_wind.tolist(),
+            np.round(self.day_gdd, 2).tolist(),
+            self.day_spray_hours.tolist(),
+            self.day_condition.tolist()
+        )
+        return [
+            {
+                "date": datetime.fromtimestamp(day * 86400, tz=timezone.utc).date().isoformat(),
+                "temperature_min": temp_min,
+                "temperature_max": temp_max,
+                "temperature_mean": temp_mean,
+                "humidity": humidity,
+                "rainfall_total": rainfall,
+                "rainfall_probability": rain_probability,
+                "wind_speed_max": wind_max,
+                "growing_degree_days": gdd,
+                "spray_hours": spray_hours,
+                "weather_condition": condition
+            }
+            for day, temp_min, temp_max, temp_mean, humidity, rainfall, rain_probability, wind_max, gdd, spray_hours, condition in columns
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        if len(self.days) == 0:
+            return {"days": 0}
+        windows = self.spray_windows()
+        within_24h = slice(0, 24 // HOURS_PER_STEP)
+        return {
+            "days": int(len(self.days)),
+            "temperature_min": round(float(self.day_min.min()), 2),
+            "temperature_max": round(float(self.day_max.max()), 2),
+            "temperature_mean": round(float(self.temperature.mean()), 2),
+            "rainfall_total": round(float(self.rainfall.sum()), 2),
+            "rainfall_next_24h": round(float(self.rainfall[within_24h].sum()), 2),
+            "rainy_days": int((self.day_rainfall >= RAINY_DAY_THRESHOLD_MM).sum()),
+            "growing_degree_days": round(float(self.day_gdd.sum()), 2),
+            "gdd_base_temperature": self.base_temperature,
+            "wind_speed_max": float(self.wind_speed.max()),
+            "spray_hours": int(self.spray_ok.sum()) * HOURS_PER_STEP,
+            "next_spray_window": windows[0] if windows else None,
+            "spray_windows": windows
+        }
+
+    def render(self, resolution: str) -> Any:
+        if resolution == "3h":
+            return self.three_hourly()
+        if resolution == "daily":
+            return self.daily()
+        return self.summary()
+
+async def get_forecast_summary(location: str, days: int = 5) -> Optional[ForecastSummary]:
+    """Fetch and summarise a forecast, sharing the result across endpoints for a while"""
+    key = (location.strip().lower(), days)
+    found, summary = forecast_cache.get(key)
+    if found:
+        return summary
+
+    async with upstream_client("openweather", timeout=settings.WEATHER_API_TIMEOUT_SECONDS) as client:
+        response = await client.get(
+            f"{settings.OPENWEATHER_BASE_URL}/forecast",
+            params={
+                "q": location,
+                "appid": settings.OPENWEATHER_API_KEY,
+                "units": "metric",
+                "cnt": days * 8  # 8 data points per day (3-hour intervals)
+            }
+        )
+    if response.status_code != 200:
+        return None
+
+    summary = ForecastSummary(response.json(), base_temperature=settings.GDD_BASE_TEMPERATURE)
+    forecast_cache.set(key, summary, settings.WEATHER_FORECAST_CACHE_TTL_SECONDS)
+    return summary
@@ -0,0 +1,255 @@
+"""
+Server-side feature assembly for location-based crop recommendations
+
+Gathers the latest cached weather, historical climate aggregates and the
+user's stored farm profile concurrently, each on its own database session, so
+a client on a slow link makes one request instead of fetching weather first.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import httpx
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.upstream import upstream_client
+from app.database.connection import SessionLocal
+from app.models.user import User
+from app.models.weather import WeatherData
+
+logger = logging.getLogger(__name__)
+
+CONTINUOUS_FEATURES = ["temperature", "humidity", "ph", "rainfall"]
+CATEGORICAL_FEATURES = ["soil_type", "season", "region", "water_requirement"]
+
+# Same fallbacks CropRecommendationModel.preprocess_input applies
+CATEGORICAL_DEFAULTS = {
+    "soil_type": "loamy",
+    "region": "north",
+    "water_requirement": "medium"
+}
+
+def season_for_month(month: int) -> str:
+    """Main cropping season whose sowing window is current or next in ``month``"""
+    return "kharif" if 4 <= month <= 9 else "rabi"
+
+def rainfall_rate(rain: Dict[str, float]) -> float:
+    """Rain rate in mm/h from OpenWeather's trailing 1h or 3h amounts (none reported is dry)"""
+    if "1h" in rain:
+        return float(rain["1h"])
+    if "3h" in rain:
+        return float(rain["3h"]) / 3
+    return 0.0
+
+class LocationRecommendationService:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def get_farm_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            user = db.query(User).filter(User.id == user_id).first()
+            if user is None:
+                return None
+            return {
+                "location": user.location,
+                "soil_type": user.soil_type,
+                "ph": user.soil_ph,
+                "region": user.region
+            }
+        finally:
+            db.close()
+
+    def get_cached_weather(self, location: str) -> Optional[Dict[str, Any]]:
+        """Most recent stored observation no older than CROP_WEATHER_MAX_AGE_MINUTES"""
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=settings.CROP_WEATHER_MAX_AGE_MINUTES)
+        db = self.session_factory()
+        try:
+            row = (
+                db.query(WeatherData)
+                .filter(WeatherData.location == location, WeatherData.recorded_at >= cutoff)
+                .order_by(WeatherData.recorded_at.desc())
+                .first()
+            )
+            if row is None:
+                return None
+            return {
+                "temperature": row.temperature,
+                "humidity": row.humidity,
+                "weather_condition": row.weather_condition,
+                "recorded_at": row.recorded_at,
+                "source": "cache"
+            }
+        finally:
+            db.close()
+
+    def store_weather(self, location: str, observation: Dict[str, Any]):
+        db = self.session_factory()
+        try:
+            db.add(WeatherData(
+                location=location,
+                temperature=observation["temperature"],
+                humidity=observation["humidity"],
+                rainfall=observation["rainfall"],
+                weather_condition=observation["weather_condition"]
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    async def fetch_live_weather(self, location: str) -> Optional[Dict[str, Any]]:
+        """Current conditions from OpenWeather, stored so the next call hits the cache"""
+        try:
+            async with upstream_client("openweather", timeout=settings.WEATHER_API_TIMEOUT_SECONDS) as client:
+                response = await client.get(
+                    f"{settings.OPENWEATHER_BASE_URL}/weather",
+                    params={
+                        "q": location,
+                        "appid": settings.OPENWEATHER_API_KEY,
+                        "units": "metric"
+                    }
+                )
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            observation = {
+                "temperature": data["main"]["temp"],
+                "humidity": data["main"]["humidity"],
+                "rainfall": rainfall_rate(data.get("rain") or {}),
+                "weather_condition": data["weather"][0]["main"] if data.get("weather") else None,
+                "recorded_at": datetime.now(timezone.utc),
+                "source": "live"
+            }
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            logger.warning(f"Live weather lookup failed for {location}: {e}")
+            return None
+
+        await run_in_threadpool(self.store_weather, location, observation)
+        return observation
+
+    async def get_weather(self, location: str) -> Optional[Dict[str, Any]]:
+        cached = await run_in_threadpool(self.get_cached_weather, location)
+        if cached is not None:
+            return cached
+        return await self.fetch_live_weather(location)
+
+    def get_climate_summary(self, location: str) -> Optional[Dict[str, Any]]:
+        """Average temperature and humidity and annualised rainfall over the climate window
+
+        Stored rainfall is a rate in mm/h. Each day's observations are averaged
+        into a daily total first, so the estimate does not depend on how often
+        snapshots were taken, and the mean day is scaled to a year to match
+        the annual totals the recommender was trained on. Rainfall is left out
+        (for the request to supply) unless enough days have it.
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=settings.CROP_CLIMATE_WINDOW_DAYS)
+        in_window = (WeatherData.location == location, WeatherData.recorded_at >= since)
+        day = func.date(WeatherData.recorded_at)
+        db = self.session_factory()
+        try:
+            temperature, humidity, days = (
+                db.query(
+                    func.avg(WeatherData.temperature),
+                    func.avg(WeatherData.humidity),
+                    func.count(func.distinct(day))
+                )
+                .filter(*in_window)
+                .one()
+            )
+            daily_rates = (
+                db.query(func.avg(WeatherData.rainfall).label("rate"))
+                .filter(*in_window, WeatherData.rainfall.isnot(None))
+                .group_by(day)
+                .subquery()
+            )
+            rain_rate, rain_days = db.query(func.avg(daily_rates.c.rate), func.count()).select_from(daily_rates).one()
+        finally:
+            db.close()
+
+        if not days or days < settings.CROP_CLIMATE_MIN_DAYS:
+            return None
+        climate = {
+            "temperature": float(temperature) if temperature is not None else None,
+            "humidity": float(humidity) if humidity is not None else None,
+            "days_observed": int(days)
+        }
+        if rain_days >= settings.CROP_CLIMATE_MIN_DAYS and rain_rate is not None:
+            climate["rainfall"] = float(rain_rate) * 24 * 365
+        return climate
+
+    async def gather_context(self, user_id: int, location: Optional[str]) -> Dict[str, Any]:
+        """Load profile, weather and climate with as much overlap as the inputs allow"""
+        profile_task = asyncio.ensure_future(run_in_threadpool(self.get_farm_profile, user_id))
+        if location is None:
+            # The stored farm location is needed before weather can be looked up
+            profile = await profile_task
+            location = profile["location"] if profile else None
+            if not location:
+                return {"profile": profile, "location": None, "weather": None, "climate": None}
+            profile_task = None
+
+        weather, climate, *rest = await asyncio.gather(
+            self.get_weather(location),
+            run_in_threadpool(self.get_climate_summary, location),
+            *([profile_task] if profile_task is not None else [])
+        )
+        if rest:
+            profile = rest[0]
+
+        return {"profile": profile, "location": location, "weather": weather, "climate": climate}
+
+    def assemble_features(
+        self,
+        overrides: Dict[str, Any],
+        context: Dict[str, Any],
+        known_categories: Optional[Dict[str, Iterable[str]]] = None,
+        today: Optional[datetime] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Pick each model input from the best available source
+
+        Explicit request values win, then the climate window for the
+        long-term conditions, then current weather, then the stored profile.
+        Stored categories outside ``known_categories`` (a valid profile value
+        the model was not trained on) are passed over for the default, while
+        request values are kept for the model to reject. Returns the features
+        and the source of each; features that cannot be filled are left out so
+        the caller can report them.
+        """
+        profile = context.get("profile") or {}
+        sources_by_priority = [
+            ("request", overrides),
+            ("climate", context.get("climate") or {}),
+            ("weather", context.get("weather") or {}),
+            ("profile", profile)
+        ]
+
+        known = {name: set(values) for name, values in (known_categories or {}).items()}
+
+        features, sources = {}, {}
+        for name in CONTINUOUS_FEATURES + CATEGORICAL_FEATURES:
+            for source, values in sources_by_priority:
+                value = values.get(name)
+                if value is None:
+                    continue
+                # Profiles saved before validation may hold "Clay" or " North"; the encoders are lower-case
+                if name in CATEGORICAL_FEATURES and isinstance(value, str):
+                    value = value.strip().lower()
+                    if source != "request" and name in known and value not in known[name]:
+                        continue
+                features[name] = value
+                sources[name] = source
+                break
+
+        if "season" not in features:
+            features["season"] = season_for_month((today or datetime.now()).month)
+            sources["season"] = "calendar"
+        for name, default in CATEGORICAL_DEFAULTS.items():
+            if name not in features:
+                features[name] = default
+                sources[name] = "default"
+
+        return features, sources
@@ -0,0 +1,71 @@
+"""
+Pluggable notification senders for user-facing alerts
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List
+
+from app.core.pubsub import broker
+
+logger = logging.getLogger(__name__)
+
+class NotificationSender(ABC):
+    """Delivers a batch of notifications; implementations should not raise per message"""
+
+    @abstractmethod
+    def send_batch(self, notifications: List[Dict]) -> int:
+        """Send notifications and return how many were accepted"""
+
+class LogNotificationSender(NotificationSender):
+    """Local stand-in that logs and keeps the most recent notifications in memory"""
+
+    def __init__(self, keep: int = 1000):
+        self.sent = deque(maxlen=keep)
+
+    def send_batch(self, notifications: List[Dict]) -> int:
+        self.sent.extend(notifications)
+        for notification in notifications[:5]:
+            logger.info(f"Notify user {notification['user_id']}: {notification['message']}")
+        if len(notifications) > 5:
+            logger.info(f"... and {len(notifications) - 5} more notifications")
+        return len(notifications)
+
+class PushNotificationSender(NotificationSender):
+    """Publishes each notification to the user's real-time push topic
+
+    Notifications go out ``batch_size`` at a time, each batch waiting for
+    the previous one, so a run raising many alerts never floods the event
+    loop. Outside the API server only the ``redis`` push backend can reach
+    clients, so the sender refuses to start with ``memory`` there.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        if broker.loop is None and broker.backend != "redis":
+            raise ValueError("Push notifications outside the API server need PUSH_BACKEND=redis")
+        self.batch_size = batch_size
+
+    def send_batch(self, notifications: List[Dict]) -> int:
+        published = 0
+        for start in range(0, len(notifications), self.batch_size):
+            published += broker.publish_many_threadsafe([
+                (f"user:{notification['user_id']}", "weather_alert", notification)
+                for notification in notifications[start:start + self.batch_size]
+            ])
+        return published
+
+class NullNotificationSender(NotificationSender):
+    def send_batch(self, notifications: List[Dict]) -> int:
+        return 0
+
+NOTIFICATION_SENDERS = {
+    "log": LogNotificationSender,
+    "push": PushNotificationSender,
+    "none": NullNotificationSender
+}
+
+def get_notification_sender(name: str) -> NotificationSender:
+    if name not in NOTIFICATION_SENDERS:
+        raise ValueError(f"Unknown notification sender: {name}")
+    return NOTIFICATION_SENDERS[name]()
@@ -0,0 +1,285 @@
+"""
+Bulk re-scoring of stored pest detections after a model upgrade
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.ml_models.pest_detection import PestDetectionModel, severity_for_confidence
+from app.ml_models.vector_index import pack_vector
+from app.models.pest import Pest, PestDetection
+
+logger = logging.getLogger(__name__)
+
+class RescoreJob:
+    """Cross-process control of the re-scoring job through files beside its checkpoint
+
+    The process running the job holds an exclusive lock on
+    ``<checkpoint>.lock`` for the whole run, so at most one worker (or CLI
+    run) on the node scores at a time and the lock is released even if that
+    process dies. Any worker can report the job, from the lock and the stats
+    and error stored in the checkpoint, and stop it by creating
+    ``<checkpoint>.stop``, which the run checks between pages.
+    """
+
+    def __init__(self, checkpoint_path: str):
+        self.checkpoint_path = checkpoint_path
+        self.lock_path = f"{checkpoint_path}.lock"
+        self.stop_path = f"{checkpoint_path}.stop"
+        self.lock_file = None
+
+    def _try_lock(self):
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def acquire(self) -> bool:
+        """Take the job lock for a new run, or return False if one is running anywhere"""
+        lock_file = self._try_lock()
+        if lock_file is None:
+            return False
+        self.lock_file = lock_file
+        if os.path.exists(self.stop_path):
+            os.remove(self.stop_path)
+        checkpoint = self.read_checkpoint()
+        if "error" in checkpoint:
+            del checkpoint["error"]
+            self.write_checkpoint(checkpoint)
+        return True
+
+    def release(self):
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def running(self) -> bool:
+        # flock conflicts across open files, so this also sees a run in this process
+        lock_file = self._try_lock()
+        if lock_file is None:
+            return True
+        lock_file.close()
+        return False
+
+    def request_stop(self):
+        os.makedirs(os.path.dirname(self.stop_path) or ".", exist_ok=True)
+        open(self.stop_path, "w").close()
+
+    def is_set(self) -> bool:
+        """Whether a stop was requested; lets the job be passed as ``stop_event``"""
+        return os.path.exists(self.stop_path)
+
+    def read_checkpoint(self) -> Dict:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_checkpoint(self, checkpoint: Dict):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def record_error(self, error: str):
+        self.write_checkpoint({**self.read_checkpoint(), "error": error})
+
+    def status(self) -> Dict:
+        checkpoint = self.read_checkpoint()
+        error = checkpoint.pop("error", None)
+        return {"running": self.running(), "stats": checkpoint or None, "error": error}
+
+class RescoringService:
+    """Re-run the pest model over historical detections in keyset order
+
+    Rows are read in ``id`` order in pages of ``batch_size``; images for the
+    next ``prefetch`` pages are decoded on a thread pool while the current
+    page runs through a single batched forward pass. Results are written back
+    with one bulk UPDATE per page and the last processed id is checkpointed,
+    so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        model: PestDetectionModel,
+        batch_size: int = 64,
+        workers: int = 4,
+        prefetch: int = 2,
+        checkpoint_path: Optional[str] = None
+    ):
+        self.db = db
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch = max(1, prefetch)
+        self.checkpoint_path = checkpoint_path
+
+    def load_checkpoint(self) -> Dict:
+        """Load the saved progress for the current model version"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+
+        # A checkpoint written for another model version does not apply
+        if checkpoint.get("model_version") != self.model.model_version:
+            return {}
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: Dict):
+        """Atomically persist progress so a crash never leaves a torn file"""
+        if not self.checkpoint_path:
+            return
+
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def iter_pages(self, after_id: int, limit: Optional[int] = None) -> Iterator[List[Tuple[int, str]]]:
+        """Yield pages of (id, image_path) not yet scored by this model version"""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            rows = (
+                self.db.query(PestDetection.id, PestDetection.image_path)
+                .filter(PestDetection.id > after_id)
+                .filter(or_(
+                    PestDetection.model_version.is_(None),
+                    PestDetection.model_version != self.model.model_version
+                ))
+                .order_by(PestDetection.id)
+                .limit(page_size)
+                .all()
+            )
+            if not rows:
+                return
+
+            yield [(row.id, row.image_path) for row in rows]
+            after_id = rows[-1].id
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def _load(self, image_path: str) -> Optional[np.ndarray]:
+        try:
+            return self.model.preprocess_array(self.model.load_image(image_path))
+        except Exception as e:
+            logger.warning(f"Skipping unreadable image {image_path}: {e}")
+            return None
+
+    def _pest_ids(self) -> Dict[str, int]:
+        return {name: pest_id for pest_id, name in self.db.query(Pest.id, Pest.name).all()}
+
+    def run(
+        self,
+        limit: Optional[int] = None,
+        resume: bool = True,
+        stop_event: Optional[Union[threading.Event, RescoreJob]] = None,
+        progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Re-score detections and return throughput statistics"""
+        checkpoint = self.load_checkpoint() if resume else {}
+        stats = {
+            "model_version": self.model.model_version,
+            "last_id": checkpoint.get("last_id", 0),
+            "processed": checkpoint.get("processed", 0),
+            "failed": checkpoint.get("failed", 0),
+            "elapsed_seconds": 0.0,
+            "images_per_second": 0.0
+        }
+        pest_ids = self._pest_ids()
+        started = time.perf_counter()
+        processed_this_run = 0
+
+        pages = self.iter_pages(stats["last_id"], limit)
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            def submit_next() -> bool:
+                page = next(pages, None)
+                if page is None:
+                    return False
+                pending.append((page, [executor.submit(self._load, path) for _, path in page]))
+                return True
+
+            for _ in range(self.prefetch):
+                if not submit_next():
+                    break
+
+            while pending:
+                if stop_event is not None and stop_event.is_set():
+                    logger.info("Re-scoring stopped on request")
+                    break
+
+                page, futures = pending.popleft()
+                submit_next()
+
+                images = [future.result() for future in futures]
+                loaded = [i for i, image in enumerate(images) if image is not None]
+
+                updates = []
+                if loaded:
+                    batch = np.stack([images[i] for i in loaded])
+                    probabilities, embeddings = self.model.predict_with_embedding(batch)
+                    probabilities = self.model.calibration.apply(probabilities)
+                    best = probabilities.argmax(axis=1)
+                    confidences = probabilities[np.arange(len(best)), best]
+
+                    for row_index, class_index, confidence, embedding in zip(loaded, best, confidences, embeddings):
+                        confidence = float(confidence)
+                        class_name = self.model.class_names[class_index]
+                        updates.append({
+                            "id": page[row_index][0],
+                            "detected_pest_id": pest_ids.get(class_name),
+                            "confidence_score": confidence,
+                            "severity": severity_for_confidence(
+                                confidence,
+                                self.model.calibration.high_threshold(class_name)
+                            ),
+                            "model_version": self.model.model_version,
+                            "embedding": pack_vector(embedding)
+                        })
+
+                    self.db.bulk_update_mappings(PestDetection, updates)
+                    self.db.commit()
+
+                processed_this_run += len(updates)
+                stats["processed"] += len(updates)
+                stats["failed"] += len(page) - len(updates)
+                stats["last_id"] = page[-1][0]
+                stats["elapsed_seconds"] = time.perf_counter() - started
+                stats["images_per_second"] = processed_this_run / max(stats["elapsed_seconds"], 1e-9)
+
+                self.save_checkpoint(stats)
+                if progress is not None:
+                    progress(dict(stats))
+                logger.info(
+                    f"Re-scored up to id {stats['last_id']}: {stats['processed']} done, "
+                    f"{stats['failed']} failed, {stats['images_per_second']:.1f} images/s"
+                )
+
+            for _, futures in pending:
+                for future in futures:
+                    future.cancel()
+
+        return stats
@@ -0,0 +1,73 @@
+"""
+Similar-case lookup and duplicate detection for pest detections
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.ml_models.vector_index import IVFIndex, unpack_vector
+from app.models.pest import PestDetection
+
+class SimilarityService:
+    def __init__(self, db: Session, index: IVFIndex):
+        self.db = db
+        self.index = index
+
+    def find_duplicate(self, image_hash: int, model_version: str) -> Optional[PestDetection]:
+        """Most recent detection of the same photo scored by this model version"""
+        return (
+            self.db.query(PestDetection)
+            .filter(
+                PestDetection.image_hash == image_hash,
+                PestDetection.model_version == model_version,
+                PestDetection.predictions.isnot(None)
+            )
+            .order_by(PestDetection.id.desc())
+            .first()
+        )
+
+    def index_detection(self, detection_id: int, embedding: np.ndarray):
+        """Make a freshly stored detection searchable in this process"""
+        self.index.add(detection_id, embedding)
+
+    def get_similar_detections(self, detection_id: int, limit: int = 10) -> Optional[List[Dict]]:
+        """Past detections whose images look most like this one
+
+        Returns ``None`` when the detection does not exist and an empty list
+        when it has no stored embedding.
+        """
+        detection = self.db.query(PestDetection).filter(PestDetection.id == detection_id).first()
+        if detection is None:
+            return None
+        if detection.embedding is None:
+            return []
+
+        matches = self.index.search(unpack_vector(detection.embedding), k=limit, exclude_id=detection_id)
+        if not matches:
+            return []
+
+        rows = {
+            row.id: row
+            for row in self.db.query(PestDetection).filter(
+                PestDetection.id.in_([match_id for match_id, _ in matches])
+            )
+        }
+
+        return [
+            {
+                "detection_id": match_id,
+                "similarity": similarity,
+                "image_path": rows[match_id].image_path,
+                "detected_pest_id": rows[match_id].detected_pest_id,
+                "confidence_score": rows[match_id].confidence_score,
+                "severity": rows[match_id].severity,
+                "crop_affected": rows[match_id].crop_affected,
+                "location": rows[match_id].location,
+                "detection_date": rows[match_id].detection_date,
+                "is_verified": rows[match_id].is_verified
+            }
+            for match_id, similarity in matches
+            if match_id in rows
+        ]
@@ -0,0 +1,84 @@
+"""
+Microbenchmark: sklearn RandomForest predict_proba vs the compiled forest
+
+Uses the saved crop recommendation model when --model-path exists, otherwise
+fits a forest with the production hyper-parameters on the crop dataset in
+ML_Models/Crop_Recommendation.
+
+Usage:
+    python benchmarks/bench_forest.py [--model-path PATH] [--repeats 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.ml_models.forest_compiler import CompiledForest
+
+DATASET = os.path.join(
+    os.path.dirname(__file__), "..", "..", "ML_Models", "Crop_Recommendation", "Crop_recommendation.csv"
+)
+
+def load_forest(model_path: str):
+    if model_path and os.path.exists(model_path):
+        forest = joblib.load(model_path)
+        if isinstance(forest, dict):
+            forest = forest["model"]
+        rng = np.random.default_rng(0)
+        return forest, rng.uniform(0, 100, size=(4096, forest.n_features_in_))
+
+    df = pd.read_csv(DATASET)
+    X = df.drop(columns=["label"]).to_numpy(dtype=np.float64)
+    forest = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+    forest.fit(X, df["label"])
+    return forest, X
+
+def time_call(fn, repeats: int) -> dict:
+    fn()  # warm-up
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return {
+        "p50_us": float(np.percentile(timings, 50) * 1e6),
+        "p95_us": float(np.percentile(timings, 95) * 1e6)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark forest evaluation")
+    parser.add_argument("--model-path", default=None)
+    parser.add_argument("--repeats", type=int, default=500)
+    args = parser.parse_args()
+
+    forest, X = load_forest(args.model_path)
+    compiled = CompiledForest.from_sklearn(forest)
+
+    identical = np.array_equal(forest.predict_proba(X), compiled.predict_proba(X))
+    print(f"Trees: {len(forest.estimators_)}, nodes: {len(compiled.feature)}, depth: {compiled.depth}")
+    print(f"Bit-for-bit identical on {len(X)} rows: {identical}")
+
+    print(f"{'batch':>6} {'sklearn p50':>14} {'compiled p50':>14} {'speedup':>8}")
+    for batch_size in (1, 16, 256, 1024):
+        batch = X[:batch_size]
+        repeats = args.repeats if batch_size < 256 else max(20, args.repeats // 10)
+        sk = time_call(lambda: forest.predict_proba(batch), repeats)
+        cf = time_call(lambda: compiled.predict_proba(batch), repeats)
+        print(
+            f"{batch_size:>6} {sk['p50_us']:>12.1f}us {cf['p50_us']:>12.1f}us "
+            f"{sk['p50_us'] / cf['p50_us']:>7.1f}x"
+        )
+
+    if not identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup benchmark: import time of the application per deployment role
+
+Imports ``main`` in fresh interpreters under ``python -X importtime`` for each
+APP_ROLE and compares the median against the budgets in import_budget.json.
+Exits non-zero when a role exceeds its budget or imports a module it must not
+(heavy ML libraries are only allowed on first use, never at import).
+
+Usage:
+    python benchmarks/bench_import_time.py [--roles api ml all] [--runs 5] [--top 15]
+    python benchmarks/bench_import_time.py --update   # rewrite budgets from this machine
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "import_budget.json")
+BUDGET_HEADROOM = 1.25
+
+def measure(role: str) -> Tuple[float, Dict[str, float]]:
+    """Total import time in ms and cumulative ms per top-level package, in a fresh process"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "APP_ROLE": role},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing main failed for role {role}:\n{result.stderr[-2000:]}")
+
+    packages: Dict[str, float] = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        if not name.startswith("  "):
+            # Top-level entries (one leading space) add up to the whole import
+            total_us += int(cumulative)
+        top = name.strip().split(".")[0]
+        packages[top] = max(packages.get(top, 0.0), int(cumulative) / 1000)
+    return total_us / 1000, packages
+
+def main():
+    parser = argparse.ArgumentParser(description="Check application import time against a budget")
+    parser.add_argument("--roles", nargs="+", default=["api", "ml", "all"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Show the heaviest N packages")
+    parser.add_argument("--update", action="store_true", help="Write budgets from this run plus headroom")
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    failures: List[str] = []
+    for role in args.roles:
+        runs = [measure(role) for _ in range(args.runs)]
+        total_ms = float(np.median([total for total, _ in runs]))
+        packages = runs[-1][1]
+
+        print(f"\n[{role}] import main: median {total_ms:.0f}ms over {args.runs} runs")
+        for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {ms:>9.1f}ms  {name}")
+
+        forbidden = sorted(set(packages) & set(budget["forbidden_modules"]))
+        if forbidden:
+            failures.append(f"{role}: imports {', '.join(forbidden)} at startup")
+
+        if args.update:
+            budget["max_ms"][role] = round(total_ms * BUDGET_HEADROOM)
+        elif total_ms > budget["max_ms"].get(role, float("inf")):
+            failures.append(f"{role}: {total_ms:.0f}ms exceeds budget of {budget['max_ms'][role]}ms")
+
+    if args.update:
+        with open(BUDGET_PATH, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"\nUpdated {BUDGET_PATH}")
+
+    if failures:
+        print("\nImport budget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Microbenchmark: Keras Model.predict vs compiled fixed-signature inference
+
+Each path runs in a fresh process so that "cold" is the real first call after
+loading the model (graph tracing included) rather than a warm runtime. Uses the
+saved pest model when --model-path exists, otherwise the untrained default
+architecture, which has the same cost profile.
+
+Usage:
+    python benchmarks/bench_pest_inference.py [--model-path PATH] [--repeats 200]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BATCH_SIZES = (1, 16, 64)
+
+def run_mode(mode: str, model_path: str, repeats: int) -> dict:
+    from app.ml_models.pest_detection import PestDetectionModel
+
+    started = time.perf_counter()
+    model = PestDetectionModel(model_path, batch_sizes=list(BATCH_SIZES))
+    load_ms = (time.perf_counter() - started) * 1000
+    classifier = model.embedding_model or model.model
+
+    if mode == "keras":
+        predict = lambda batch: classifier.predict(batch, verbose=0)
+    else:
+        predict = model.compiled
+
+    rng = np.random.default_rng(0)
+    results = {"load_ms": load_ms}
+    for batch_size in BATCH_SIZES:
+        batch = rng.random((batch_size, 224, 224, 3), dtype=np.float32)
+        started = time.perf_counter()
+        predict(batch)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        timings = np.empty(repeats if batch_size == 1 else max(10, repeats // batch_size))
+        for i in range(len(timings)):
+            started = time.perf_counter()
+            predict(batch)
+            timings[i] = (time.perf_counter() - started) * 1000
+        results[batch_size] = {
+            "cold_ms": cold_ms,
+            "p50_ms": float(np.percentile(timings, 50)),
+            "p95_ms": float(np.percentile(timings, 95))
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pest model inference paths")
+    parser.add_argument("--model-path", default="app/ml_models/pest_detection_model.h5")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--mode", choices=("keras", "compiled"), default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.model_path, args.repeats)))
+        return
+
+    results = {}
+    for mode in ("keras", "compiled"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--model-path", args.model_path, "--repeats", str(args.repeats)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"Model load: keras {results['keras']['load_ms']:.0f}ms, compiled {results['compiled']['load_ms']:.0f}ms")
+    print(f"{'batch':>6} {'path':>9} {'cold':>10} {'warm p50':>10} {'warm p95':>10}")
+    for batch_size in BATCH_SIZES:
+        for mode in ("keras", "compiled"):
+            row = results[mode][str(batch_size)]
+            print(
+                f"{batch_size:>6} {mode:>9} {row['cold_ms']:>8.1f}ms "
+                f"{row['p50_ms']:>8.2f}ms {row['p95_ms']:>8.2f}ms"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmark: advisory BM25 retrieval latency on a synthetic corpus
+
+Generates forum-like documents from an agronomy vocabulary with a Zipfian term
+distribution, builds the index in a temporary directory and reports build
+time, load time and query latency percentiles.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--documents 100000] [--queries 2000] [--k 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.ml_models.text_index import BM25Index
+
+DOMAIN_TERMS = (
+    "wheat rice maize cotton sugarcane soybean mustard chickpea tomato potato onion "
+    "aphid whitefly bollworm stemborer blight rust mildew wilt leafcurl mosaic "
+    "irrigation drip sprinkler fertilizer urea dap potash nitrogen phosphorus compost "
+    "sowing harvest yield seed variety hybrid spacing weeding mulching rotation "
+    "rainfall drought flood frost heatwave humidity monsoon kharif rabi zaid "
+    "soil ph clay loam sandy salinity organic pesticide fungicide neem spray dose"
+).split()
+
+def synthetic_corpus(n_documents: int, vocabulary_size: int = 20000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vocabulary = DOMAIN_TERMS + [f"term{i}" for i in range(vocabulary_size - len(DOMAIN_TERMS))]
+    # Zipf-like term frequencies, so common terms have long posting lists
+    probabilities = 1.0 / np.arange(1, len(vocabulary) + 1)
+    probabilities /= probabilities.sum()
+    lengths = rng.integers(20, 200, size=n_documents)
+    words = rng.choice(len(vocabulary), size=int(lengths.sum()), p=probabilities)
+    ends = np.cumsum(lengths)
+    for i, end in enumerate(ends):
+        document_words = words[end - lengths[i]:end]
+        yield {"source": "forum", "id": i, "title": f"Thread {i}"}, " ".join(vocabulary[w] for w in document_words)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark advisory retrieval")
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = [
+        " ".join(rng.choice(DOMAIN_TERMS, size=rng.integers(3, 10)))
+        for _ in range(args.queries)
+    ]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        started = time.perf_counter()
+        index = BM25Index(index_dir)
+        index.build(synthetic_corpus(args.documents))
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = BM25Index(index_dir)
+        load_s = time.perf_counter() - started
+
+        index.search(queries[0], k=args.k)  # warm-up
+        timings = np.empty(len(queries))
+        for i, query in enumerate(queries):
+            started = time.perf_counter()
+            index.search(query, k=args.k)
+            timings[i] = time.perf_counter() - started
+
+    print(f"Documents: {len(index)}, terms: {len(index.vocabulary)}, postings: {len(index.doc_ids)}")
+    print(f"Build: {build_s:.1f}s, load: {load_s * 1e3:.0f}ms")
+    print(
+        f"Query (k={args.k}) p50 {np.percentile(timings, 50) * 1e3:.2f}ms "
+        f"p95 {np.percentile(timings, 95) * 1e3:.2f}ms "
+        f"p99 {np.percentile(timings, 99) * 1e3:.2f}ms"
+    )
+
+if __name__ == "__main__":
+    main()
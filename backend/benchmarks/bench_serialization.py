@@ -0,0 +1,161 @@
+"""
+Benchmark: JSON rendering time and bytes on the wire for the largest payloads
+
+Builds representative payloads for the weather forecast, market prices and
+forum listing endpoints and reports, for each one:
+
+* time to render with the standard library and with orjson, plus the
+  ``jsonable_encoder`` pass FastAPI runs before either, and orjson on the
+  raw payload as ``fast_json_response`` does
+* body size raw, gzip-compressed and brotli-compressed
+* the same sizes with a typical ``?fields=`` selection applied
+
+Usage:
+    python benchmarks/bench_serialization.py [--repeats 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.compression import brotli, compress
+from app.core.config import settings
+from app.core.responses import AppJSONResponse, orjson, parse_fields, select_fields
+
+def forecast_payload(days: int = 5) -> dict:
+    start = datetime(2024, 6, 1)
+    rng = np.random.default_rng(0)
+    return {
+        "location": "Nashik",
+        "forecast_days": days,
+        "forecast": [
+            {
+                "datetime": start + timedelta(hours=3 * i),
+                "temperature": round(float(rng.normal(28, 4)), 2),
+                "feels_like": round(float(rng.normal(30, 4)), 2),
+                "temp_min": round(float(rng.normal(25, 3)), 2),
+                "temp_max": round(float(rng.normal(31, 3)), 2),
+                "humidity": int(rng.integers(40, 95)),
+                "pressure": int(rng.integers(995, 1020)),
+                "wind_speed": round(float(rng.gamma(2, 1.5)), 2),
+                "wind_direction": int(rng.integers(0, 360)),
+                "cloudiness": int(rng.integers(0, 100)),
+                "rainfall": round(float(rng.exponential(0.8)), 2),
+                "weather_condition": "Rain" if i % 3 == 0 else "Clouds",
+                "description": "light rain" if i % 3 == 0 else "scattered clouds"
+            }
+            for i in range(days * 8)
+        ]
+    }
+
+def market_payload(rows: int = 500) -> dict:
+    rng = np.random.default_rng(1)
+    recorded = datetime(2024, 6, 1, 9)
+    return {
+        "prices": [
+            {
+                "id": i,
+                "crop_id": int(rng.integers(1, 60)),
+                "location": f"Mandi {i % 40}",
+                "market_name": f"APMC Market {i % 40}",
+                "price_per_quintal": round(float(rng.uniform(800, 9000)), 2),
+                "price_per_kg": round(float(rng.uniform(8, 90)), 2),
+                "quality_grade": "ABC"[i % 3],
+                "trend": ("up", "down", "stable")[i % 3],
+                "price_change_percent": round(float(rng.normal(0, 4)), 2),
+                "recorded_at": recorded - timedelta(minutes=i),
+                "source": "e-NAM"
+            }
+            for i in range(rows)
+        ],
+        "total": rows
+    }
+
+def forum_payload(posts: int = 50) -> dict:
+    body = (
+        "Leaves on my tomato plants are curling and turning yellow from the edges. "
+        "I sprayed neem oil last week but the problem is spreading to the next row. "
+    ) * 6
+    created = datetime(2024, 6, 1)
+    return {
+        "posts": [
+            {
+                "id": i,
+                "user_id": 1000 + i,
+                "title": f"Yellowing leaves on tomato, week {i}",
+                "content": body,
+                "category": "Pest Control",
+                "tags": ["tomato", "leaf curl", "neem"],
+                "likes_count": i * 3,
+                "comments_count": i % 7,
+                "views_count": i * 41,
+                "is_pinned": i == 0,
+                "created_at": created + timedelta(hours=i)
+            }
+            for i in range(posts)
+        ],
+        "total": posts,
+        "page": 1
+    }
+
+PAYLOADS = {
+    "weather forecast (5 days)": (forecast_payload(), "location,forecast.datetime,forecast.temperature,forecast.rainfall"),
+    "market prices (500 rows)": (market_payload(), "prices.crop_id,prices.market_name,prices.price_per_quintal,prices.trend"),
+    "forum posts (50)": (forum_payload(), "posts.id,posts.title,posts.likes_count,posts.comments_count")
+}
+
+def time_call(fn, repeats: int) -> float:
+    fn()  # warm-up
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return float(np.percentile(timings, 50) * 1e6)
+
+def render(content, fast: bool) -> bytes:
+    settings.FAST_JSON_ENABLED = fast
+    return AppJSONResponse(content=content).body
+
+def sizes(body: bytes) -> str:
+    parts = [f"raw {len(body):>7}", f"gzip {len(compress(body, 'gzip', settings.COMPRESSION_GZIP_LEVEL)):>6}"]
+    if brotli is not None:
+        parts.append(f"br {len(compress(body, 'br', brotli_quality=settings.COMPRESSION_BROTLI_QUALITY)):>6}")
+    return "  ".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization and compression")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed; only the standard library path is measured")
+    if brotli is None:
+        print("brotli is not installed; brotli sizes are skipped")
+
+    for name, (payload, fields) in PAYLOADS.items():
+        encoded = jsonable_encoder(payload)
+        trimmed = select_fields(encoded, parse_fields(fields))
+
+        print(f"\n{name}")
+        print(f"  jsonable_encoder       {time_call(lambda: jsonable_encoder(payload), args.repeats):>9.1f}us")
+        print(f"  render (json)          {time_call(lambda: render(encoded, False), args.repeats):>9.1f}us")
+        if orjson is not None:
+            print(f"  render (orjson)        {time_call(lambda: render(encoded, True), args.repeats):>9.1f}us")
+            print(f"  render raw (orjson)    {time_call(lambda: render(payload, True), args.repeats):>9.1f}us  (fast_json_response, no encoder pass)")
+            expected = orjson.loads(render(encoded, False))
+            assert orjson.loads(render(encoded, True)) == expected
+            assert orjson.loads(render(payload, True)) == expected
+        print(f"  render (json) + gzip   {time_call(lambda: compress(render(encoded, False), 'gzip'), args.repeats // 4 or 1):>9.1f}us")
+        print(f"  bytes                  {sizes(render(encoded, False))}")
+        print(f"  bytes ?fields=         {sizes(render(trimmed, False))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Load driver: replay a mixed traffic profile against a running server
+
+Requests arrive open-loop as a Poisson process at --rps, the way independent
+farmers arrive, instead of each client waiting for its previous response. A
+server that falls behind therefore builds a queue rather than quietly lowering
+the offered load, and latency is measured from each request's scheduled
+arrival, so time spent queued counts (no coordinated omission).
+--max-in-flight caps outstanding requests; arrivals beyond it are reported
+as dropped.
+
+The mix is weighted per endpoint. Users, locations, crops and posts are drawn
+with the same skew the generator uses (active users, popular markets), and
+forum pages follow a power law with a long tail of deep offsets. Point it at a
+database loaded by app/jobs/generate_synthetic_data.py with matching --users,
+--locations, --forum-posts and --password.
+
+All traffic comes from one client IP and a handful of users, so start the
+server with RATE_LIMIT_ENABLED=False (or budgets raised above the offered
+load), and with ADMISSION_ENABLED=False unless load shedding is what is being
+measured; otherwise the run reports 429s and 503s instead of latency.
+
+Usage:
+    python -m app.jobs.generate_synthetic_data --users 50000 --forum-posts 500000 --market-prices 10000000
+    RATE_LIMIT_ENABLED=False ADMISSION_ENABLED=False gunicorn main:app -c gunicorn.conf.py
+    python benchmarks/load_driver.py --base-url http://localhost:8000 --rps 200 --duration 120
+    python benchmarks/load_driver.py --mix '{"forum_list": 5, "market_trend": 1}' --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.jobs.generate_synthetic_data import CROPS, ZipfSampler, location_names, synthetic_email
+from app.ml_models.crop_recommendation import ENCODED_CATEGORIES
+
+PAGE_SIZE = 20
+
+# Relative request rates, roughly as the production access logs split them
+DEFAULT_MIX = {
+    "forum_list": 20,
+    "forum_post": 10,
+    "forum_comments": 6,
+    "forum_trending": 6,
+    "market_prices": 12,
+    "market_trend": 8,
+    "market_analysis": 4,
+    "weather_current": 8,
+    "weather_forecast": 6,
+    "weather_historical": 2,
+    "crop_recommend": 4,
+    "pest_detections": 5,
+    "user_dashboard": 4,
+    "auth_me": 4,
+    "auth_login": 1
+}
+
+class TrafficProfile:
+    """Builds the (method, url, kwargs) of each endpoint in the mix"""
+
+    def __init__(self, args, rng: np.random.Generator, tokens: List[str]):
+        self.rng = rng
+        self.tokens = tokens
+        self.password = args.password
+        self.locations = location_names(args.locations)
+        self.location_sampler = ZipfSampler(len(self.locations))
+        self.user_sampler = ZipfSampler(args.users, exponent=0.9)
+        self.post_sampler = ZipfSampler(args.forum_posts, exponent=0.8)
+        self.page_sampler = ZipfSampler(max(1, math.ceil(args.forum_posts / PAGE_SIZE)), exponent=1.2)
+        self.image = None
+
+    def location(self) -> str:
+        return self.locations[int(self.location_sampler.sample(self.rng, 1)[0])]
+
+    def user_id(self) -> int:
+        return int(self.user_sampler.sample(self.rng, 1)[0]) + 1
+
+    def auth(self) -> Dict:
+        return {"headers": {"Authorization": f"Bearer {self.tokens[int(self.rng.integers(len(self.tokens)))]}"}} if self.tokens else {}
+
+    def page(self) -> Dict:
+        return {"skip": int(self.page_sampler.sample(self.rng, 1)[0]) * PAGE_SIZE, "limit": PAGE_SIZE}
+
+    def upload(self) -> bytes:
+        if self.image is None:
+            import cv2
+            image = self.rng.integers(0, 256, (960, 1280, 3), dtype=np.uint8)
+            self.image = cv2.imencode(".jpg", cv2.GaussianBlur(image, (9, 9), 0))[1].tobytes()
+        return self.image
+
+    def requests(self) -> Dict[str, Callable[[], tuple]]:
+        rng = self.rng
+        return {
+            "forum_list": lambda: ("GET", "/api/forum/posts", {"params": self.page()}),
+            "forum_post": lambda: ("GET", f"/api/forum/posts/{int(self.post_sampler.sample(rng, 1)[0]) + 1}", {}),
+            "forum_comments": lambda: ("GET", f"/api/forum/posts/{int(self.post_sampler.sample(rng, 1)[0]) + 1}/comments", {}),
+            "forum_trending": lambda: ("GET", "/api/forum/trending", {}),
+            "market_prices": lambda: ("GET", "/api/market/prices", {"params": {"location": self.location()}}),
+            "market_trend": lambda: (
+                "GET", f"/api/market/prices/{int(rng.integers(1, len(CROPS) + 1))}/trend",
+                {"params": {"days": int(rng.choice([7, 30, 90, 365]))}}
+            ),
+            "market_analysis": lambda: ("GET", f"/api/market/analysis/{self.location()}", {}),
+            "weather_current": lambda: ("GET", f"/api/weather/current/{self.location()}", {}),
+            "weather_forecast": lambda: ("GET", f"/api/weather/forecast/{self.location()}", {"params": {"resolution": "daily"}}),
+            "weather_historical": lambda: ("GET", f"/api/weather/historical/{self.location()}", {"params": {"days": int(rng.choice([7, 30, 90]))}}),
+            "crop_recommend": lambda: ("POST", "/api/crops/recommend", {"json": {
+                "user_id": self.user_id(),
+                "temperature": round(float(rng.uniform(12, 35)), 1),
+                "humidity": round(float(rng.uniform(40, 95)), 1),
+                "ph": round(float(rng.normal(6.8, 0.6)), 1),
+                "rainfall": round(float(rng.uniform(300, 2500)), 0),
+                # Only categories the model encodes, so requests measure inference rather than errors
+                "soil_type": str(rng.choice(ENCODED_CATEGORIES["soil_type"])),
+                "season": str(rng.choice(ENCODED_CATEGORIES["season"])),
+                "region": str(rng.choice(ENCODED_CATEGORIES["region"]))
+            }}),
+            "pest_detections": lambda: ("GET", "/api/pests/detections", {"params": self.page(), **self.auth()}),
+            "pest_detect": lambda: ("POST", "/api/pests/detect", {
+                "files": {"file": ("leaf.jpg", self.upload(), "image/jpeg")},
+                "data": {"location": self.location()},
+                **self.auth()
+            }),
+            "user_dashboard": lambda: ("GET", f"/api/users/dashboard/{self.user_id()}", self.auth()),
+            "auth_me": lambda: ("GET", "/api/auth/me", self.auth()),
+            "auth_login": lambda: ("POST", "/api/auth/login", {"json": {"email": synthetic_email(self.user_id()), "password": self.password}})
+        }
+
+def summarize(latencies: List[float], statuses: Dict[int, int], duration: float) -> Dict:
+    timings = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / duration, 2),
+        "errors": sum(count for status, count in statuses.items() if status >= 400 or status == 0),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "p99_ms": round(float(np.percentile(timings, 99)), 2),
+        "max_ms": round(float(timings.max()), 2)
+    }
+
+async def login_tokens(client, args) -> List[str]:
+    """Log a spread of users in once, up front; bcrypt would otherwise dominate the run"""
+    tokens = []
+    for user_id in range(1, min(args.login_users, args.users) + 1):
+        response = await client.post("/api/auth/login", json={"email": synthetic_email(user_id), "password": args.password})
+        if response.status_code == 200:
+            tokens.append(response.json()["access_token"])
+    if not tokens:
+        print("Warning: no user could log in; authenticated endpoints will see 401s")
+    return tokens
+
+async def drive(args, mix: Dict[str, float]) -> Dict:
+    import httpx
+
+    rng = np.random.default_rng(args.seed)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    dropped = 0
+    in_flight = 0
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        profile = TrafficProfile(args, rng, await login_tokens(client, args))
+        builders = profile.requests()
+        names = list(mix)
+        weights = np.array([mix[name] for name in names], dtype=np.float64)
+        weights /= weights.sum()
+
+        async def fire(name: str, request: tuple, scheduled: float):
+            nonlocal in_flight
+            method, url, kwargs = request
+            try:
+                status = (await client.request(method, url, **kwargs)).status_code
+            except httpx.HTTPError:
+                status = 0
+            finally:
+                in_flight -= 1
+            if scheduled >= measure_from:
+                latencies[name].append(time.perf_counter() - scheduled)
+                statuses[name][status] += 1
+
+        tasks = set()
+        started = time.perf_counter()
+        measure_from = started + args.warmup
+        deadline = measure_from + args.duration
+        next_arrival = started
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = names[int(rng.choice(len(names), p=weights))]
+            if in_flight >= args.max_in_flight:
+                dropped += next_arrival >= measure_from
+            else:
+                in_flight += 1
+                task = asyncio.create_task(fire(name, builders[name](), next_arrival))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_arrival += rng.exponential(1 / args.rps)
+        await asyncio.gather(*tasks)
+
+    endpoints = {name: summarize(latencies[name], statuses[name], args.duration) for name in names if latencies[name]}
+    overall_statuses: Dict[int, int] = defaultdict(int)
+    for counts in statuses.values():
+        for status, count in counts.items():
+            overall_statuses[status] += count
+    overall = summarize([value for values in latencies.values() for value in values], overall_statuses, args.duration)
+    return {"overall": {**overall, "offered_rps": args.rps, "dropped": dropped}, "endpoints": endpoints}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay mixed traffic against a running server")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=50.0, help="Offered request rate (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Outstanding requests before arrivals are dropped")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--mix", default=None, help='JSON weights, e.g. \'{"forum_list": 5, "pest_detect": 1}\'')
+    parser.add_argument("--users", type=int, default=10000, help="As passed to the generator")
+    parser.add_argument("--locations", type=int, default=200, help="As passed to the generator")
+    parser.add_argument("--forum-posts", type=int, default=100000, help="As passed to the generator")
+    parser.add_argument("--password", default="synthetic-password", help="As passed to the generator")
+    parser.add_argument("--login-users", type=int, default=20, help="Users whose tokens authenticated requests use")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    unknown = set(mix) - set(TrafficProfile(args, np.random.default_rng(), []).requests())
+    if unknown:
+        parser.error(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(drive(args, mix))
+
+    print(f"{'endpoint':<20} {'requests':>9} {'rps':>8} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, result in sorted(report["endpoints"].items(), key=lambda item: -item[1]["requests"]):
+        print(
+            f"{name:<20} {result['requests']:>9} {result['rps']:>8.1f} {result['errors']:>7} "
+            f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}ms"
+        )
+    overall = report["overall"]
+    print(
+        f"\n{overall['requests']} requests, {overall['rps']:.1f}/s achieved of {overall['offered_rps']:.1f}/s offered, "
+        f"{overall['errors']} errors, {overall['dropped']} dropped at the in-flight cap, "
+        f"p50 {overall['p50_ms']:.1f}ms p99 {overall['p99_ms']:.1f}ms"
+    )
+    limited = {status: overall["statuses"].get(str(status), 0) for status in (429, 503)}
+    if any(limited.values()):
+        print(
+            f"Warning: {limited[429]} rate-limited (429) and {limited[503]} shed (503) responses; "
+            "run the server with RATE_LIMIT_ENABLED=False and ADMISSION_ENABLED=False to measure latency"
+        )
+
+    if args.output:
+        report["meta"] = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "duration_s": args.duration,
+            "mix": mix
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Local stand-ins for the OpenWeather and market data APIs
+
+Each stub is a threaded HTTP server on 127.0.0.1 answering with deterministic
+payloads shaped like the real API, derived from the requested location, so
+benchmarks and scale tests run offline and see the same data every run. An
+optional fixed delay models upstream latency.
+
+Usage:
+    with StubUpstreams(latency_ms=20) as stubs:
+        os.environ["OPENWEATHER_BASE_URL"] = stubs.openweather_url
+        os.environ["MARKET_DATA_BASE_URL"] = stubs.market_url
+"""
+
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+FORECAST_START = 1717200000  # 2024-06-01 00:00 UTC
+CONDITIONS = ("Clear", "Clouds", "Rain", "Drizzle", "Thunderstorm")
+
+def location_rng(location: str) -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(location.strip().lower().encode()))
+
+def current_weather(location: str) -> Dict[str, Any]:
+    rng = location_rng(location)
+    condition = CONDITIONS[int(rng.integers(len(CONDITIONS)))]
+    return {
+        "name": location,
+        "dt": FORECAST_START,
+        "coord": {"lat": round(float(rng.uniform(8, 34)), 4), "lon": round(float(rng.uniform(68, 97)), 4)},
+        "main": {
+            "temp": round(float(rng.normal(28, 4)), 2),
+            "feels_like": round(float(rng.normal(30, 4)), 2),
+            "humidity": int(rng.integers(35, 95)),
+            "pressure": int(rng.integers(995, 1020))
+        },
+        "wind": {"speed": round(float(rng.gamma(2, 1.5)), 2), "deg": int(rng.integers(0, 360))},
+        "rain": {"1h": round(float(rng.exponential(0.5)), 2)} if condition in ("Rain", "Drizzle") else {},
+        "clouds": {"all": int(rng.integers(0, 100))},
+        "visibility": int(rng.integers(2000, 10000)),
+        "weather": [{"main": condition, "description": condition.lower()}]
+    }
+
+def forecast(location: str, count: int) -> Dict[str, Any]:
+    rng = location_rng(location)
+    entries = []
+    for i in range(count):
+        condition = CONDITIONS[int(rng.integers(len(CONDITIONS)))]
+        temperature = float(rng.normal(28, 4))
+        entries.append({
+            "dt": FORECAST_START + i * 3 * 3600,
+            "main": {
+                "temp": round(temperature, 2),
+                "feels_like": round(temperature + float(rng.normal(1.5, 1)), 2),
+                "temp_min": round(temperature - float(rng.uniform(0, 2)), 2),
+                "temp_max": round(temperature + float(rng.uniform(0, 2)), 2),
+                "humidity": int(rng.integers(35, 95)),
+                "pressure": int(rng.integers(995, 1020))
+            },
+            "wind": {"speed": round(float(rng.gamma(2, 1.5)), 2), "deg": int(rng.integers(0, 360))},
+            "clouds": {"all": int(rng.integers(0, 100))},
+            "pop": round(float(rng.uniform(0, 1)), 2),
+            "rain": {"3h": round(float(rng.exponential(1.0)), 2)} if condition in ("Rain", "Thunderstorm") else {},
+            "weather": [{"main": condition, "description": condition.lower()}]
+        })
+    return {"city": {"name": location, "timezone": 19800}, "cnt": count, "list": entries}
+
+def market_prices(location: str, crops: int = 20) -> list:
+    rng = location_rng(location)
+    return [
+        {
+            "crop_id": crop_id,
+            "location": location,
+            "price_per_quintal": round(float(rng.uniform(1200, 8000)), 2),
+            "market_name": f"{location} APMC",
+            "quality_grade": "A",
+            "trend": ("up", "down", "stable")[int(rng.integers(3))],
+            "price_change_percent": round(float(rng.normal(0, 3)), 2),
+            "source": "stub"
+        }
+        for crop_id in range(1, crops + 1)
+    ]
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    # Headers and body are separate writes; with Nagle on, each response stalls on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        location = params.get("q") or params.get("location") or "Pune"
+
+        if url.path.endswith("/weather"):
+            body = current_weather(location)
+        elif url.path.endswith("/forecast"):
+            body = forecast(location, int(params.get("cnt", 40)))
+        elif url.path.endswith("/prices"):
+            body = market_prices(location)
+        else:
+            self.send_error(404)
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubUpstreams:
+    """Start the OpenWeather and market stubs for the duration of a ``with`` block"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        handler = type("Handler", (StubHandler,), {"latency": latency_ms / 1000})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.openweather_url = f"{base}/data/2.5"
+        self.market_url = base
+
+    def __enter__(self) -> "StubUpstreams":
+        threading.Thread(target=self.server.serve_forever, name="upstream-stubs", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,67 @@
+"""
+Production launcher: prefork uvicorn workers sharing preloaded models
+
+    gunicorn -c gunicorn.conf.py main:app
+
+``preload_app`` imports the application and loads the crop RandomForest and
+pandas once in the master. Workers are forked afterwards and share those pages
+copy-on-write. The compiled crop forest and the pest similarity index are
+memory-mapped, so they stay shared even across worker restarts.
+
+TensorFlow is never started in the master: loading the pest CNN creates its
+runtime and thread pools, and a forked worker would inherit a runtime whose
+threads no longer exist. Each worker builds, traces and warms up the pest
+model in the application lifespan, after the fork, where its thread settings
+also take effect. Set ``WEB_PRELOAD_APP=False`` to load everything per worker.
+"""
+
+import gc
+import glob
+import logging
+import os
+import sys
+
+from app.core.config import settings
+from app.core.memory import format_memory, process_memory
+
+bind = settings.WEB_BIND
+workers = settings.WEB_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = settings.WEB_PRELOAD_APP
+timeout = settings.WEB_WORKER_TIMEOUT_SECONDS
+graceful_timeout = settings.WEB_WORKER_TIMEOUT_SECONDS
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS // 10
+
+logger = logging.getLogger("gunicorn.error")
+
+def on_starting(server):
+    if settings.PUSH_BACKEND == "memory" and workers > 1:
+        logger.warning(
+            "PUSH_BACKEND=memory with several workers: real-time events only reach clients "
+            "connected to the worker that raised them; set PUSH_BACKEND=redis"
+        )
+    # Samples left by a previous run would be aggregated into /metrics
+    if settings.METRICS_MULTIPROC_DIR:
+        for path in glob.glob(os.path.join(settings.METRICS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+
+def when_ready(server):
+    if preload_app:
+        from main import preload_fork_safe_models
+        preload_fork_safe_models()
+        if "tensorflow" in sys.modules:
+            logger.warning("TensorFlow was imported in the master; workers may hang on their first inference")
+    # Move everything loaded so far out of the collector's reach: a GC pass in
+    # a worker would otherwise write to every object header and un-share the
+    # pages holding them
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Master loaded: {format_memory(process_memory())}")
+
+def post_worker_init(worker):
+    logger.info(f"Worker {worker.age} started: {format_memory(process_memory())}")
+
+def child_exit(server, worker):
+    from app.core.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
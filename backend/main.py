@@ -3,57 +3,170 @@ FARMER Backend API
 Agricultural Intelligence Platform with ML Models
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import logging
 import uvicorn
 import os
 from dotenv import load_dotenv
 
-# Import routers
-from app.routers import auth, users, crops, pests, weather, market, forum, advisory
-from app.database import engine, Base
+from app.database import engine
+from app.database.migrations import upgrade_schema
 from app.core.config import settings
+from app.core.pubsub import broker
+from app.core.response_cache import response_cache
+from app.core.responses import AppJSONResponse, FieldSelectionMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.memory import format_memory, process_memory
+from app.core.admission import AdmissionMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from app.core.metrics import MetricsMiddleware, instrument_engine, render_latest
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing, trace_engine
+from app.services.alert_engine import run_alert_engine_periodically
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Router modules with their prefix and tag
+ROUTERS = {
+    "auth": ("/api/auth", "Authentication"),
+    "users": ("/api/users", "Users"),
+    "crops": ("/api/crops", "Crops"),
+    "pests": ("/api/pests", "Pest Detection"),
+    "weather": ("/api/weather", "Weather"),
+    "market": ("/api/market", "Market Data"),
+    "forum": ("/api/forum", "Forum"),
+    "advisory": ("/api/advisory", "AI Advisory"),
+    "realtime": ("/api/realtime", "Real-time"),
+    "admin": ("/api/admin", "Admin")
+}
+
+# Routers mounted per deployment role; only mounted routers are imported, so
+# "api" nodes never load TensorFlow, OpenCV, pandas or scikit-learn
+ROLE_ROUTERS = {
+    "all": list(ROUTERS),
+    "api": [name for name in ROUTERS if name not in ("crops", "pests")],
+    "ml": ["crops", "pests", "admin"]
+}
+
+def enabled_routers():
+    if settings.APP_ROUTERS:
+        unknown = set(settings.APP_ROUTERS) - set(ROUTERS)
+        if unknown:
+            raise ValueError(f"Unknown routers in APP_ROUTERS: {', '.join(sorted(unknown))}")
+        return list(settings.APP_ROUTERS)
+    if settings.APP_ROLE not in ROLE_ROUTERS:
+        raise ValueError(f"Unknown APP_ROLE {settings.APP_ROLE!r}, expected one of {', '.join(ROLE_ROUTERS)}")
+    return ROLE_ROUTERS[settings.APP_ROLE]
+
+routers = {name: importlib.import_module(f"app.routers.{name}") for name in enabled_routers()}
+
+def preload_fork_safe_models():
+    """Load the models that may be shared across ``fork``: nothing here starts TensorFlow"""
+    if "crops" in routers:
+        routers["crops"].crop_model.get()
+
+def preload_models():
+    """Load the ML models of the mounted routers without running inference"""
+    preload_fork_safe_models()
+    # Builds and traces the TensorFlow model, so only ever after the fork
+    if "pests" in routers:
+        routers["pests"].pest_model.get()
+
 # Create database tables
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    # Creates missing tables and adds columns introduced since the database was created
+    upgrade_schema(engine)
+    # Runs before the server accepts requests, so readiness implies loaded, warm models
+    await run_in_threadpool(preload_models)
+    if settings.PEST_WARMUP_ENABLED and "pests" in routers:
+        timings = await run_in_threadpool(routers["pests"].pest_model.warm_up)
+        logger.info(f"Pest model warm-up (ms per batch size): {timings}")
+    logger.info(f"Worker ready: {format_memory(process_memory())}")
+    await broker.start()
+    alert_task = None
+    if settings.ALERT_ENGINE_INTERVAL_MINUTES > 0:
+        alert_task = asyncio.create_task(run_alert_engine_periodically(settings.ALERT_ENGINE_INTERVAL_MINUTES))
     yield
     # Shutdown
-    pass
+    if alert_task is not None:
+        alert_task.cancel()
+    if "crops" in routers and routers["crops"].crop_model.loaded:
+        routers["crops"].crop_model.save_lookup_table()
+    await response_cache.close()
+    await rate_limiter.close()
+    await broker.stop()
+    shutdown_tracing()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="FARMER API",
     description="Agricultural Intelligence Platform with ML Models",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=AppJSONResponse
 )
 
-# CORS middleware
+# ?fields= selection for JSON responses, then compression of the final body
+app.add_middleware(FieldSelectionMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+# Opt-in per-request CPU profiles (X-Profile: 1 with the admin token)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Per-lane concurrency limits and load shedding, before any work is done for
+# the request; outside it only CORS, metrics and tracing, so shed 503s are recorded
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+# Over-quota clients are turned away before they can occupy an admission slot
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# CORS outside the limiters, so preflights are never limited and 429/503
+# rejections still carry Access-Control-* headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000"],  # Frontend URLs
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Trace-Id", "Retry-After",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy"
+    ],
 )
 
+# Outside every middleware but tracing, so request latency includes them all
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
+# Server span around everything else, with child spans for SQL statements
+setup_tracing()
+app.add_middleware(TracingMiddleware)
+trace_engine(engine)
+
 # Include routers
-app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
-app.include_router(users.router, prefix="/api/users", tags=["Users"])
-app.include_router(crops.router, prefix="/api/crops", tags=["Crops"])
-app.include_router(pests.router, prefix="/api/pests", tags=["Pest Detection"])
-app.include_router(weather.router, prefix="/api/weather", tags=["Weather"])
-app.include_router(market.router, prefix="/api/market", tags=["Market Data"])
-app.include_router(forum.router, prefix="/api/forum", tags=["Forum"])
-app.include_router(advisory.router, prefix="/api/advisory", tags=["AI Advisory"])
+for name, module in routers.items():
+    prefix, tag = ROUTERS[name]
+    app.include_router(module.router, prefix=prefix, tags=[tag])
 
 @app.get("/")
 async def root():
@@ -65,7 +178,12 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "FARMER Backend"}
+    return {"status": "healthy", "service": "FARMER Backend", "role": settings.APP_ROLE}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,109 @@
+"""
+Tests for admission lanes and route classification
+"""
+
+import asyncio
+
+from app.core.admission import Lane, build_lanes, classify
+
+def test_classify_routes():
+    assert classify("GET", "/api/health") == "critical"
+    assert classify("GET", "/api/realtime/events") is None
+    assert classify("POST", "/api/pests/detect") == "ml"
+    assert classify("POST", "/api/advisory/chat") == "heavy"
+    assert classify("POST", "/api/advisory/chat/stream") == "heavy"
+    assert classify("GET", "/api/advisory/chat") == "default"
+    assert classify("GET", "/api/forum/posts") == "default"
+
+def test_build_lanes_keeps_critical_unlimited():
+    lanes = build_lanes({"critical": {"concurrency": 1, "queue": 0, "timeout": 1}, "ml": {"concurrency": 2}})
+    assert lanes["critical"].concurrency == 0
+    assert lanes["ml"].concurrency == 2
+    assert lanes["default"].concurrency == 0
+
+def test_unlimited_lane_admits_everything():
+    async def run():
+        lane = Lane("open", 0, 0, 0)
+        results = [await lane.acquire() for _ in range(100)]
+        return results, lane.active
+
+    results, active = asyncio.run(run())
+    assert results == [None] * 100
+    assert active == 100
+
+def test_queue_full_is_shed():
+    async def run():
+        lane = Lane("ml", 1, 1, 10.0)
+        assert await lane.acquire() is None
+        waiter = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0)
+        shed = await lane.acquire()
+        lane.release(0.01)
+        return shed, await waiter, lane.active
+
+    shed, handed_over, active = asyncio.run(run())
+    assert shed == "queue_full"
+    assert handed_over is None
+    assert active == 1
+
+def test_expected_wait_beyond_timeout_is_shed():
+    async def run():
+        lane = Lane("heavy", 1, 10, 1.0)
+        lane.service_time = 5.0
+        assert await lane.acquire() is None
+        return await lane.acquire()
+
+    assert asyncio.run(run()) == "deadline"
+
+def test_waiter_times_out():
+    async def run():
+        lane = Lane("heavy", 1, 10, 0.05)
+        lane.service_time = 0.001
+        assert await lane.acquire() is None
+        reason = await lane.acquire()
+        return reason, len(lane.waiters), lane.active
+
+    assert asyncio.run(run()) == ("timeout", 0, 1)
+
+def test_release_hands_slots_over_in_order():
+    async def run():
+        lane = Lane("ml", 1, 5, 10.0)
+        await lane.acquire()
+        order = []
+
+        async def wait(name):
+            await lane.acquire()
+            order.append(name)
+
+        tasks = [asyncio.create_task(wait(name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        for _ in range(3):
+            lane.release(0.01)
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        lane.release(0.01)
+        return order, lane.active
+
+    assert asyncio.run(run()) == (["a", "b", "c"], 0)
+
+def test_cancelled_waiter_passes_its_slot_on():
+    async def run():
+        lane = Lane("ml", 1, 5, 10.0)
+        await lane.acquire()
+        first = asyncio.create_task(lane.acquire())
+        second = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0)
+        # The slot is handed to the first waiter, which is cancelled before it runs
+        lane.release(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        return await second, lane.active, len(lane.waiters)
+
+    assert asyncio.run(run()) == (None, 1, 0)
+
+def test_service_time_tracks_releases():
+    lane = Lane("ml", 1, 0, 10.0)
+    lane.active = 1
+    lane.release(11.0)
+    assert lane.service_time == 1.0 + 0.2 * (11.0 - 1.0)
+    assert lane.active == 0
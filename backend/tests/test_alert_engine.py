@@ -0,0 +1,180 @@
+"""
+Tests for batched weather alert rule evaluation and storage
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database.connection import Base
+from app.models.user import User
+from app.models.weather import WeatherAlert, WeatherAlertRule
+from app.services import alert_engine
+from app.services.alert_engine import DEFAULT_RULES, METRIC_INDEX, METRICS, RuleChunk, WeatherAlertEngine
+from app.services.notification_service import NotificationSender
+
+class RecordingSender(NotificationSender):
+    def __init__(self):
+        self.sent = []
+
+    def send_batch(self, notifications):
+        self.sent.extend(notifications)
+        return len(notifications)
+
+@pytest.fixture
+def db(monkeypatch):
+    # Invalidation reaches Redis; nothing here reads the caches it drops
+    monkeypatch.setattr(alert_engine, "invalidate_dashboard", lambda *args, **kwargs: None)
+    monkeypatch.setattr(alert_engine, "invalidate_advisory_context", lambda *args, **kwargs: None)
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[User.__table__, WeatherAlert.__table__, WeatherAlertRule.__table__])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def add_user(db, user_id, location="Pune", is_active=True):
+    db.add(User(
+        id=user_id,
+        email=f"user{user_id}@example.com",
+        username=f"user{user_id}",
+        hashed_password="x",
+        location=location,
+        is_active=is_active
+    ))
+
+def add_rule(db, user_id, metric="rainfall_total", comparator="above", threshold=10.0, alert_type="Heavy Rain", is_active=True):
+    db.add(WeatherAlertRule(
+        user_id=user_id,
+        metric=metric,
+        comparator=comparator,
+        threshold=threshold,
+        alert_type=alert_type,
+        severity="High",
+        is_active=is_active
+    ))
+
+def metrics_row(**values):
+    row = np.zeros(len(METRICS))
+    for name, value in values.items():
+        row[METRIC_INDEX[name]] = value
+    return row
+
+def rule_pairs(chunks):
+    return sorted(
+        (int(user_id), alert_type)
+        for chunk in chunks
+        for user_id, alert_type in zip(chunk.user_ids, chunk.alert_types)
+    )
+
+def test_evaluate_compares_above_and_below_and_ignores_missing_forecasts():
+    matrix = np.vstack([
+        metrics_row(rainfall_total=60.0, temperature_min=2.0),
+        np.full(len(METRICS), np.nan)
+    ])
+    rainfall, frost = METRIC_INDEX["rainfall_total"], METRIC_INDEX["temperature_min"]
+    chunk = RuleChunk(
+        user_ids=np.array([1, 1, 2, 3, 3]),
+        location_index=np.array([0, 0, 0, 1, 1]),
+        metric_index=np.array([rainfall, frost, rainfall, rainfall, frost]),
+        above=np.array([True, False, True, True, False]),
+        thresholds=np.array([50.0, 4.0, 70.0, 50.0, 4.0]),
+        alert_types=np.array(["Heavy Rain", "Frost", "Heavy Rain", "Heavy Rain", "Frost"], dtype=object),
+        severities=np.array(["High"] * 5, dtype=object)
+    )
+
+    triggered, values = chunk.evaluate(matrix)
+    assert triggered.tolist() == [True, True, False, False, False]
+    assert values[:3].tolist() == [60.0, 2.0, 60.0]
+    assert np.isnan(values[3:]).all()
+
+def test_defaults_apply_only_to_users_without_active_rules(db):
+    for user_id in (1, 2, 3):
+        add_user(db, user_id)
+    add_user(db, 4, location="Nowhere")
+    add_user(db, 5, is_active=False)
+    add_rule(db, 1, alert_type="Own Rule")
+    add_rule(db, 3, alert_type="Paused", is_active=False)
+    db.commit()
+
+    engine = WeatherAlertEngine(db, RecordingSender())
+    pairs = rule_pairs(engine.iter_rule_chunks({"pune": 0}))
+
+    defaults = sorted(rule[3] for rule in DEFAULT_RULES)
+    assert pairs == sorted(
+        [(1, "Own Rule")]
+        + [(2, alert_type) for alert_type in defaults]
+        + [(3, alert_type) for alert_type in defaults]
+    )
+
+def test_chunks_respect_the_chunk_size_without_losing_rules(db):
+    for user_id in range(1, 5):
+        add_user(db, user_id)
+    for threshold in (1.0, 2.0, 3.0):
+        add_rule(db, 1, threshold=threshold, alert_type=f"Rule {threshold:g}")
+    add_rule(db, 2, alert_type="Own Rule")
+    db.commit()
+
+    engine = WeatherAlertEngine(db, RecordingSender(), chunk_size=2)
+    chunks = list(engine.iter_rule_chunks({"pune": 0}))
+
+    # Own rules two at a time, then one default user (five rules) per chunk
+    assert [len(chunk) for chunk in chunks] == [2, 2, len(DEFAULT_RULES), len(DEFAULT_RULES)]
+    assert rule_pairs(chunks) == sorted(
+        [(1, "Rule 1"), (1, "Rule 2"), (1, "Rule 3"), (2, "Own Rule")]
+        + [(user_id, rule[3]) for user_id in (3, 4) for rule in DEFAULT_RULES]
+    )
+
+@pytest.mark.parametrize("chunk_size", [1, 10000])
+def test_duplicate_active_alerts_are_skipped_within_and_across_chunks(db, chunk_size):
+    for user_id in (1, 2):
+        add_user(db, user_id)
+        # Two rules of the same type that both trigger
+        add_rule(db, user_id, threshold=10.0)
+        add_rule(db, user_id, threshold=20.0)
+    db.add(WeatherAlert(
+        user_id=2,
+        location="Pune",
+        alert_type="Heavy Rain",
+        severity="High",
+        message="already raised",
+        end_date=datetime.utcnow() + timedelta(hours=1),
+        is_active=True
+    ))
+    db.commit()
+
+    sender = RecordingSender()
+    engine = WeatherAlertEngine(db, sender, chunk_size=chunk_size)
+    matrix = metrics_row(rainfall_total=30.0)[np.newaxis]
+    stats = engine.evaluate_and_store(["pune"], matrix, {"pune": "Pune"})
+
+    assert stats["rules_evaluated"] == 4
+    assert stats["alerts_created"] == 1
+    assert stats["duplicates_skipped"] == 3
+    assert [(n["user_id"], n["alert_type"]) for n in sender.sent] == [(1, "Heavy Rain")]
+    assert db.query(WeatherAlert).filter(WeatherAlert.user_id == 1).count() == 1
+
+def test_a_malformed_forecast_leaves_only_its_location_missing(monkeypatch):
+    class Summary:
+        temp_max = temp_min = rainfall = wind_speed = humidity = rain_probability = np.array([1.0] * 16)
+
+        def __len__(self):
+            return 16
+
+    async def get_forecast_summary(location, days):
+        if location == "Broken":
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return Summary()
+
+    monkeypatch.setattr(alert_engine, "get_forecast_summary", get_forecast_summary)
+    engine = WeatherAlertEngine(None, RecordingSender())
+    keys, matrix = asyncio.run(engine.fetch_metrics({"pune": "Pune", "broken": "Broken"}))
+
+    assert keys == ["pune", "broken"]
+    assert not np.isnan(matrix[0]).any()
+    assert np.isnan(matrix[1]).all()
@@ -0,0 +1,76 @@
+"""
+Tests for response compression and the ETags of compressed representations
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding, decoded_etag, encoded_etag
+from app.core.response_cache import cached_response, response_cache
+
+ROWS = [{"crop": f"crop{i}", "price": i * 10} for i in range(200)]
+
+@pytest.fixture
+def client(monkeypatch):
+    # In-process cache only
+    monkeypatch.setattr(response_cache, "redis", None)
+    monkeypatch.setattr(response_cache, "redis_retry_at", float("inf"))
+    response_cache.l1.clear()
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/prices")
+    @cached_response("compression_test")
+    async def prices():
+        return ROWS
+
+    return TestClient(app)
+
+def test_choose_encoding_honours_quality():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("") is None
+
+def test_encoded_etags_round_trip():
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert decoded_etag('"abc-br"') == '"abc"'
+    assert decoded_etag('"abc"') == '"abc"'
+    assert encoded_etag('W/"abc"', "gzip") == 'W/"abc"'
+
+def test_compressed_body_gets_its_own_etag(client):
+    identity = client.get("/prices", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/prices", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in identity.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.json() == identity.json() == ROWS
+    assert compressed.headers["etag"] == encoded_etag(identity.headers["etag"], "gzip")
+    assert "Accept-Encoding" in compressed.headers["vary"]
+
+def test_revalidating_a_compressed_body_returns_304(client):
+    etag = client.get("/prices", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    response = client.get("/prices", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    # The identity tag still validates the identity body
+    identity_etag = decoded_etag(etag)
+    response = client.get("/prices", headers={"Accept-Encoding": "identity", "If-None-Match": identity_etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == identity_etag
+
+def test_small_bodies_are_not_compressed():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    response = TestClient(app).get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
@@ -0,0 +1,143 @@
+"""
+Tests for concurrent, per-section dashboard loading
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.cache import SharedVersions, TTLCache
+from app.core.config import settings
+from app.services import dashboard_service
+from app.services.dashboard_service import DashboardService
+
+class FakeSessions:
+    """Session factory counting how many sessions are open at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = 0
+        self.peak = 0
+
+    def __call__(self):
+        with self.lock:
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+        return self
+
+    def close(self):
+        with self.lock:
+            self.open -= 1
+
+# Versions without Redis: every read is None, as when Redis is unreachable
+NO_REDIS = SharedVersions(None, 60, "dashboard")
+
+class FakeVersions:
+    """Stand-in for the Redis versions another worker can bump"""
+
+    def __init__(self):
+        self.version = 0
+
+    def get(self, user_id):
+        return self.version
+
+    def bump(self, user_id):
+        self.version += 1
+
+@pytest.fixture
+def loaders(monkeypatch):
+    loaders = {}
+    monkeypatch.setattr(dashboard_service, "SECTION_LOADERS", loaders)
+    monkeypatch.setattr(settings, "DASHBOARD_SECTION_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(settings, "DASHBOARD_MAX_CONCURRENT_SECTIONS", 2)
+    monkeypatch.setattr(settings, "DASHBOARD_REQUEST_TIMEOUT_SECONDS", 1.0)
+    return loaders
+
+def sleeper(seconds, value):
+    def load(db, user_id):
+        time.sleep(seconds)
+        return value
+    return load
+
+def test_sections_load_concurrently_within_the_slot_limit(loaders):
+    for i in range(6):
+        loaders[f"s{i}"] = sleeper(0.05, i)
+    sessions = FakeSessions()
+    service = DashboardService(sessions, TTLCache(), NO_REDIS)
+
+    dashboard = asyncio.run(service.get_dashboard(1))
+
+    assert [dashboard[f"s{i}"] for i in range(6)] == list(range(6))
+    assert dashboard["failed_sections"] == {}
+    # Two sections overlapped, and never more
+    assert sessions.peak == 2
+
+def test_slow_section_times_out_without_failing_the_rest(loaders):
+    loaders["fast"] = sleeper(0, "ok")
+    loaders["slow"] = sleeper(0.5, "late")
+    cache = TTLCache()
+    service = DashboardService(FakeSessions(), cache, NO_REDIS)
+
+    dashboard = asyncio.run(service.get_dashboard(1))
+    assert dashboard["fast"] == "ok"
+    assert dashboard["failed_sections"] == {"slow": "timeout"}
+
+def test_hung_sections_holding_every_slot_do_not_stall_the_dashboard(loaders):
+    release = threading.Event()
+    def hang(db, user_id):
+        release.wait(5)
+        return "late"
+    loaders["hung1"] = hang
+    loaders["hung2"] = hang
+    loaders["waiting"] = sleeper(0, "ok")
+    service = DashboardService(FakeSessions(), TTLCache(), NO_REDIS)
+
+    async def timed():
+        start = time.monotonic()
+        dashboard = await service.get_dashboard(1)
+        return dashboard, time.monotonic() - start
+
+    try:
+        dashboard, elapsed = asyncio.run(timed())
+    finally:
+        release.set()
+    assert dashboard["failed_sections"] == {"hung1": "timeout", "hung2": "timeout", "waiting": "timeout"}
+    assert elapsed < settings.DASHBOARD_REQUEST_TIMEOUT_SECONDS + 0.5
+
+def test_failed_section_falls_back_to_stale_value(loaders):
+    def broken(db, user_id):
+        raise RuntimeError("database down")
+    loaders["profile"] = broken
+    cache = TTLCache()
+    cache.set(("profile", 1, None), {"name": "old"}, -1)
+    service = DashboardService(FakeSessions(), cache, NO_REDIS)
+
+    dashboard = asyncio.run(service.get_dashboard(1))
+    assert dashboard["profile"] == {"name": "old"}
+    assert dashboard["stale_sections"] == ["profile"]
+    assert dashboard["failed_sections"] == {}
+
+def test_cached_sections_skip_the_database(loaders):
+    loaders["profile"] = sleeper(0, {"name": "new"})
+    sessions = FakeSessions()
+    service = DashboardService(sessions, TTLCache(), NO_REDIS)
+    asyncio.run(service.get_dashboard(1))
+    assert sessions.peak == 1
+
+    sessions.peak = 0
+    assert asyncio.run(service.get_dashboard(1))["profile"] == {"name": "new"}
+    assert sessions.peak == 0
+
+def test_a_version_bump_from_another_worker_reloads_sections(loaders):
+    loaders["profile"] = sleeper(0, {"name": "new"})
+    sessions = FakeSessions()
+    versions = FakeVersions()
+    service = DashboardService(sessions, TTLCache(), versions)
+    asyncio.run(service.get_dashboard(1))
+
+    versions.bump(1)
+    sessions.peak = 0
+    asyncio.run(service.get_dashboard(1))
+    assert sessions.peak == 1
@@ -0,0 +1,100 @@
+"""
+Tests for the vectorised forecast summaries
+"""
+
+import pytest
+
+from app.services.forecast_service import HOURS_PER_STEP, ForecastSummary
+
+DAY = 86400
+
+def entry(dt, temp, rain=0.0, wind=1.0, pop=0.0, humidity=60, condition="Clear", temp_min=None, temp_max=None):
+    return {
+        "dt": dt,
+        "main": {
+            "temp": temp,
+            "temp_min": temp if temp_min is None else temp_min,
+            "temp_max": temp if temp_max is None else temp_max,
+            "humidity": humidity
+        },
+        "wind": {"speed": wind},
+        "rain": {"3h": rain} if rain else {},
+        "pop": pop,
+        "weather": [{"main": condition}]
+    }
+
+def forecast(entries, timezone_offset=0):
+    return {"city": {"name": "Pune", "timezone": timezone_offset}, "list": entries}
+
+def test_daily_reductions():
+    day0, day1 = 10 * DAY, 11 * DAY
+    summary = ForecastSummary(forecast([
+        entry(day0, 20.0, temp_min=18.0, humidity=50, condition="Clear"),
+        entry(day0 + 3 * 3600, 24.0, temp_max=26.0, rain=1.5, humidity=70, condition="Rain", pop=0.4),
+        entry(day0 + 6 * 3600, 22.0, rain=2.0, humidity=90, condition="Rain", wind=6.0),
+        entry(day1, 30.0, temp_min=28.0, temp_max=33.0, condition="Clouds")
+    ]), base_temperature=10.0)
+
+    daily = summary.daily()
+    assert [day["date"] for day in daily] == ["1970-01-11", "1970-01-12"]
+    first, second = daily
+    assert first["temperature_min"] == 18.0
+    assert first["temperature_max"] == 26.0
+    assert first["temperature_mean"] == 22.0
+    assert first["humidity"] == 70.0
+    assert first["rainfall_total"] == 3.5
+    assert first["rainfall_probability"] == 0.4
+    assert first["wind_speed_max"] == 6.0
+    assert first["weather_condition"] == "Rain"
+    assert first["growing_degree_days"] == (26.0 + 18.0) / 2 - 10.0
+    assert second["growing_degree_days"] == (33.0 + 28.0) / 2 - 10.0
+    assert second["weather_condition"] == "Clouds"
+
+def test_days_follow_the_location_timezone():
+    # 22:00 and 23:00 UTC fall on the next local day at UTC+5:30
+    entries = [entry(10 * DAY + 22 * 3600, 20.0), entry(10 * DAY + 23 * 3600, 20.0)]
+    assert len(ForecastSummary(forecast(entries)).daily()) == 1
+    assert [day["date"] for day in ForecastSummary(forecast(entries, 19800)).daily()] == ["1970-01-12"]
+    assert len(ForecastSummary(forecast([entries[0], entry(11 * DAY + 1800, 20.0)], 19800)).daily()) == 1
+
+def test_growing_degree_days_never_negative():
+    summary = ForecastSummary(forecast([entry(10 * DAY, 4.0, temp_min=2.0, temp_max=6.0)]), base_temperature=10.0)
+    assert summary.daily()[0]["growing_degree_days"] == 0.0
+
+def test_spray_windows_need_a_dry_following_step():
+    base = 10 * DAY
+    summary = ForecastSummary(forecast([
+        entry(base, 20.0),
+        entry(base + 3 * 3600, 20.0),
+        entry(base + 6 * 3600, 20.0),
+        entry(base + 9 * 3600, 20.0, rain=0.5),
+        entry(base + 12 * 3600, 20.0, wind=8.0),
+        entry(base + 15 * 3600, 20.0)
+    ]))
+
+    assert summary.spray_ok.tolist() == [True, True, False, False, False, True]
+    windows = summary.spray_windows()
+    assert [window["hours"] for window in windows] == [2 * HOURS_PER_STEP, HOURS_PER_STEP]
+    assert windows[0]["end"].timestamp() == base + 6 * 3600
+    assert summary.daily()[0]["spray_hours"] == 3 * HOURS_PER_STEP
+
+def test_summary_totals():
+    base = 10 * DAY
+    entries = [entry(base + step * 3 * 3600, 20.0, rain=3.0 if step in (1, 9) else 0.0) for step in range(16)]
+    summary = ForecastSummary(forecast(entries)).summary()
+    assert summary["days"] == 2
+    assert summary["rainfall_total"] == 6.0
+    assert summary["rainfall_next_24h"] == 3.0
+    assert summary["rainy_days"] == 2
+
+def test_empty_forecast():
+    summary = ForecastSummary(forecast([]))
+    assert len(summary) == 0
+    assert summary.daily() == []
+    assert summary.summary() == {"days": 0}
+
+@pytest.mark.parametrize("resolution", ["3h", "daily", "summary"])
+def test_render_resolutions(resolution):
+    summary = ForecastSummary(forecast([entry(10 * DAY, 20.0), entry(10 * DAY + 3 * 3600, 21.0)]))
+    rendered = summary.render(resolution)
+    assert rendered == {"3h": summary.three_hourly, "daily": summary.daily, "summary": summary.summary}[resolution]()
@@ -0,0 +1,65 @@
+"""
+Tests for the compiled random forest evaluator
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app.ml_models.forest_compiler import CompiledForest
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1)
+    return X, y
+
+@pytest.fixture(scope="module")
+def forest(data):
+    X, y = data
+    return RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+
+def test_batch_probabilities_are_identical(forest, data):
+    X, _ = data
+    compiled = CompiledForest.from_sklearn(forest)
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+
+def test_single_rows_are_identical(forest, data):
+    X, _ = data
+    compiled = CompiledForest.from_sklearn(forest)
+    for row in X[:25]:
+        assert np.array_equal(compiled.predict_proba(row), forest.predict_proba(row[np.newaxis]))
+
+def test_float64_input_matches_sklearn(forest, data):
+    X = data[0].astype(np.float64) + 1e-9
+    compiled = CompiledForest.from_sklearn(forest)
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+
+def test_apply_reaches_sklearn_leaves(forest, data):
+    X, _ = data
+    compiled = CompiledForest.from_sklearn(forest)
+    # Compiled node ids are global; subtracting each tree's root gives sklearn's local ids
+    assert np.array_equal(compiled.apply(X) - compiled.roots, forest.apply(X))
+    assert np.array_equal(compiled.apply(X[:1]) - compiled.roots, forest.apply(X[:1]))
+
+def test_rejects_bad_input(forest):
+    compiled = CompiledForest.from_sklearn(forest)
+    with pytest.raises(ValueError):
+        compiled.predict_proba(np.zeros((1, 5)))
+    with pytest.raises(ValueError):
+        compiled.predict_proba(np.array([[np.nan] * 6]))
+
+def test_save_load_round_trip(forest, data, tmp_path):
+    X, _ = data
+    CompiledForest.from_sklearn(forest).save(str(tmp_path), source_mtime=123.0)
+    loaded = CompiledForest.load(str(tmp_path), source_mtime=123.0)
+    assert loaded is not None
+    assert isinstance(loaded.value, np.memmap)
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+def test_load_rejects_other_model(forest, tmp_path):
+    assert CompiledForest.load(str(tmp_path)) is None
+    CompiledForest.from_sklearn(forest).save(str(tmp_path), source_mtime=123.0)
+    assert CompiledForest.load(str(tmp_path), source_mtime=456.0) is None
+    assert CompiledForest.load(str(tmp_path)) is not None
@@ -0,0 +1,102 @@
+"""
+Tests for location recommendation feature assembly and farm profile values
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.ml_models.crop_recommendation import CropRecommendationModel
+from app.schemas.user import UserUpdate
+from app.services.location_recommendation_service import LocationRecommendationService, rainfall_rate
+
+def assemble(overrides=None, known_categories=None, **context):
+    return LocationRecommendationService(session_factory=None).assemble_features(
+        overrides or {}, context, known_categories, today=datetime(2024, 7, 1)
+    )
+
+@pytest.fixture(scope="module")
+def crop_model(tmp_path_factory):
+    model_path = tmp_path_factory.mktemp("crop") / "crop_recommendation_model.pkl"
+    return CropRecommendationModel(str(model_path), compile_forest=False)
+
+# A profile the schema accepts but the model has no encoding for
+UNSEEN_PROFILE = {"location": "Chennai", "soil_type": "black", "ph": 6.5, "region": "south"}
+
+def test_request_values_win_over_climate_weather_and_profile():
+    features, sources = assemble(
+        {"temperature": 30.0},
+        climate={"temperature": 25.0, "rainfall": 900.0},
+        weather={"temperature": 28.0, "humidity": 70.0},
+        profile={"ph": 6.8, "soil_type": "clay"}
+    )
+    assert features["temperature"] == 30.0 and sources["temperature"] == "request"
+    assert sources["rainfall"] == "climate" and sources["humidity"] == "weather" and sources["ph"] == "profile"
+    assert features["season"] == "kharif" and sources["season"] == "calendar"
+    assert features["water_requirement"] == "medium" and sources["water_requirement"] == "default"
+
+def test_profile_categories_are_lower_cased():
+    features, _ = assemble(profile={"soil_type": " Clay", "region": "North "})
+    assert features["soil_type"] == "clay"
+    assert features["region"] == "north"
+
+def test_profile_categories_the_model_does_not_know_use_the_defaults(crop_model):
+    features, sources = assemble(known_categories=crop_model.known_categories(), profile=UNSEEN_PROFILE)
+    assert (features["soil_type"], sources["soil_type"]) == ("loamy", "default")
+    assert (features["region"], sources["region"]) == ("north", "default")
+
+    # Explicit request values are still the model's to reject
+    features, sources = assemble({"region": "south"}, crop_model.known_categories(), profile=UNSEEN_PROFILE)
+    assert (features["region"], sources["region"]) == ("south", "request")
+
+def test_for_location_recommends_for_a_profile_the_model_does_not_know(crop_model, monkeypatch):
+    crops = pytest.importorskip("app.routers.crops")
+    context = {
+        "profile": UNSEEN_PROFILE,
+        "location": "Chennai",
+        "weather": {"temperature": 31.0, "humidity": 75.0},
+        "climate": {"temperature": 29.0, "humidity": 72.0, "rainfall": 1400.0, "days_observed": 60}
+    }
+
+    async def gather_context(self, user_id, location):
+        return context
+
+    class RecordingCropService:
+        def __init__(self, db):
+            pass
+
+        def create_recommendation(self, data):
+            return SimpleNamespace(id=1)
+
+    monkeypatch.setattr(LocationRecommendationService, "gather_context", gather_context)
+    monkeypatch.setattr(crops, "crop_model", crop_model)
+    monkeypatch.setattr(crops, "CropService", RecordingCropService)
+    app = FastAPI()
+    app.include_router(crops.router, prefix="/api/crops")
+    app.dependency_overrides[crops.get_db] = lambda: None
+
+    response = TestClient(app).post("/api/crops/recommend/for-location", json={"user_id": 1})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["recommendations"]
+    assert body["feature_sources"]["region"] == "default" and body["input_parameters"]["region"] == "north"
+    assert body["feature_sources"]["soil_type"] == "default"
+
+def test_rainfall_rate_prefers_the_hourly_amount():
+    assert rainfall_rate({"1h": 2.0, "3h": 9.0}) == 2.0
+    assert rainfall_rate({"3h": 9.0}) == 3.0
+    assert rainfall_rate({}) == 0.0
+
+def test_user_update_normalizes_profile_categories():
+    update = UserUpdate(soil_type=" Loamy ", region="SOUTH")
+    assert (update.soil_type, update.region) == ("loamy", "south")
+    assert UserUpdate().soil_type is None
+
+@pytest.mark.parametrize("field, value", [("soil_type", "granite"), ("region", "northeast"), ("soil_type", "")])
+def test_user_update_rejects_unknown_categories(field, value):
+    with pytest.raises(ValidationError):
+        UserUpdate(**{field: value})
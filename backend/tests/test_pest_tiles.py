@@ -0,0 +1,37 @@
+"""
+Tests for tile planning in tiled pest detection
+"""
+
+import numpy as np
+import pytest
+
+from app.ml_models.pest_detection import IMAGE_SIZE, PestDetectionModel
+
+TILE = IMAGE_SIZE[0]
+
+@pytest.fixture
+def model():
+    # plan_tiles and extract_tiles need no loaded network
+    return PestDetectionModel.__new__(PestDetectionModel)
+
+@pytest.mark.parametrize("height, width", [
+    (TILE * 24, TILE), (TILE, TILE * 24), (TILE * 24, TILE * 2), (4000, 3000), (TILE, TILE), (10000, 10000)
+])
+@pytest.mark.parametrize("max_tiles", [1, 4, 7, 64])
+def test_tile_count_never_exceeds_the_cap(model, height, width, max_tiles):
+    ys, xs = model.plan_tiles(height, width, 0.25, max_tiles)
+    assert 1 <= len(ys) <= max_tiles
+    assert ys.min() >= 0 and ys.max() <= height - TILE
+    assert xs.min() >= 0 and xs.max() <= width - TILE
+
+def test_uncapped_grid_covers_the_image(model):
+    ys, xs = model.plan_tiles(1000, 700, 0.25, 64)
+    assert len(ys) == 6 * 4  # stride 168 over 776 and 476 pixels
+    assert ys.max() == 1000 - TILE and xs.max() == 700 - TILE
+
+def test_extract_tiles_matches_slicing(model):
+    image = np.random.default_rng(0).integers(0, 255, size=(600, 500, 3), dtype=np.uint8)
+    ys, xs = model.plan_tiles(600, 500, 0.25, 64)
+    tiles = model.extract_tiles(image, ys, xs)
+    for tile, y, x in zip(tiles, ys, xs):
+        assert np.array_equal(tile, image[y:y + TILE, x:x + TILE])
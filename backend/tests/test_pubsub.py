@@ -0,0 +1,106 @@
+"""
+Tests for push topic names and in-process delivery
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.pubsub import PubSubBroker, normalize_topic
+
+def test_normalize_lowercases_and_trims():
+    assert normalize_topic("  Crop:Wheat ") == "crop:wheat"
+    assert normalize_topic("USER: 42") == "user:42"
+
+def test_normalize_accepts_commas():
+    assert normalize_topic("location:Pune, Maharashtra") == "location:pune, maharashtra"
+
+def test_normalize_rejects_unknown_kind_and_empty_key():
+    assert normalize_topic("market:wheat") is None
+    assert normalize_topic("crop:") is None
+    assert normalize_topic("crop:   ") is None
+    assert normalize_topic("crop") is None
+
+def test_normalize_rejects_long_keys():
+    assert normalize_topic("crop:" + "a" * 100) == "crop:" + "a" * 100
+    assert normalize_topic("crop:" + "a" * 101) is None
+
+def test_normalize_rejects_invalid_characters():
+    for topic in ("crop:wheat/rice", "crop:wheat;drop", "crop:*", "crop:a\nb", "forum_post:1:2"):
+        assert normalize_topic(topic) is None
+
+def test_memory_broker_delivers_to_subscribers():
+    async def run():
+        broker = PubSubBroker("memory")
+        await broker.start()
+        subscriber, other = broker.connect(), broker.connect()
+        assert subscriber.subscribe(["Location:Pune, Maharashtra", "market:x"]) == {"location:pune, maharashtra"}
+        other.subscribe(["crop:wheat"])
+
+        assert await broker.publish("location:PUNE, Maharashtra", "weather", {"temp": 31})
+        assert not await broker.publish("bad topic", "weather", {})
+
+        event = await subscriber.get(timeout=1)
+        assert event["topic"] == "location:pune, maharashtra" and event["data"] == {"temp": 31}
+        assert await other.get(timeout=0.01) is None
+
+        subscriber.close()
+        assert "location:pune, maharashtra" not in broker.topics
+        await broker.stop()
+
+    asyncio.run(run())
+
+def test_threadsafe_batches_report_what_was_published():
+    broker = PubSubBroker("memory")
+    # Nobody could receive events from a process without a running broker
+    assert broker.publish_many_threadsafe([("user:1", "weather_alert", {})]) == 0
+
+    async def run():
+        await broker.start()
+        subscription = broker.connect()
+        subscription.subscribe(["user:1"])
+        events = [("user:1", "weather_alert", {"n": 1}), ("bad topic", "weather_alert", {}), ("user:2", "weather_alert", {})]
+        published = await asyncio.to_thread(broker.publish_many_threadsafe, events)
+        assert published == 2
+        assert (await subscription.get(timeout=1))["data"] == {"n": 1}
+        await broker.stop()
+
+    asyncio.run(run())
+
+def test_push_sender_needs_a_reachable_broker(monkeypatch):
+    from app.services import notification_service
+
+    monkeypatch.setattr(notification_service, "broker", PubSubBroker("memory"))
+    with pytest.raises(ValueError):
+        notification_service.get_notification_sender("push")
+    with pytest.raises(TypeError):
+        notification_service.NotificationSender()
+
+def test_push_sender_publishes_in_batches(monkeypatch):
+    from app.services import notification_service
+
+    broker = PubSubBroker("memory")
+    monkeypatch.setattr(notification_service, "broker", broker)
+    batches = []
+    monkeypatch.setattr(broker, "publish_many_threadsafe", lambda events: batches.append(len(events)) or len(events) - 1)
+    broker.loop = object()
+
+    sender = notification_service.PushNotificationSender(batch_size=2)
+    notifications = [{"user_id": i, "message": "frost"} for i in range(5)]
+    assert sender.send_batch(notifications) == 2
+    assert batches == [2, 2, 1]
+
+def test_redis_batches_from_a_job_use_one_pipeline():
+    fakeredis = pytest.importorskip("fakeredis")
+    broker = PubSubBroker("redis", "redis://localhost:6379/0")
+    broker.sync_redis = fakeredis.FakeRedis()
+    listener = broker.sync_redis.pubsub()
+    listener.psubscribe("push:*")
+    listener.get_message(timeout=1)
+
+    events = [("user:1", "weather_alert", {"n": 1}), ("bad topic", "weather_alert", {}), ("user:2", "weather_alert", {})]
+    assert broker.publish_many_threadsafe(events) == 2
+    channels = []
+    while (message := listener.get_message(timeout=0.1)) is not None:
+        channels.append(message["channel"])
+    assert channels == [b"push:user:1", b"push:user:2"]
@@ -0,0 +1,79 @@
+"""
+Tests for token-bucket rate limiting
+"""
+
+import asyncio
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import TOKEN_BUCKET_SCRIPT, LocalBuckets, route_cost
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+def test_route_cost():
+    assert route_cost("GET", "/api/health") == 0
+    assert route_cost("GET", "/api/admin/profile") == 0
+    assert route_cost("POST", "/api/pests/detect") == 10
+    assert route_cost("POST", "/api/advisory/chat/stream") == 5
+    assert route_cost("GET", "/api/weather/current/Pune") == 2
+    assert route_cost("GET", "/api/forum/posts") == 1
+
+def test_bucket_drains_and_reports_wait(clock):
+    buckets = LocalBuckets(max_keys=10)
+    assert buckets.take("a", 4, rate=2.0, burst=10) == (1, 6, 2000, 0)
+    assert buckets.take("a", 4, rate=2.0, burst=10) == (1, 2, 4000, 0)
+    # 2 tokens left, 4 needed at 2 tokens/s
+    assert buckets.take("a", 4, rate=2.0, burst=10) == (0, 2, 4000, 1000)
+
+def test_bucket_refills_up_to_burst(clock):
+    buckets = LocalBuckets(max_keys=10)
+    buckets.take("a", 10, rate=2.0, burst=10)
+    clock.now += 2.5
+    assert buckets.take("a", 5, rate=2.0, burst=10) == (1, 0, 5000, 0)
+    clock.now += 60
+    assert buckets.take("a", 1, rate=2.0, burst=10) == (1, 9, 500, 0)
+
+def test_buckets_are_independent_and_evicted_lru(clock):
+    buckets = LocalBuckets(max_keys=2)
+    buckets.take("a", 10, rate=1.0, burst=10)
+    buckets.take("b", 10, rate=1.0, burst=10)
+    buckets.take("a", 0, rate=1.0, burst=10)  # "a" becomes most recently used
+    buckets.take("c", 1, rate=1.0, burst=10)
+    assert list(buckets.buckets) == ["a", "c"]
+    # An evicted client starts again from a full bucket
+    assert buckets.take("b", 1, rate=1.0, burst=10)[:2] == (1, 9)
+
+def test_lua_script_matches_local_buckets(clock):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    async def run():
+        client = fakeredis.aioredis.FakeRedis()
+        script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        results = []
+        for cost in (3, 3, 3, 3, 1, 10):
+            results.append([int(value) for value in await script(keys=["bucket"], args=[cost, 0.001, 10])])
+        await client.close()
+        return results
+
+    remote = asyncio.run(run())
+    buckets = LocalBuckets(max_keys=10)
+    local = [list(buckets.take("bucket", cost, 0.001, 10)) for cost in (3, 3, 3, 3, 1, 10)]
+
+    # Allowed and remaining agree exactly; timings may differ by the few
+    # milliseconds of refill between the script's calls
+    assert [row[:2] for row in remote] == [row[:2] for row in local]
+    for remote_row, local_row in zip(remote, local):
+        assert remote_row[2:] == pytest.approx(local_row[2:], abs=50)
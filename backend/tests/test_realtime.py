@@ -0,0 +1,56 @@
+"""
+Tests for push topic authorization on the real-time endpoints
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.core.config import settings
+from app.routers import realtime
+
+def access_token(user_id: int) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(minutes=5)
+    return jwt.encode({"sub": str(user_id), "exp": expire}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(realtime.router, prefix="/api/realtime")
+    return TestClient(app)
+
+def test_permitted_topics_only_allow_the_users_own_topic():
+    allowed, forbidden = realtime.permitted_topics(["user:42", "User:7", "crop:wheat"], "42")
+    assert allowed == ["user:42", "crop:wheat"]
+    assert forbidden == ["User:7"]
+    assert realtime.permitted_topics(["user:42"], None) == ([], ["user:42"])
+
+def test_connection_user_reads_header_or_query_token():
+    token = access_token(42)
+    assert realtime.connection_user(f"Bearer {token}", None) == "42"
+    assert realtime.connection_user(None, token) == "42"
+    assert realtime.connection_user("Bearer invalid", None) is None
+    assert realtime.connection_user(None, None) is None
+
+def test_sse_refuses_anonymous_user_topics(client):
+    response = client.get("/api/realtime/events", params={"topics": "user:42"})
+    assert response.status_code == 403
+
+    response = client.get(
+        "/api/realtime/events",
+        params={"topics": "user:42"},
+        headers={"Authorization": f"Bearer {access_token(7)}"}
+    )
+    assert response.status_code == 403
+
+def test_websocket_subscribes_only_to_permitted_topics(client):
+    url = f"/api/realtime/ws?topics=user:42&topics=crop:wheat&access_token={access_token(7)}"
+    with client.websocket_connect(url) as websocket:
+        assert websocket.receive_json() == {"type": "error", "detail": "Not authorized for topics", "topics": ["user:42"]}
+        assert websocket.receive_json() == {"type": "subscribed", "topics": ["crop:wheat"]}
+
+        websocket.send_json({"action": "subscribe", "topics": ["user:7"]})
+        assert websocket.receive_json() == {"type": "subscribed", "topics": ["user:7"]}
@@ -0,0 +1,144 @@
+"""
+Tests for the quantized crop recommendation table
+"""
+
+import numpy as np
+import pytest
+
+from app.ml_models.recommendation_table import RecommendationTable
+
+STEPS = {"temperature": 5.0, "humidity": 20.0, "ph": 2.0, "rainfall": 1000.0}
+CATEGORY_SIZES = [2, 2, 1, 3]
+N_CLASSES = 6
+
+def predict_proba(features):
+    """Deterministic stand-in for the forest: smooth in every feature"""
+    features = np.atleast_2d(features).astype(np.float64)
+    logits = np.stack([
+        np.sin(features[:, 0] / 7 + c) + np.cos(features[:, 3] / 900 - c) + 0.1 * c * features[:, 4:].sum(axis=1)
+        for c in range(N_CLASSES)
+    ], axis=1)
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def table(**kwargs):
+    return RecommendationTable(STEPS, CATEGORY_SIZES, N_CLASSES, top_k=3, **kwargs)
+
+def row(temperature=24.0, humidity=61.0, ph=6.4, rainfall=1180.0, categories=(1, 0, 0, 2)):
+    return np.array([temperature, humidity, ph, rainfall, *categories], dtype=np.float64)
+
+def test_cell_snaps_to_the_grid():
+    key, quantized = table().cell(row())
+    assert quantized[:4].tolist() == [25.0, 60.0, 6.0, 1000.0]
+    assert quantized[4:].tolist() == [1, 0, 0, 2]
+
+def test_nearby_inputs_share_a_cell_and_out_of_range_inputs_have_none():
+    t = table()
+    assert t.cell(row(24.0))[0] == t.cell(row(26.0))[0]
+    assert t.cell(row(24.0))[0] != t.cell(row(29.0))[0]
+    assert t.cell(row(60.0)) is None
+    assert t.cell(row(rainfall=-1.0)) is None
+
+def test_decode_inverts_cell_keys():
+    t = table()
+    rows = [row(), row(-10.0, 0.0, 0.0, 0.0, (0, 0, 0, 0)), row(50.0, 100.0, 14.0, 5000.0, (1, 1, 0, 2))]
+    keys = [t.cell(r)[0] for r in rows]
+    assert t.decode(np.array(keys)).tolist() == [t.cell(r)[1].tolist() for r in rows]
+
+def test_lookup_memoizes_the_cell_centre():
+    t = table()
+    classes, probabilities = t.lookup(row(24.0), predict_proba)
+    again, _ = t.lookup(row(26.0), predict_proba)
+
+    centre = predict_proba(t.cell(row(24.0))[1])[0]
+    assert classes.tolist() == np.argsort(centre)[::-1][:3].tolist()
+    assert probabilities == pytest.approx(np.sort(centre)[::-1][:3], rel=1e-6)
+    assert again.tolist() == classes.tolist()
+    assert t.stats()["hits"] == 1
+    assert t.stats()["misses"] == 1
+    assert t.size == 1
+
+def test_out_of_range_lookups_bypass_the_table():
+    t = table()
+    classes, _ = t.lookup(row(60.0), predict_proba)
+    assert classes.tolist() == np.argsort(predict_proba(row(60.0))[0])[::-1][:3].tolist()
+    assert t.stats()["bypassed"] == 1
+    assert t.size == 0
+
+def test_precompute_fills_every_cell_once():
+    t = table()
+    t.lookup(row(), predict_proba)
+    assert t.precompute(predict_proba) == t.total_cells - 1
+    assert t.size == t.total_cells
+    assert t.precompute(predict_proba) == 0
+    with pytest.raises(ValueError):
+        t.precompute(predict_proba, max_cells=10)
+
+def test_agreement_leaves_table_and_counters_untouched():
+    t = table()
+    t.lookup(row(), predict_proba)
+    before = (t.stats(), t.size)
+
+    continuous = np.random.default_rng(0).uniform([0, 10, 4, 100], [45, 95, 9, 4000], size=(50, 4))
+    samples = np.array([row(*values, categories=(1, 0, 0, 1)) for values in continuous])
+    result = t.agreement(samples, predict_proba)
+
+    assert (t.stats(), t.size) == before
+    assert result["samples"] == 50
+    assert 0.0 <= result["top1_agreement"] <= 1.0
+    assert 0.0 <= result["topk_overlap"] <= 1.0
+
+def test_agreement_is_exact_on_cell_centres():
+    t = table()
+    samples = np.array([t.cell(row(temperature))[1] for temperature in (0.0, 10.0, 25.0, 40.0)])
+    assert t.agreement(samples, predict_proba)["top1_agreement"] == 1.0
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "table.npz")
+    labels = [f"crop{i}" for i in range(N_CLASSES)]
+    t = table()
+    t.lookup(row(), predict_proba)
+    t.lookup(row(40.0), predict_proba)
+    t.save(path, labels)
+
+    loaded = table()
+    assert loaded.load(path, labels)
+    assert loaded.size == 2
+    assert loaded.lookup(row(), predict_proba)[0].tolist() == t.lookup(row(), predict_proba)[0].tolist()
+    assert loaded.stats()["misses"] == 0
+
+def test_workers_saving_in_turn_merge_their_cells(tmp_path):
+    path = str(tmp_path / "table.npz")
+    labels = [f"crop{i}" for i in range(N_CLASSES)]
+    first, second = table(), table()
+    first.lookup(row(), predict_proba)
+    second.lookup(row(), predict_proba)
+    second.lookup(row(40.0), predict_proba)
+    first.save(path, labels)
+    second.save(path, labels)
+    first.save(path, labels)
+
+    loaded = table()
+    assert loaded.load(path, labels)
+    assert loaded.size == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["table.npz", "table.npz.lock"]
+
+def test_save_replaces_an_unreadable_file(tmp_path):
+    path = tmp_path / "table.npz"
+    path.write_bytes(b"torn")
+    labels = [f"crop{i}" for i in range(N_CLASSES)]
+    t = table()
+    t.lookup(row(), predict_proba)
+    t.save(str(path), labels)
+    assert table().load(str(path), labels)
+
+def test_load_rejects_a_different_grid_or_model(tmp_path):
+    path = str(tmp_path / "table.npz")
+    labels = [f"crop{i}" for i in range(N_CLASSES)]
+    t = table()
+    t.lookup(row(), predict_proba)
+    t.save(path, labels)
+
+    assert not table().load(path, labels[::-1])
+    assert not RecommendationTable({**STEPS, "ph": 1.0}, CATEGORY_SIZES, N_CLASSES, top_k=3).load(path, labels)
+    assert not table().load(str(tmp_path / "missing.npz"), labels)
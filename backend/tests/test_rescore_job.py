@@ -0,0 +1,58 @@
+"""
+Tests for the re-scoring job lock, shared status and stop requests
+"""
+
+import json
+
+import pytest
+
+from app.services.rescoring_service import RescoreJob
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / "rescore" / "checkpoint.json")
+
+def test_only_one_worker_runs_the_job(checkpoint):
+    runner, other = RescoreJob(checkpoint), RescoreJob(checkpoint)
+    assert not other.running()
+    assert runner.acquire()
+    assert not other.acquire()
+    assert other.running()
+
+    runner.release()
+    assert not other.running()
+    assert other.acquire()
+    other.release()
+
+def test_any_worker_can_stop_the_run(checkpoint):
+    runner, other = RescoreJob(checkpoint), RescoreJob(checkpoint)
+    assert runner.acquire()
+    assert not runner.is_set()
+    other.request_stop()
+    assert runner.is_set()
+    runner.release()
+
+    # A new run starts without the old stop request
+    assert other.acquire()
+    assert not other.is_set()
+    other.release()
+
+def test_status_comes_from_the_checkpoint(checkpoint):
+    runner, other = RescoreJob(checkpoint), RescoreJob(checkpoint)
+    assert other.status() == {"running": False, "stats": None, "error": None}
+
+    assert runner.acquire()
+    runner.write_checkpoint({"model_version": "v2", "last_id": 40, "processed": 40})
+    assert other.status() == {"running": True, "stats": {"model_version": "v2", "last_id": 40, "processed": 40}, "error": None}
+
+    runner.record_error("model file missing")
+    runner.release()
+    status = other.status()
+    assert status["running"] is False and status["error"] == "model file missing"
+    assert status["stats"]["last_id"] == 40
+
+    # Starting again clears the error but keeps the progress to resume from
+    assert other.acquire()
+    with open(checkpoint) as f:
+        assert json.load(f) == {"model_version": "v2", "last_id": 40, "processed": 40}
+    other.release()
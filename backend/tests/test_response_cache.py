@@ -0,0 +1,124 @@
+"""
+Tests for the two-level response cache: lookup levels, keys, invalidation and 304s
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import response_cache as response_cache_module
+from app.core.response_cache import ResponseCache, cached_response, etag_matches
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio calls the cache makes"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    async def incr(self, key):
+        value = int(self.data.get(key, b"0")) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    async def close(self):
+        pass
+
+def worker(redis, l1_ttl=60.0):
+    cache = ResponseCache("redis://unused", l1_ttl=l1_ttl, l1_max_entries=100)
+    cache.redis = redis
+    return cache
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+@pytest.fixture
+def calls():
+    return []
+
+@pytest.fixture
+def client(calls):
+    app = FastAPI()
+
+    @app.get("/crops")
+    @cached_response("crops")
+    async def crops(category: str = "all"):
+        calls.append(category)
+        return [{"name": "Rice", "category": category}]
+
+    return TestClient(app)
+
+def use(monkeypatch, cache):
+    monkeypatch.setattr(response_cache_module, "response_cache", cache)
+
+def test_l1_then_l2_then_miss(client, calls, redis, monkeypatch):
+    use(monkeypatch, worker(redis))
+    assert client.get("/crops").headers["x-cache"] == "MISS"
+    assert client.get("/crops").headers["x-cache"] == "L1"
+
+    # Another worker finds the body in Redis, then in its own L1
+    use(monkeypatch, worker(redis))
+    response = client.get("/crops")
+    assert response.headers["x-cache"] == "L2"
+    assert response.json() == [{"name": "Rice", "category": "all"}]
+    assert client.get("/crops").headers["x-cache"] == "L1"
+    assert calls == ["all"]
+
+def test_keys_use_sorted_query_parameters_including_fields(client, calls, redis, monkeypatch):
+    use(monkeypatch, worker(redis))
+    client.get("/crops?category=fruit&fields=name")
+    assert client.get("/crops?fields=name&category=fruit").headers["x-cache"] == "L1"
+    assert client.get("/crops?category=fruit").headers["x-cache"] == "MISS"
+    assert client.get("/crops?category=fruit&fields=category").headers["x-cache"] == "MISS"
+
+    keys = sorted(key for key in redis.data if "version" not in key)
+    assert keys == [
+        "respcache:crops:0:/crops?category=fruit",
+        "respcache:crops:0:/crops?category=fruit&fields=category",
+        "respcache:crops:0:/crops?category=fruit&fields=name"
+    ]
+
+def test_invalidation_bumps_the_version_for_every_worker(client, calls, redis, monkeypatch):
+    writer, reader = worker(redis), worker(redis, l1_ttl=0)
+    use(monkeypatch, reader)
+    client.get("/crops")
+    assert len(calls) == 1
+
+    assert asyncio.run(writer.invalidate("crops")) == 1
+    response = client.get("/crops")
+    assert response.headers["x-cache"] == "MISS"
+    assert len(calls) == 2
+
+def test_invalidation_without_redis_is_process_local(client, calls, monkeypatch):
+    cache = worker(None)
+    cache.redis_retry_at = float("inf")
+    use(monkeypatch, cache)
+    client.get("/crops")
+    asyncio.run(cache.invalidate("crops"))
+    assert client.get("/crops").headers["x-cache"] == "MISS"
+    assert len(calls) == 2
+
+def test_if_none_match_returns_304(client, redis, monkeypatch):
+    use(monkeypatch, worker(redis))
+    etag = client.get("/crops").headers["etag"]
+
+    response = client.get("/crops", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert client.get("/crops", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_etag_matches_accepts_compressed_tags_and_wildcards():
+    assert etag_matches('"abc-gzip"', '"abc"')
+    assert etag_matches('"abc-br", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
@@ -0,0 +1,101 @@
+"""
+Tests for the BM25 retrieval index
+"""
+
+import json
+import math
+import os
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.ml_models.text_index import BM25Index, tokenize
+
+DOCUMENTS = [
+    ({"id": 1}, "Aphids on cotton leaves: spray neem oil early in the morning"),
+    ({"id": 2}, "Cotton bollworm control with pheromone traps"),
+    ({"id": 3}, "Drip irrigation schedule for tomato in summer"),
+    ({"id": 4}, "Neem oil is a safe organic pesticide for aphids and whiteflies on tomato"),
+    ({"id": 5}, "Soil testing: how to read pH and nitrogen results"),
+    ({"id": 6}, "")
+]
+
+def reference_scores(query, texts, k1=1.2, b=0.75):
+    """Textbook BM25 with the same idf variant as the index"""
+    docs = [Counter(tokenize(text)) for text in texts if tokenize(text)]
+    avg_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = []
+    for doc in docs:
+        length = sum(doc.values())
+        score = 0.0
+        for term, count in Counter(tokenize(query)).items():
+            df = sum(term in other for other in docs)
+            if not df or term not in doc:
+                continue
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc[term]
+            score += count * idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "index"))
+    index.build(DOCUMENTS)
+    return index
+
+def test_tokenize_drops_stop_words_and_single_characters():
+    assert tokenize("How do I control Aphids on a 2 acre farm?") == ["control", "aphids", "acre", "farm"]
+
+def test_empty_documents_are_skipped(index):
+    assert len(index) == 5
+
+@pytest.mark.parametrize("query", ["neem oil for aphids", "cotton", "tomato tomato irrigation", "soil pH"])
+def test_scores_match_reference_bm25(index, query):
+    expected = reference_scores(query, [text for _, text in DOCUMENTS])
+    hits = index.search(query, k=10)
+    scores = {document["id"]: score for document, score in hits}
+    for doc_id, score in zip(range(1, 6), expected):
+        assert scores.get(doc_id, 0.0) == pytest.approx(score, rel=1e-5)
+
+def test_results_are_ranked_and_limited(index):
+    hits = index.search("aphids whiteflies cotton", k=2)
+    assert len(hits) == 2
+    assert hits[0][1] >= hits[1][1]
+    expected = np.argsort(reference_scores("aphids whiteflies cotton", [text for _, text in DOCUMENTS]))[::-1][:2] + 1
+    assert [document["id"] for document, _ in hits] == expected.tolist()
+
+def test_unknown_or_stop_word_queries_return_nothing(index):
+    assert index.search("what is the") == []
+    assert index.search("blockchain") == []
+
+def test_empty_index_returns_nothing(tmp_path):
+    assert BM25Index(str(tmp_path / "missing")).search("aphids") == []
+
+def test_saved_index_loads_in_another_instance(index):
+    other = BM25Index(index.index_dir)
+    assert len(other) == len(index)
+    assert other.search("neem oil") == index.search("neem oil")
+
+def test_documents_and_postings_are_replaced_together(index):
+    assert os.listdir(index.index_dir) == ["postings.npz"]
+
+    # A worker holding the old file keeps reading a consistent index
+    with open(os.path.join(index.index_dir, "postings.npz"), "rb") as old:
+        index.build(DOCUMENTS[:2])
+        with np.load(old) as postings:
+            meta = json.loads(postings["meta"].tobytes())
+            assert postings["doc_ids"].max() == len(meta["documents"]) - 1 == 4
+
+def test_reload_if_changed_picks_up_rebuilds(index):
+    other = BM25Index(index.index_dir)
+    index.build(DOCUMENTS[:2])
+    assert other.reload_if_changed(0) is True
+    assert len(other) == 2
+    assert other.reload_if_changed(0) is False
+
+    # Files are checked at most once per interval
+    index.build(DOCUMENTS)
+    assert other.reload_if_changed(3600) is False
+    assert len(other) == 2
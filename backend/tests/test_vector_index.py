@@ -0,0 +1,107 @@
+"""
+Tests for the IVF embedding index and its in-memory buffer
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from app.ml_models.vector_index import IVFIndex, normalize, pack_vector, unpack_vector
+
+DIM = 16
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(200, DIM)).astype(np.float32)
+
+def build(index, vectors, ids=None, n_lists=8):
+    ids = np.arange(len(vectors)) if ids is None else np.asarray(ids)
+    index.build([(ids[:100], vectors[:100]), (ids[100:], vectors[100:])], len(vectors), n_lists=n_lists)
+
+def test_pack_round_trip_is_normalised(vectors):
+    restored = unpack_vector(pack_vector(vectors[0]))
+    assert restored.shape == (DIM,)
+    assert np.linalg.norm(restored) == pytest.approx(1.0, abs=1e-3)
+    assert restored == pytest.approx(normalize(vectors[0]), abs=1e-3)
+
+def test_empty_index_returns_nothing(tmp_path):
+    index = IVFIndex(str(tmp_path), dim=DIM)
+    assert len(index) == 0
+    assert index.search(np.ones(DIM)) == []
+
+def test_search_finds_exact_matches_when_probing_every_list(tmp_path, vectors):
+    index = IVFIndex(str(tmp_path), dim=DIM, n_probe=8)
+    build(index, vectors)
+    assert len(index) == 200
+
+    for item in (0, 57, 199):
+        hits = index.search(vectors[item], k=5)
+        assert hits[0][0] == item
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-3)
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+def test_search_matches_brute_force(tmp_path, vectors):
+    index = IVFIndex(str(tmp_path), dim=DIM, n_probe=8)
+    build(index, vectors)
+    query = np.random.default_rng(1).normal(size=DIM)
+    expected = np.argsort(-(normalize(vectors) @ normalize(query)))[:10]
+    assert [item for item, _ in index.search(query, k=10)] == expected.tolist()
+
+def test_exclude_id(tmp_path, vectors):
+    index = IVFIndex(str(tmp_path), dim=DIM, n_probe=8)
+    build(index, vectors)
+    assert 3 not in [item for item, _ in index.search(vectors[3], k=5, exclude_id=3)]
+
+def test_buffered_vectors_are_searchable(tmp_path, vectors):
+    index = IVFIndex(str(tmp_path), dim=DIM)
+    index.add(1000, vectors[0])
+    assert len(index) == 1
+    assert index.search(vectors[0], k=1)[0][0] == 1000
+
+def test_buffer_is_capped_oldest_first(tmp_path, vectors):
+    index = IVFIndex(str(tmp_path), dim=DIM, max_buffer=3)
+    for item in range(5):
+        index.add(item, vectors[item])
+    assert index.buffer_ids == [2, 3, 4]
+    assert len(index.buffer_vectors) == 3
+
+def test_build_keeps_vectors_it_did_not_index(tmp_path, vectors):
+    index = IVFIndex(str(tmp_path), dim=DIM, n_probe=8)
+    index.add(5, vectors[5])
+    index.add(500, vectors[0])
+    build(index, vectors[:100], n_lists=4)
+    # 5 is in the new files; 500 arrived outside the batches and stays buffered
+    assert index.buffer_ids == [500]
+    assert len(index) == 101
+
+def test_load_drops_buffered_ids_present_in_the_reloaded_index(tmp_path, vectors):
+    builder = IVFIndex(str(tmp_path), dim=DIM, n_probe=8)
+    build(builder, vectors[:100], n_lists=4)
+
+    worker = IVFIndex(str(tmp_path), dim=DIM, n_probe=8)
+    worker.add(150, vectors[150])
+    worker.add(300, vectors[0])
+    build(builder, vectors)  # Another process indexes 0-199, including 150
+    worker.load()
+
+    assert worker.buffer_ids == [300]
+    hits = [item for item, _ in worker.search(vectors[150], k=10)]
+    assert hits.count(150) == 1
+
+def test_rebuild_leaves_old_mappings_readable(tmp_path, vectors):
+    reader = IVFIndex(str(tmp_path), dim=DIM)
+    build(IVFIndex(str(tmp_path), dim=DIM), vectors)
+    assert reader.reload_if_changed(0)
+    old_ids = np.array(reader.ids)
+
+    # A rebuild in another process replaces the files instead of truncating them
+    build(IVFIndex(str(tmp_path), dim=DIM), vectors[::-1], ids=np.arange(1000, 1200), n_lists=4)
+    assert np.array_equal(np.asarray(reader.ids), old_ids)
+    assert not [name for name in tmp_path.iterdir() if ".tmp" in name.name]
+
+    os.utime(tmp_path / "vectors.npy", (0, reader.loaded_mtime + 1))
+    assert reader.reload_if_changed(0)
+    assert set(np.asarray(reader.ids)) == set(range(1000, 1200))
+    assert not reader.reload_if_changed(0)
+    assert not reader.reload_if_changed(3600)